@@ -2,6 +2,7 @@
 
 import os
 import json
+import logging
 import re
 import subprocess
 import unicodedata
@@ -11,6 +12,8 @@ from typing import Optional, Dict
 import vosk
 import wave
 from pydub import AudioSegment # Necesitarás: pip install pydub
+from metricas import etapa
+from actividad_voz import recortar_silencios
 
 
 # --- INICIO DE LA CORRECCIÓN ---
@@ -21,6 +24,15 @@ APP_DIR = os.path.dirname(os.path.abspath(__file__))
 RUTA_MODELO_VOSK = os.path.join(APP_DIR, "vosk-model-es-0.42")
 # --- FIN DE LA CORRECCIÓN ---
 
+# Los detalles por petición (formato, recorte, texto transcrito) van en DEBUG
+log = logging.getLogger(__name__)
+
+# SIEMBRA_VAD=0 manda el audio completo a Vosk (sin recortar silencios)
+USAR_VAD = os.environ.get("SIEMBRA_VAD", "1") != "0"
+
+# Configurable para apuntar a un servidor de prueba (benchmarks/stubs.py)
+OLLAMA_URL = os.environ.get("SIEMBRA_OLLAMA_URL", "http://localhost:11434/api/generate")
+
 
 # ====== CATÁLOGOS ======
 # Importar desde tus catalogos.py. Asegúrate de que Flask pueda verlos.
@@ -68,87 +80,107 @@ modelo_voz = vosk.Model(RUTA_MODELO_VOSK)
 # En SiembraMasWeb/Agente.py
 # (Asegúrate de que 'import os', 'import json' y 'from pydub import AudioSegment' estén al inicio)
 
+def es_wav_para_vosk(ruta_archivo_audio: str) -> bool:
+    """True si el archivo ya es WAV PCM de 16 bits, mono, a 16 kHz (lo que Vosk necesita)."""
+    try:
+        with wave.open(ruta_archivo_audio, "rb") as wf:
+            return (wf.getnchannels() == 1 and wf.getsampwidth() == 2 and wf.getcomptype() == "NONE"
+                    and wf.getframerate() == 16000)
+    except (wave.Error, EOFError, OSError):
+        return False
+
+def decodificar_pcm(pcm: bytes, tasa: int) -> str:
+    """Texto de Vosk para PCM s16le mono (la grabación ya recortada por actividad_voz)."""
+    reconocedor = vosk.KaldiRecognizer(modelo_voz, tasa)
+    for i in range(0, len(pcm), 8000): # 4000 frames de 16 bits
+        reconocedor.AcceptWaveform(pcm[i:i + 8000])
+    return json.loads(reconocedor.FinalResult()).get("text", "").strip()
+
 def transcribir_desde_archivo(ruta_archivo_audio: str) -> str:
     """
-    Toma la ruta de un archivo de audio (webm),
-    lo convierte a WAV 16kHz mono USANDO FFMPEG DIRECTAMENTE (saltando pydub),
-    y lo transcribe con Vosk.
+    Toma la ruta de un archivo de audio. Si ya es WAV 16kHz mono (lo que manda
+    el navegador) va directo a Vosk; si no (webm, ogg...), primero lo convierte
+    USANDO FFMPEG DIRECTAMENTE (saltando pydub).
     """
-    temp_wav = f"{ruta_archivo_audio}_temp.wav"
+    if es_wav_para_vosk(ruta_archivo_audio):
+        # El navegador ya manda WAV 16 kHz mono PCM: se lee tal cual, sin lanzar ffmpeg
+        log.debug("WAV 16 kHz mono recibido: se omite ffmpeg")
+        temp_wav = ruta_archivo_audio
+    else:
+        temp_wav = f"{ruta_archivo_audio}_temp.wav"
     
-    try:
-        # --- INICIO DE LA CONVERSIÓN CON SUBPROCESS (MÉTODO ROBUSTO) ---
-        print(f"[FFMPEG] Intentando convertir {ruta_archivo_audio} a {temp_wav}")
-        
-        # Este es el comando que ejecutarías en la terminal:
-        # ffmpeg -i entrada.webm -ar 16000 -ac 1 -c:a pcm_s16le salida.wav
-        comando = [
-            'ffmpeg',
-            '-i', ruta_archivo_audio,  # Archivo de entrada
-            '-ar', '16000',             # Tasa de muestreo (Audio Rate) a 16kHz
-            '-ac', '1',                 # Canales de audio (Audio Channels) a 1 (Mono)
-            '-c:a', 'pcm_s16le',        # Códec de audio: PCM estándar de 16 bits (perfecto para Vosk)
-            '-y',                       # Sobrescribir el archivo de salida si existe
-            temp_wav
-        ]
+        try:
+            # --- INICIO DE LA CONVERSIÓN CON SUBPROCESS (MÉTODO ROBUSTO) ---
+            log.debug("ffmpeg: convirtiendo %s a %s", ruta_archivo_audio, temp_wav)
         
-        # Ejecutamos el comando
-        subprocess.run(comando, check=True, capture_output=True, text=True)
+            # Este es el comando que ejecutarías en la terminal:
+            # ffmpeg -i entrada.webm -ar 16000 -ac 1 -c:a pcm_s16le salida.wav
+            comando = [
+                'ffmpeg',
+                '-i', ruta_archivo_audio,  # Archivo de entrada
+                '-ar', '16000',             # Tasa de muestreo (Audio Rate) a 16kHz
+                '-ac', '1',                 # Canales de audio (Audio Channels) a 1 (Mono)
+                '-c:a', 'pcm_s16le',        # Códec de audio: PCM estándar de 16 bits (perfecto para Vosk)
+                '-y',                       # Sobrescribir el archivo de salida si existe
+                temp_wav
+            ]
         
-        print(f"[FFMPEG] Conversión a WAV exitosa.")
-        # --- FIN DE LA CONVERSIÓN CON SUBPROCESS ---
-
-    except subprocess.CalledProcessError as e:
-        print(f"[FFMPEG] ¡ERROR FATAL AL CONVERTIR!")
-        print(f"[FFMPEG] Salida de error: {e.stderr}")
-        if os.path.exists(temp_wav):
-            os.remove(temp_wav)
-        return ""
-    except Exception as e:
-        print(f"[PYTHON] Error inesperado al llamar a ffmpeg: {e}")
-        return ""
+            # Ejecutamos el comando
+            with etapa("ffmpeg"):
+                subprocess.run(comando, check=True, capture_output=True, text=True)
+            # --- FIN DE LA CONVERSIÓN CON SUBPROCESS ---
+
+        except subprocess.CalledProcessError as e:
+            log.error("ffmpeg no pudo convertir %s: %s", ruta_archivo_audio, e.stderr)
+            if os.path.exists(temp_wav):
+                os.remove(temp_wav)
+            return ""
+        except Exception as e:
+            log.error("Error inesperado al llamar a ffmpeg: %s", e)
+            return ""
 
     # --- LÓGICA DE VOSK (MÉTODO ROBUSTO CON LIBRERÍA 'wave') ---
     try:
-        print("[VOSK] Abriendo archivo WAV...")
         wf = wave.open(temp_wav, "rb")
 
         # Verificamos que el WAV sea correcto
         if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-            print(f"[VOSK] ¡ERROR! El formato del WAV es incorrecto. Canales: {wf.getnchannels()}, Ancho: {wf.getsampwidth()}")
+            log.error("Formato de WAV incorrecto para Vosk: %s canal(es), %s bytes por muestra",
+                      wf.getnchannels(), wf.getsampwidth())
             wf.close()
-            os.remove(temp_wav)
+            if temp_wav != ruta_archivo_audio:
+                os.remove(temp_wav)
             return ""
         
-        print("[VOSK] Formato WAV correcto (16kHz, Mono, PCM). Empezando transcripción...")
-        
-        reconocedor = vosk.KaldiRecognizer(modelo_voz, wf.getframerate())
-        
-        while True:
-            datos = wf.readframes(4000) # Leemos frames
-            if len(datos) == 0:
-                break
-            reconocedor.AcceptWaveform(datos)
-
-        resultado = json.loads(reconocedor.FinalResult())
-        texto_total = resultado.get("text", "").strip()
-        
-        print("[VOSK] Transcripción finalizada.")
+        pcm = wf.readframes(wf.getnframes())
+        if USAR_VAD:
+            # Vosk solo decodifica los tramos con voz: el costo sigue a lo hablado, no a la grabación
+            with etapa("vad"):
+                pcm, info_vad = recortar_silencios(pcm, wf.getframerate())
+            if info_vad["recortado"]:
+                log.debug("VAD: %s s -> %s s de voz en %s tramo(s)",
+                          info_vad["original_s"], info_vad["voz_s"], info_vad["tramos"])
+            else:
+                log.debug("VAD: sin tramos de voz claros en %s s; se transcribe completo", info_vad["original_s"])
+
+        with etapa("vosk"):
+            texto_total = decodificar_pcm(pcm, wf.getframerate())
         wf.close()
 
     except Exception as e:
-        print(f"[VOSK] ¡ERROR FATAL AL TRANSCRIBIR! {e}")
+        log.error("Vosk no pudo transcribir %s: %s", temp_wav, e)
         return ""
     # --- FIN VOSK ---
 
     # 3. Limpiar
     try:
-        if os.path.exists(temp_wav):
+        if temp_wav != ruta_archivo_audio and os.path.exists(temp_wav):
             os.remove(temp_wav) 
     except Exception:
         pass
         
-    print(f"🎤 Texto transcrito: {texto_total}")
+    # El texto es lo que dijo el usuario: solo en nivel DEBUG
+    log.debug("Texto transcrito: %s", texto_total)
     return texto_total.lower()
 # --- Llamada a Gemma (ESTA SE QUEDA IGUAL) ---
 def _call_gemma_ollama(prompt: str) -> str:
@@ -157,7 +189,7 @@ def _call_gemma_ollama(prompt: str) -> str:
     usando una petición HTTP.
     """
     
-    ollama_url = "http://localhost:11434/api/generate"
+    ollama_url = OLLAMA_URL
 
     payload = {
         "model": "gemma:2b", # O el modelo que uses
@@ -214,7 +246,8 @@ def interpretar_con_gemma(texto: str) -> Dict[str, Optional[str]]:
     user = f"Orden: {texto}\nResponde solo con el JSON."
     prompt = f"{system}\n\n{ejemplos}\n\n{user}"
 
-    salida = _call_gemma_ollama(prompt)
+    with etapa("gemma"):
+        salida = _call_gemma_ollama(prompt)
 
     # Extraer JSON
     m = re.search(r"\{.*\}", salida, re.DOTALL)
@@ -0,0 +1,187 @@
+# activos.py — Pipeline de archivos estáticos (huella de contenido + precompresión)
+#
+# Paso de construcción:   python activos.py
+#   Copia static/ a static/dist/ con nombres "archivo.<hash>.ext", escribe las
+#   variantes .gz / .br de los archivos comprimibles y un manifest.json.
+# En la app:              {{ activo('img/LOGO.svg') }} dentro de las plantillas
+#   Devuelve la URL con huella si el archivo está en el manifiesto; si no, cae a
+#   url_for('static', ...) para que la app funcione sin haber construido nada.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import Blueprint, abort, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_STATIC = os.path.join(APP_DIR, "static")
+DIR_DIST = os.path.join(DIR_STATIC, "dist")
+RUTA_MANIFIESTO = os.path.join(DIR_DIST, "manifest.json")
+
+# Formatos de texto que sí vale la pena comprimir (PNG/JPG ya vienen comprimidos)
+EXT_COMPRIMIBLES = {".svg", ".css", ".js", ".json", ".html", ".txt", ".pdf", ".csv"}
+# Solo guardamos la variante si ahorra al menos 10 %
+UMBRAL_AHORRO = 0.90
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+bp = Blueprint("activos", __name__)
+
+# ================================ Construcción ================================
+def _huella(datos: bytes) -> str:
+    return hashlib.sha256(datos).hexdigest()[:12]
+
+def _nombre_con_huella(relativa: str, huella: str) -> str:
+    base, ext = os.path.splitext(relativa)
+    return f"{base}.{huella}{ext}"
+
+def _reescribir_urls_css(css: str, relativa_css: str, manifiesto: dict) -> str:
+    """Cambia url(./img/x.svg) por url(./img/x.<hash>.svg) cuando el destino existe."""
+    carpeta = os.path.dirname(relativa_css)
+
+    def _sustituir(m):
+        comilla, destino = m.group(1), m.group(2)
+        if re.match(r"^(https?:|data:|//|#)", destino):
+            return m.group(0)
+        logica = os.path.normpath(os.path.join(carpeta, destino)).replace(os.sep, "/")
+        if logica not in manifiesto:
+            return m.group(0)
+        prefijo = "./" if destino.startswith("./") else ""
+        nuevo = os.path.relpath(manifiesto[logica], carpeta or ".").replace(os.sep, "/")
+        return f"url({comilla}{prefijo}{nuevo}{comilla})"
+
+    return re.sub(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)", _sustituir, css)
+
+def _escribir_variantes(ruta_destino: str, datos: bytes) -> list:
+    variantes = []
+    comprimido = gzip.compress(datos, compresslevel=9, mtime=0)
+    if len(comprimido) <= len(datos) * UMBRAL_AHORRO:
+        with open(ruta_destino + ".gz", "wb") as f:
+            f.write(comprimido)
+        variantes.append("gz")
+    if brotli is not None:
+        comprimido = brotli.compress(datos, quality=11)
+        if len(comprimido) <= len(datos) * UMBRAL_AHORRO:
+            with open(ruta_destino + ".br", "wb") as f:
+                f.write(comprimido)
+            variantes.append("br")
+    return variantes
+
+def construir(origen: str = DIR_STATIC, destino: str = DIR_DIST) -> dict:
+    """Genera static/dist/ y devuelve el manifiesto {ruta lógica: ruta con huella}."""
+    if os.path.isdir(destino):
+        shutil.rmtree(destino)
+    os.makedirs(destino)
+
+    archivos = []
+    for raiz, dirs, nombres in os.walk(origen):
+        if os.path.abspath(raiz).startswith(os.path.abspath(destino)):
+            continue
+        for nombre in nombres:
+            completa = os.path.join(raiz, nombre)
+            archivos.append(os.path.relpath(completa, origen).replace(os.sep, "/"))
+
+    # Las hojas de estilo van al final: sus url(...) apuntan a archivos ya procesados
+    archivos.sort(key=lambda r: (r.endswith(".css"), r))
+
+    manifiesto, variantes, total_orig, total_gz = {}, {}, 0, 0
+    for relativa in archivos:
+        with open(os.path.join(origen, relativa), "rb") as f:
+            datos = f.read()
+        if relativa.endswith(".css"):
+            datos = _reescribir_urls_css(datos.decode("utf-8"), relativa, manifiesto).encode("utf-8")
+
+        con_huella = _nombre_con_huella(relativa, _huella(datos))
+        ruta_destino = os.path.join(destino, con_huella)
+        os.makedirs(os.path.dirname(ruta_destino), exist_ok=True)
+        with open(ruta_destino, "wb") as f:
+            f.write(datos)
+
+        manifiesto[relativa] = con_huella
+        if os.path.splitext(relativa)[1].lower() in EXT_COMPRIMIBLES:
+            variantes[con_huella] = _escribir_variantes(ruta_destino, datos)
+            total_orig += len(datos)
+            if "gz" in variantes[con_huella]:
+                total_gz += os.path.getsize(ruta_destino + ".gz")
+            else:
+                total_gz += len(datos)
+
+    with open(os.path.join(destino, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"archivos": manifiesto, "variantes": variantes}, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    print(f"[ACTIVOS] {len(manifiesto)} archivos en {destino}")
+    print(f"[ACTIVOS] Texto comprimible: {total_orig / 1024:.0f} KB -> {total_gz / 1024:.0f} KB con gzip"
+          + ("" if brotli else " (brotli no instalado, se omiten .br)"))
+    return manifiesto
+
+# ================================ Servir en Flask =============================
+_manifiesto = {"archivos": {}, "variantes": {}}
+_servibles = set()
+
+def cargar_manifiesto(ruta: str = RUTA_MANIFIESTO) -> dict:
+    global _manifiesto, _servibles
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            _manifiesto = json.load(f)
+    except (OSError, ValueError):
+        _manifiesto = {"archivos": {}, "variantes": {}}
+    _servibles = set(_manifiesto["archivos"].values())
+    return _manifiesto
+
+def activo(filename: str) -> str:
+    """URL con huella para un archivo de static/ (o la URL normal si no se construyó)."""
+    con_huella = _manifiesto["archivos"].get(filename)
+    if con_huella is None:
+        return url_for("static", filename=filename)
+    return url_for("activos.servir", ruta=con_huella)
+
+def acepta_codificacion(codificacion: str) -> float:
+    """Calidad (q) que la petición actual da a una codificación; 0 si no la acepta.
+
+    Respeta q=0 explícito ("gzip;q=0") y comodines ("*"), a diferencia de buscar
+    la palabra dentro de la cabecera.
+    """
+    return request.accept_encodings[codificacion]
+
+def _elegir_codificacion(ruta: str) -> str:
+    disponibles = _manifiesto["variantes"].get(ruta, [])
+    mejor, mejor_q = "", 0.0
+    # A igual calidad gana brotli (va primero)
+    for cod in ("br", "gz"):
+        q = acepta_codificacion("gzip" if cod == "gz" else cod) if cod in disponibles else 0.0
+        if q > mejor_q:
+            mejor, mejor_q = cod, q
+    return mejor
+
+@bp.route("/activos/<path:ruta>")
+def servir(ruta):
+    if ruta not in _servibles:
+        abort(404)
+    completa = os.path.join(DIR_DIST, ruta)
+    if not os.path.isfile(completa):
+        abort(404)
+
+    cod = _elegir_codificacion(ruta)
+    mimetype = mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+    resp = send_file(completa + (f".{cod}" if cod else ""), mimetype=mimetype, conditional=True, etag=True)
+    resp.headers.pop("Content-Disposition", None)
+    if cod:
+        resp.headers["Content-Encoding"] = "gzip" if cod == "gz" else "br"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = CACHE_INMUTABLE
+    return resp
+
+def init_app(app):
+    cargar_manifiesto()
+    app.register_blueprint(bp)
+    app.jinja_env.globals["activo"] = activo
+
+if __name__ == "__main__":
+    construir()
@@ -0,0 +1,303 @@
+# admision.py — Control de admisión y prioridades para el trabajo caro
+#
+#   admision.init_app(app)                 # clasifica cada petición por endpoint
+#   with admision.cupo("entrenamiento"):   # o un cupo dentro del código (Prediccion en frío)
+#       ...
+#
+# Las páginas baratas (/, /about, /reporte, estáticos, ...) nunca esperan. Las
+# peticiones caras se agrupan en clases, cada una con su límite de concurrencia y
+# su cola acotada:
+#   calculo        /generar y /reporte/generar
+#   voz            /procesar-voz (el hilo web que espera la inferencia)
+#   lote           /api/recomendaciones/lote
+#   exportacion    /api/exportacion/adecuacion (ocupa su cupo minutos, mientras se descarga)
+#   en_vivo        /disp-monit/stream (SSE: ocupa su hilo mientras la pestaña esté abierta;
+#                  sin cola, hasta los hilos del worker menos dos)
+#   entrenamiento  Prediccion en frío (cupo interno, sin contar en la capacidad total)
+#   inferencia_voz Vosk + Gemma, lo comparten /procesar-voz y los trabajos de
+#                  /procesar-voz/trabajos (cupo interno, sin contar en la capacidad
+#                  total: los trabajos corren en hilos propios, no en los del worker)
+# Entre todas las clases de endpoint no pueden pasar de CAPACIDAD a la vez (por
+# defecto, los hilos del worker menos uno), así siempre queda un hilo libre para
+# una página. Cuando se libera lugar entra primero la clase de mayor prioridad y,
+# dentro de ella, la que llegó antes; los hilos marcados como de fondo (precarga,
+# lotes) van detrás de cualquier petición real, salvo que una petición real esté
+# esperando su resultado (single-flight, ver esperando_a): entonces heredan su
+# prioridad para no dejarla atorada detrás de otras. Si la cola de una clase está
+# llena, o la espera pasa de su máximo, la petición se rechaza de inmediato con
+# 503 y Retry-After en vez de acumular hilos bloqueados.
+#
+# Los límites son por proceso (cada worker de gunicorn tiene los suyos);
+# servidor.py ajusta CAPACIDAD y el límite de en_vivo a sus --threads con ajustar_a_hilos().
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from flask import g, jsonify, request
+
+from metricas import contador, histograma
+
+@dataclass
+class Clase:
+    limite: int            # peticiones de la clase a la vez
+    cola: int              # máximo de peticiones esperando
+    espera_max_s: float    # más que esto en cola: 503
+    prioridad: int         # menor = entra primero
+    reintentar_s: int      # Retry-After al rechazar
+    en_total: bool = True  # cuenta contra CAPACIDAD (los cupos anidados no)
+
+def _clase(nombre: str, limite: int, cola: int, espera_max_s: float, prioridad: int, reintentar_s: int,
+           en_total: bool = True) -> Clase:
+    # SIEMBRA_ADMISION_<CLASE>="limite,cola" permite ajustar cada clase sin tocar código
+    valor = os.environ.get(f"SIEMBRA_ADMISION_{nombre.upper()}")
+    if valor:
+        limite, cola = (int(x) for x in valor.split(","))
+    return Clase(limite, cola, espera_max_s, prioridad, reintentar_s, en_total)
+
+def _capacidad(hilos: int) -> int:
+    # SIEMBRA_ADMISION_CAPACIDAD manda; si no, un hilo del worker queda libre para las páginas
+    return int(os.environ.get("SIEMBRA_ADMISION_CAPACIDAD", max(1, hilos - 1)))
+
+def _limite_en_vivo(hilos: int) -> int:
+    # Cada stream SSE retiene un hilo: al menos dos quedan para páginas y cálculos
+    return max(1, hilos - 2)
+
+HILOS = int(os.environ.get("SIEMBRA_THREADS", "4"))
+CLASES: Dict[str, Clase] = {
+    "calculo":        _clase("calculo", 3, 16, 10.0, 1, 5),
+    "voz":            _clase("voz", 1, 4, 30.0, 2, 10),
+    "lote":           _clase("lote", 1, 2, 30.0, 3, 30),
+    "exportacion":    _clase("exportacion", 1, 1, 5.0, 4, 60),
+    "en_vivo":        _clase("en_vivo", _limite_en_vivo(HILOS), 0, 0.0, 4, 30),
+    "entrenamiento":  _clase("entrenamiento", 1, 8, 60.0, 1, 15, en_total=False),
+    "inferencia_voz": _clase("inferencia_voz", 1, 8, 30.0, 2, 10, en_total=False),
+}
+ENDPOINTS = {
+    "inicio.generar": "calculo",
+    "reporte.generar_reporte": "calculo",
+    "inicio.procesar_voz_endpoint": "voz",
+    "inicio.recomendaciones_en_lote": "lote",
+    "exportacion.adecuacion": "exportacion",
+    "disp_monit.stream": "en_vivo",
+}
+CAPACIDAD = _capacidad(HILOS)
+# Los hilos de fondo esperan detrás de cualquier petición real de la misma clase
+PENALIZACION_FONDO = 10
+
+ESPERAS = histograma("siembra_admision_espera_segundos", "Tiempo en cola antes de ser admitido, por clase",
+                     (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+RECHAZOS = contador("siembra_admision_rechazos_total", "Peticiones rechazadas por clase y motivo (cola, espera)")
+
+class Rechazada(RuntimeError):
+    def __init__(self, clase: str, motivo: str, reintentar_s: int):
+        super().__init__(f"{clase}: {motivo}")
+        self.clase, self.motivo, self.reintentar_s = clase, motivo, reintentar_s
+
+# ============================== Planificador =================================
+_hilo = threading.local()
+
+def marcar_hilo_de_fondo():
+    """Para initializer= de los ejecutores de trabajo especulativo o por lotes."""
+    _hilo.fondo = True
+
+def es_hilo_de_fondo() -> bool:
+    return getattr(_hilo, "fondo", False)
+
+class _Turno:
+    __slots__ = ("clase", "base", "fondo", "hilo", "llegada", "prioridad")
+
+    def __init__(self, clase: str, base: int, fondo: bool, llegada: int):
+        self.clase, self.base, self.fondo, self.llegada = clase, base, fondo, llegada
+        self.hilo = threading.get_ident()
+        self.prioridad = base
+
+    def __lt__(self, otro: "_Turno") -> bool:
+        return (self.prioridad, self.llegada) < (otro.prioridad, otro.llegada)
+
+class Planificador:
+    def __init__(self, clases: Dict[str, Clase], capacidad: int):
+        self.clases = clases
+        self.capacidad = capacidad
+        self._cond = threading.Condition()
+        self._en_curso = {nombre: 0 for nombre in clases}
+        self._total = 0
+        self._esperando = []  # _Turno, ordenada por (prioridad, llegada)
+        self._llegadas = itertools.count()
+        # hilo de fondo -> cuántas peticiones reales esperan lo que él calcula
+        self._urgidos: Counter = Counter()
+
+    def _prioridad(self, turno: _Turno) -> int:
+        penalizado = turno.fondo and turno.hilo not in self._urgidos
+        return turno.base + (PENALIZACION_FONDO if penalizado else 0)
+
+    def _hay_lugar(self, nombre: str) -> bool:
+        clase = self.clases[nombre]
+        return self._en_curso[nombre] < clase.limite and (not clase.en_total or self._total < self.capacidad)
+
+    def _es_su_turno(self, turno) -> bool:
+        # Entra el primero de la fila cuya clase tenga lugar
+        for otro in self._esperando:
+            if self._hay_lugar(otro.clase):
+                return otro is turno
+        return False
+
+    def entrar(self, nombre: str, espera_max_s: Optional[float] = None) -> float:
+        """Bloquea hasta tener lugar; devuelve los segundos en cola o lanza Rechazada.
+
+        espera_max_s reemplaza la espera máxima de la clase (p. ej. para trabajos en segundo plano).
+        """
+        clase = self.clases[nombre]
+        inicio = time.perf_counter()
+        with self._cond:
+            # Sin nadie en la fila que pueda entrar ya, no hay a quién ceder el lugar
+            if self._hay_lugar(nombre) and not any(self._hay_lugar(t.clase) for t in self._esperando):
+                self._ocupar(nombre)
+                return 0.0
+            if sum(1 for t in self._esperando if t.clase == nombre) >= clase.cola:
+                RECHAZOS.incrementar(clase=nombre, motivo="cola")
+                raise Rechazada(nombre, "cola llena", clase.reintentar_s)
+            turno = _Turno(nombre, clase.prioridad, es_hilo_de_fondo(), next(self._llegadas))
+            turno.prioridad = self._prioridad(turno)
+            self._esperando.append(turno)
+            self._esperando.sort()
+            espera = clase.espera_max_s if espera_max_s is None else espera_max_s
+            admitido = self._cond.wait_for(lambda: self._es_su_turno(turno), timeout=espera)
+            self._esperando.remove(turno)
+            if not admitido:
+                self._cond.notify_all()
+                RECHAZOS.incrementar(clase=nombre, motivo="espera")
+                raise Rechazada(nombre, "espera agotada", clase.reintentar_s)
+            self._ocupar(nombre)
+            # Puede haber lugar para el siguiente de la fila (otra clase, u otro cupo libre)
+            self._cond.notify_all()
+        return time.perf_counter() - inicio
+
+    def _ocupar(self, nombre: str):
+        self._en_curso[nombre] += 1
+        if self.clases[nombre].en_total:
+            self._total += 1
+
+    def salir(self, nombre: str):
+        with self._cond:
+            self._en_curso[nombre] -= 1
+            if self.clases[nombre].en_total:
+                self._total -= 1
+            self._cond.notify_all()
+
+    def urgir(self, hilo: int, delta: int):
+        """Suma (o resta) peticiones reales que esperan a `hilo`; mientras haya alguna,
+        ese hilo no lleva la penalización de fondo, tampoco si ya está en la fila."""
+        with self._cond:
+            self._urgidos[hilo] += delta
+            if self._urgidos[hilo] <= 0:
+                del self._urgidos[hilo]
+            cambio = False
+            for turno in self._esperando:
+                if turno.hilo == hilo:
+                    nueva = self._prioridad(turno)
+                    if nueva != turno.prioridad:
+                        turno.prioridad, cambio = nueva, True
+            if cambio:
+                self._esperando.sort()
+                self._cond.notify_all()
+
+    @contextmanager
+    def esperando_a(self, hilo: int):
+        """El hilo actual espera un resultado que calcula `hilo` (single-flight).
+
+        Si el actual es una petición real, `hilo` hereda su prioridad mientras dure la
+        espera: una precarga o un lote que va a la cabeza de un cálculo compartido no
+        debe dejar a la petición atorada detrás de otras en la fila de entrenamiento.
+        """
+        if es_hilo_de_fondo() or hilo == threading.get_ident():
+            yield
+            return
+        self.urgir(hilo, 1)
+        try:
+            yield
+        finally:
+            self.urgir(hilo, -1)
+
+    def estado(self) -> dict:
+        with self._cond:
+            return {"capacidad": self.capacidad, "en_curso_total": self._total,
+                    "urgidos": len(self._urgidos),
+                    "clases": {n: {"en_curso": self._en_curso[n],
+                                   "en_cola": sum(1 for t in self._esperando if t.clase == n),
+                                   "limite": c.limite, "cola": c.cola, "prioridad": c.prioridad}
+                               for n, c in self.clases.items()}}
+
+planificador = Planificador(CLASES, CAPACIDAD)
+
+def ajustar_a_hilos(hilos: int):
+    """Capacidad y streams en vivo según los hilos reales del worker (servidor.py --threads)."""
+    planificador.capacidad = _capacidad(hilos)
+    en_vivo = planificador.clases.get("en_vivo")
+    if en_vivo is not None and not os.environ.get("SIEMBRA_ADMISION_EN_VIVO"):
+        en_vivo.limite = _limite_en_vivo(hilos)
+
+def esperando_a(hilo: int):
+    """Para al_esperar= de coalescencia: el líder hereda la prioridad de quien lo espera."""
+    return planificador.esperando_a(hilo)
+
+def _admitir(nombre: str, espera_max_s: Optional[float] = None):
+    espera = planificador.entrar(nombre, espera_max_s)
+    ESPERAS.observar(espera, clase=nombre)
+
+@contextmanager
+def cupo(nombre: str, espera_max_s: Optional[float] = None):
+    _admitir(nombre, espera_max_s)
+    try:
+        yield
+    finally:
+        planificador.salir(nombre)
+
+# ============================ Integración Flask ==============================
+class _Admision:
+    """Cupo de una petición: se libera una sola vez, al cerrar la respuesta o en el teardown."""
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._liberado = False
+
+    def liberar(self):
+        if not self._liberado:
+            self._liberado = True
+            planificador.salir(self.nombre)
+
+def _antes():
+    nombre = ENDPOINTS.get(request.endpoint)
+    if nombre is None:
+        return None
+    _admitir(nombre)
+    g.admision = _Admision(nombre)
+    return None
+
+def _despues(resp):
+    admision: Optional[_Admision] = g.get("admision")
+    if admision is not None and resp.is_streamed:
+        # Una respuesta en streaming (exportación, SSE) ocupa el cupo hasta terminar de enviarse
+        resp.call_on_close(admision.liberar)
+        g.admision_diferida = True
+    return resp
+
+def _al_terminar(_error):
+    admision: Optional[_Admision] = g.get("admision")
+    if admision is not None and not g.get("admision_diferida"):
+        admision.liberar()
+
+def _rechazo(e: Rechazada):
+    resp = jsonify({"error": "Servidor ocupado, intenta de nuevo en unos segundos", "clase": e.clase})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(e.reintentar_s)
+    return resp
+
+def init_app(app):
+    app.before_request(_antes)
+    app.after_request(_despues)
+    app.teardown_request(_al_terminar)
+    app.register_error_handler(Rechazada, _rechazo)
@@ -0,0 +1,154 @@
+# agregados_clima.py — Consultas por rango sobre las series de Datos/ en tiempo constante
+#
+#   serie = serie_agregable("Estados", "Jalisco", "lluvia")
+#   serie.consultar(2015, 2020, 6, 9)   # media/mín/máx/anomalía de jun–sep de 2015 a 2020
+#
+# Cada serie (lugar × variable) es una matriz años × 12 meses. Al construirla se
+# precalculan:
+#   - sumas de prefijos 2D de los valores y de la cantidad de celdas con dato, así
+#     la suma y el conteo de cualquier rectángulo años × meses salen con 4 lecturas;
+#   - para cada rango de meses, una sparse table sobre los años con el mínimo y el
+#     máximo, así el mín/máx de cualquier rango de años sale con 2 lecturas.
+# Un rango de meses que da la vuelta (nov–feb) se parte en dos rectángulos del
+# mismo año calendario. La anomalía es la media del rango menos la media de los
+# mismos meses en el periodo base (por defecto, todo el registro).
+#
+# Memoria: ~0.1 MB por serie (las sparse tables son 12 × 12 × log2(años) × años).
+# Datos/ tiene ~480 series, ~48 MB por worker si se tocaran todas (la exportación
+# completa lo hace), así que se guardan a lo más MAX_SERIES (SIEMBRA_AGREGADOS_MAX,
+# 256 ≈ 25 MB) y se desaloja la menos usada; reconstruir una cuesta ~4 ms.
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from datos_clima import normalizar_lugar, series_lugar
+
+class SerieAgregable:
+    def __init__(self, tabla):
+        """tabla: DataFrame índice Mes 1..12 × columnas año (como las de datos_clima.series_lugar)."""
+        anios = [int(a) for a in tabla.columns]
+        self.anio_inicial, self.anio_final = min(anios), max(anios)
+        # Años faltantes en medio (p. ej. 2018–2019 en algunos estados) quedan como filas sin dato
+        todos = range(self.anio_inicial, self.anio_final + 1)
+        m = tabla.reindex(columns=list(todos)).to_numpy(dtype=np.float64).T  # años × meses
+        validos = np.isfinite(m)
+        n_anios = len(todos)
+
+        self._suma = np.zeros((n_anios + 1, 13))
+        self._suma[1:, 1:] = np.where(validos, m, 0.0).cumsum(0).cumsum(1)
+        self._cuenta = np.zeros((n_anios + 1, 13), dtype=np.int64)
+        self._cuenta[1:, 1:] = validos.cumsum(0).cumsum(1)
+
+        # _minimo[m0, m1, k, i]: mínimo de los años i .. i + 2^k - 1 en los meses m0..m1
+        niveles = max(1, int(np.log2(n_anios)) + 1)
+        self._minimo = np.full((12, 12, niveles, n_anios), np.nan)
+        self._maximo = np.full((12, 12, niveles, n_anios), np.nan)
+        for m0 in range(12):
+            # fmin/fmax ignoran NaN: un año sin dato en un mes no anula el rango
+            self._minimo[m0, m0:, 0, :] = np.fmin.accumulate(m[:, m0:], axis=1).T
+            self._maximo[m0, m0:, 0, :] = np.fmax.accumulate(m[:, m0:], axis=1).T
+        for k in range(1, niveles):
+            paso = 1 << (k - 1)
+            ancho = n_anios - (1 << k) + 1
+            self._minimo[:, :, k, :ancho] = np.fmin(self._minimo[:, :, k - 1, :ancho],
+                                                    self._minimo[:, :, k - 1, paso:paso + ancho])
+            self._maximo[:, :, k, :ancho] = np.fmax(self._maximo[:, :, k - 1, :ancho],
+                                                    self._maximo[:, :, k - 1, paso:paso + ancho])
+
+    # ------------------------------------------------------------ primitivas ---
+    def _rectangulo(self, a0: int, a1: int, m0: int, m1: int) -> Tuple[float, int]:
+        """Suma y conteo de años a0..a1 (índices) × meses m0..m1 (0..11), inclusive."""
+        s, c = self._suma, self._cuenta
+        suma = s[a1 + 1, m1 + 1] - s[a0, m1 + 1] - s[a1 + 1, m0] + s[a0, m0]
+        cuenta = c[a1 + 1, m1 + 1] - c[a0, m1 + 1] - c[a1 + 1, m0] + c[a0, m0]
+        return float(suma), int(cuenta)
+
+    def _extremos(self, a0: int, a1: int, m0: int, m1: int) -> Tuple[float, float]:
+        k = int(a1 - a0 + 1).bit_length() - 1
+        j = a1 - (1 << k) + 1
+        minimo = np.fmin(self._minimo[m0, m1, k, a0], self._minimo[m0, m1, k, j])
+        maximo = np.fmax(self._maximo[m0, m1, k, a0], self._maximo[m0, m1, k, j])
+        return float(minimo), float(maximo)
+
+    def _tramos(self, mes_desde: int, mes_hasta: int):
+        if mes_desde <= mes_hasta:
+            return [(mes_desde - 1, mes_hasta - 1)]
+        return [(mes_desde - 1, 11), (0, mes_hasta - 1)]
+
+    def _indices(self, desde: int, hasta: int) -> Optional[Tuple[int, int]]:
+        desde, hasta = max(desde, self.anio_inicial), min(hasta, self.anio_final)
+        if desde > hasta:
+            return None
+        return desde - self.anio_inicial, hasta - self.anio_inicial
+
+    def _media(self, desde: int, hasta: int, tramos) -> Tuple[Optional[float], int, float]:
+        indices = self._indices(desde, hasta)
+        if indices is None:
+            return None, 0, 0.0
+        suma, cuenta = 0.0, 0
+        for m0, m1 in tramos:
+            s, c = self._rectangulo(*indices, m0, m1)
+            suma, cuenta = suma + s, cuenta + c
+        return (suma / cuenta if cuenta else None), cuenta, suma
+
+    # ---------------------------------------------------------------- consulta ---
+    def consultar(self, desde: int, hasta: int, mes_desde: int = 1, mes_hasta: int = 12,
+                  base_desde: Optional[int] = None, base_hasta: Optional[int] = None) -> dict:
+        tramos = self._tramos(mes_desde, mes_hasta)
+        indices = self._indices(desde, hasta)
+        media, cuenta, suma = self._media(desde, hasta, tramos)
+        minimo = maximo = None
+        if indices is not None and cuenta:
+            extremos = [self._extremos(*indices, m0, m1) for m0, m1 in tramos]
+            minimo = float(np.fmin.reduce([e[0] for e in extremos]))
+            maximo = float(np.fmax.reduce([e[1] for e in extremos]))
+
+        base_desde = self.anio_inicial if base_desde is None else base_desde
+        base_hasta = self.anio_final if base_hasta is None else base_hasta
+        climatologia, _, _ = self._media(base_desde, base_hasta, tramos)
+
+        celdas = 0
+        if indices is not None:
+            celdas = (indices[1] - indices[0] + 1) * sum(m1 - m0 + 1 for m0, m1 in tramos)
+        redondear = lambda x: None if x is None else round(x, 3)
+        return {
+            "media": redondear(media), "min": redondear(minimo), "max": redondear(maximo),
+            "suma": redondear(suma) if cuenta else None, "n": cuenta, "celdas_sin_dato": celdas - cuenta,
+            "climatologia": redondear(climatologia),
+            "anomalia": redondear(media - climatologia) if media is not None and climatologia is not None else None,
+            "periodo": [max(desde, self.anio_inicial), min(hasta, self.anio_final)],
+            "periodo_base": [max(base_desde, self.anio_inicial), min(base_hasta, self.anio_final)],
+        }
+
+# ============================ Índice por lugar ===============================
+MAX_SERIES = int(os.environ.get("SIEMBRA_AGREGADOS_MAX", "256"))
+
+_SERIES: Dict[Tuple[str, str, str], SerieAgregable] = OrderedDict()
+_lock = threading.Lock()
+
+def serie_agregable(ruta: str, lugar: str, variable: str) -> Optional[SerieAgregable]:
+    """Se construye la primera vez que se consulta y queda en memoria (LRU de MAX_SERIES)."""
+    clave = (ruta, normalizar_lugar(lugar), variable)
+    with _lock:
+        serie = _SERIES.get(clave)
+        if serie is not None:
+            _SERIES.move_to_end(clave)
+            return serie
+    tabla = series_lugar(ruta, lugar).get(variable)
+    if tabla is None or tabla.shape[1] == 0:
+        return None
+    serie = SerieAgregable(tabla)
+    with _lock:
+        serie = _SERIES.setdefault(clave, serie)
+        _SERIES.move_to_end(clave)
+        while len(_SERIES) > MAX_SERIES:
+            _SERIES.popitem(last=False)
+    return serie
+
+def variables_lugar(ruta: str, lugar: str) -> Dict[str, list]:
+    """{variable: [primer año, último año]} de un lugar."""
+    return {v: [int(t.columns.min()), int(t.columns.max())]
+            for v, t in series_lugar(ruta, lugar).items() if t.shape[1]}
@@ -5,6 +5,12 @@ from app_inicio import bp as inicio_bp
 from app_about import bp as about_bp
 from app_disp_monit import bp as disp_bp
 from app_reporte import bp as reporte_bp
+from app_operacion import bp as operacion_bp
+from app_clima import bp as clima_bp
+from app_exportacion import bp as exportacion_bp
+import activos
+import admision
+import metricas
 
 def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -13,6 +19,12 @@ def create_app():
     app.register_blueprint(about_bp, url_prefix="")  # "/about"
     app.register_blueprint(disp_bp, url_prefix="")   # "/disp-monit"
     app.register_blueprint(reporte_bp, url_prefix="")# "/reporte"
+    app.register_blueprint(operacion_bp)             # "/operacion/..."
+    app.register_blueprint(clima_bp)                 # "/api/clima/..."
+    app.register_blueprint(exportacion_bp)           # "/api/exportacion/..."
+    activos.init_app(app)                            # "/activos/<archivo con huella>"
+    metricas.init_app(app)                           # Server-Timing + histogramas para /metrics
+    admision.init_app(app)                           # Límites y colas por clase de petición (503 al saturarse)
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+# app_clima.py — Blueprint con la API de consultas históricas sobre Datos/
+from flask import Blueprint, request, jsonify
+
+from agregados_clima import serie_agregable, variables_lugar
+from datos_clima import normalizar_lugar
+
+bp = Blueprint("clima", __name__)
+
+MESES = ("ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO",
+         "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE")
+MAX_LUGARES = 100
+
+def _mes(texto, defecto: int) -> int:
+    if texto is None or texto == "":
+        return defecto
+    if texto.isdigit() and 1 <= int(texto) <= 12:
+        return int(texto)
+    nombre = normalizar_lugar(texto)
+    for i, mes in enumerate(MESES, start=1):
+        if mes.startswith(nombre) and len(nombre) >= 3:
+            return i
+    raise ValueError(f"mes inválido: {texto}")
+
+def _entero(nombre: str, defecto=None):
+    valor = request.args.get(nombre)
+    return defecto if valor in (None, "") else int(valor)
+
+@bp.route("/api/clima/agregado", methods=["GET"])
+def agregado():
+    """?ruta=Estados&lugar=Jalisco&variable=lluvia&desde=2015&hasta=2020&mes_desde=6&mes_hasta=9
+
+    lugar puede repetirse. Opcionales: base_desde/base_hasta (periodo de la climatología).
+    """
+    ruta = request.args.get("ruta", "Estados")
+    variable = request.args.get("variable", "")
+    lugares = request.args.getlist("lugar")
+    try:
+        desde, hasta = _entero("desde", 0), _entero("hasta", 9999)
+        base_desde, base_hasta = _entero("base_desde"), _entero("base_hasta")
+        mes_desde = _mes(request.args.get("mes_desde"), 1)
+        mes_hasta = _mes(request.args.get("mes_hasta"), 12)
+    except ValueError as e:
+        return jsonify({"error": str(e) if "mes" in str(e) else "desde/hasta deben ser años"}), 400
+    if ruta not in ("Estados", "Municipios") or not variable or not lugares:
+        return jsonify({"error": "ruta (Estados/Municipios), lugar y variable son obligatorios"}), 400
+    if len(lugares) > MAX_LUGARES:
+        return jsonify({"error": f"máximo {MAX_LUGARES} lugares por consulta"}), 400
+
+    resultados = []
+    for lugar in lugares:
+        serie = serie_agregable(ruta, lugar, variable)
+        if serie is None:
+            resultados.append({"lugar": lugar, "error": "sin datos",
+                               "variables": sorted(variables_lugar(ruta, lugar))})
+            continue
+        resultados.append({"lugar": lugar, **serie.consultar(desde, hasta, mes_desde, mes_hasta,
+                                                             base_desde, base_hasta)})
+    return jsonify({"ruta": ruta, "variable": variable, "meses": [mes_desde, mes_hasta], "resultados": resultados})
+
+@bp.route("/api/clima/variables", methods=["GET"])
+def variables():
+    ruta = request.args.get("ruta", "Estados")
+    lugar = request.args.get("lugar", "")
+    return jsonify({"ruta": ruta, "lugar": lugar, "variables": variables_lugar(ruta, lugar)})
@@ -1,8 +1,95 @@
-
 # app_disp_monit.py — Blueprint para "Dispositivos y Monitoreo"
-from flask import Blueprint, render_template
+import json
+import os
+import time
+from functools import wraps
+
+from flask import Blueprint, Response, render_template, request, jsonify, abort
+
+from difusor import Difusor, Saturado
+from telemetria import RESOLUCIONES, VARIABLES, LoteInvalido, almacen, decodificar_binario, decodificar_json, leer_instante
+
 bp = Blueprint("disp_monit", __name__)
 
+# Tope del difusor por proceso. Como cada conexión SSE retiene un hilo del worker, el
+# límite que manda es la clase "en_vivo" de admision.py (los hilos del worker menos dos,
+# contados contra CAPACIDAD); más allá, 503 con Retry-After antes de llegar aquí.
+MAX_SUSCRIPTORES = int(os.environ.get("SIEMBRA_SSE_MAX", "16"))
+INTERVALO_TICK_S = 2.0
+LATIDO_S = 15.0
+
+# Si está definida, los dispositivos deben mandar la cabecera X-Dispositivo-Token
+TOKEN_DISPOSITIVOS = os.environ.get("SIEMBRA_TOKEN_DISPOSITIVOS")
+
+def solo_dispositivos(vista):
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if TOKEN_DISPOSITIVOS and request.headers.get("X-Dispositivo-Token") != TOKEN_DISPOSITIVOS:
+            abort(403)
+        return vista(*args, **kwargs)
+    return envoltura
+
 @bp.route("/disp-monit")
 def disp_monit():
     return render_template("disp-monit_sm.html")
+
+# ============================== API de telemetría ============================
+@bp.route("/disp-monit/api/lecturas", methods=["POST"])
+@solo_dispositivos
+def recibir_lecturas():
+    """Lote de lecturas en JSON compacto o en registros binarios (ver telemetria.py)."""
+    try:
+        if request.mimetype == "application/octet-stream":
+            columnas = decodificar_binario(request.get_data(cache=False))
+        else:
+            columnas = decodificar_json(request.get_json(silent=True))
+    except LoteInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(almacen.agregar(columnas))
+
+@bp.route("/disp-monit/api/dispositivos", methods=["GET"])
+def listar_dispositivos():
+    return jsonify(almacen.dispositivos())
+
+@bp.route("/disp-monit/api/agregados", methods=["GET"])
+def consultar_agregados():
+    """?dispositivo=7&resolucion=hora&desde=2025-06-01&hasta=2025-06-02&variable=temperatura"""
+    resolucion = request.args.get("resolucion", "hora")
+    variables = request.args.getlist("variable") or list(VARIABLES)
+    if resolucion not in RESOLUCIONES or not set(variables) <= set(VARIABLES):
+        return jsonify({"error": f"resolucion en {list(RESOLUCIONES)}, variable en {list(VARIABLES)}"}), 400
+    try:
+        dispositivo = int(request.args["dispositivo"])
+        hasta = leer_instante(request.args.get("hasta"), time.time())
+        desde = leer_instante(request.args.get("desde"), hasta - 24 * 3600)
+    except (KeyError, ValueError):
+        return jsonify({"error": "dispositivo (entero) es obligatorio; desde/hasta en epoch o ISO 8601"}), 400
+    return jsonify({"dispositivo": dispositivo, "resolucion": resolucion, "desde": desde, "hasta": hasta,
+                    "columnas": ["inicio", "n", "media", "min", "max"],
+                    "series": almacen.agregados(dispositivo, resolucion, desde, hasta, variables)})
+
+# ============================ Tablero en vivo (SSE) ==========================
+# Sin la marca de tiempo: si nada cambió entre ticks no se manda nada
+difusor = Difusor(lambda: json.dumps(almacen.ventanas()["dispositivos"], separators=(",", ":")),
+                  intervalo_s=INTERVALO_TICK_S, max_suscriptores=MAX_SUSCRIPTORES)
+
+@bp.route("/disp-monit/stream", methods=["GET"])
+def stream():
+    """Server-Sent Events con las ventanas deslizantes de todos los dispositivos."""
+    try:
+        buzon = difusor.suscribir()
+    except Saturado:
+        return Response("Demasiadas conexiones en vivo\n", status=503, headers={"Retry-After": "30"})
+
+    def eventos():
+        try:
+            yield f"retry: {int(LATIDO_S * 1000)}\n\n"
+            while True:
+                datos = buzon.tomar(LATIDO_S)
+                # El comentario de latido mantiene viva la conexión a través de proxies
+                yield f"event: ventanas\ndata: {datos}\n\n" if datos is not None else ": latido\n\n"
+        finally:
+            difusor.desuscribir(buzon)
+
+    return Response(eventos(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,45 @@
+# app_exportacion.py — Blueprint con la exportación masiva de adecuación (ver exportacion.py)
+import hashlib
+
+from flask import Blueprint, Response, jsonify, request
+
+from activos import acepta_codificacion
+from exportacion import FORMATOS, RUTAS, codificar, comprimir, filas
+from reportes import version_datos
+
+bp = Blueprint("exportacion", __name__)
+
+@bp.route("/api/exportacion/adecuacion", methods=["GET"])
+def adecuacion():
+    """?formato=csv|ndjson&ruta=Estados|Municipios|todas&desde=2015&hasta=2024
+
+    Las filas se envían conforme se calculan (con gzip si el cliente lo acepta).
+    """
+    formato = request.args.get("formato", "csv")
+    ruta = request.args.get("ruta", "todas")
+    try:
+        desde, hasta = int(request.args.get("desde", 0)), int(request.args.get("hasta", 9999))
+    except ValueError:
+        return jsonify({"error": "desde/hasta deben ser años"}), 400
+    if formato not in FORMATOS or ruta not in RUTAS + ("todas",):
+        return jsonify({"error": "formato (csv/ndjson) o ruta (Estados/Municipios/todas) inválidos"}), 400
+
+    # El contenido solo depende de los parámetros y de la versión de los datos
+    version = version_datos()
+    usa_gzip = acepta_codificacion("gzip") > 0
+    etag = hashlib.sha256(f"{formato}|{ruta}|{desde}|{hasta}|{version}".encode("utf-8")).hexdigest()[:32]
+    # Cada codificación es otra representación: su propio ETag
+    if usa_gzip:
+        etag += "-gz"
+    if request.if_none_match.contains(etag):
+        return "", 304, {"ETag": f'"{etag}"', "Vary": "Accept-Encoding"}
+
+    rutas = RUTAS if ruta == "todas" else (ruta,)
+    trozos = codificar(filas(rutas, desde, hasta), formato)
+    resp = Response(comprimir(trozos) if usa_gzip else trozos, mimetype=FORMATOS[formato])
+    if usa_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["ETag"] = f'"{etag}"'
+    resp.headers["Content-Disposition"] = f'attachment; filename="adecuacion-{ruta.lower()}-{version}.{formato}"'
+    return resp
@@ -1,20 +1,32 @@
-from flask import Blueprint, render_template, request
-import unicodedata, re, pandas as pd
+from flask import Blueprint, render_template, request, abort, make_response, url_for
+import unicodedata, re, json, gzip, hashlib, tempfile, time, pandas as pd
 from datetime import datetime
-from functools import lru_cache
 from typing import Tuple, Optional
 import requests
 from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from flask import jsonify # ¡Importante!
 import os # Para manejar archivos
 
 # ======================== Dependencias del proyecto ==========================
 from prediccion import Prediccion
-from cultivos import obtener_cultivos
+from cultivos import CONDICIONES_DF, calcular_probabilidad_avanzada, cultivos_del_lugar, normalizar_texto, optimos_cultivo
+from coalescencia import memo_coalescido
+from cache_compartido import cache
+from metricas import etapa
+from admision import Rechazada, cupo, esperando_a, marcar_hilo_de_fondo
+from perfilador import perfilar
+from trabajos import ColaLlena, ColaTrabajos, EstadoNoDisponible, TrabajoNoRegistrado
+from precarga import Precargador
+from activos import acepta_codificacion
 from catalogos import estados, municipios, coordenadas, coordenadas_municipios
 
 bp = Blueprint("inicio", __name__)
 
+# Configurable para apuntar a un servidor de prueba (benchmarks/stubs.py)
+OPEN_METEO_URL = os.environ.get("SIEMBRA_OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
 #================== IMPORTS DEL AGENTE ==================
 try:
     # Importamos las DOS funciones clave que reestructuramos
@@ -29,32 +41,33 @@ except ImportError:
 
 
 # ================================= Utilidades ================================
-def normalizar_texto(texto: str) -> str:
-    if not isinstance(texto, str):
-        return texto
-    if isinstance(texto, str) and ',' in texto:
-        texto = texto.replace(',', '.')
-    texto = unicodedata.normalize("NFD", str(texto)).encode("ascii", "ignore").decode("utf-8")
-    return texto.upper()
-
 def slug_cultivo(nombre: str) -> str:
     s = unicodedata.normalize("NFD", nombre).encode("ascii", "ignore").decode("utf-8")
     s = re.sub(r"[^a-zA-Z0-9]+", "-", s.strip().lower())
     s = re.sub(r"-+", "-", s).strip("-")
     return s
 
+@lru_cache(maxsize=2)
+def _coords_normalizadas(ruta: str) -> dict:
+    pool = coordenadas_municipios if ruta == "Municipios" else coordenadas
+    return {normalizar_texto(k): v for k, v in pool.items()}
+
 def buscar_coords(ruta: str, lugar: str) -> Tuple[Optional[float], Optional[float]]:
     if not lugar: return None, None
-    pool = coordenadas_municipios if ruta == "Municipios" else coordenadas
-    pool_norm = {normalizar_texto(k): v for k, v in pool.items()}
-    return pool_norm.get(normalizar_texto(lugar), (None, None))
+    return _coords_normalizadas("Municipios" if ruta == "Municipios" else "Estados").get(normalizar_texto(lugar), (None, None))
 
 def obtener_clima_api(lat: float, lon: float, mes: int, anio: int):
     if not all([lat, lon, mes, anio]): return None, None
+    # Solo se guardan respuestas válidas: un fallo de la API se reintenta en la siguiente petición
+    return cache.obtener_o_calcular("clima", (lat, lon, mes, anio),
+                                    lambda: _consultar_clima_api(lat, lon, mes, anio),
+                                    guardar_si=lambda r: r[0] is not None)
+
+def _consultar_clima_api(lat: float, lon: float, mes: int, anio: int):
     _, num_dias = monthrange(anio, mes)
     start_date, end_date = f"{anio}-{mes:02d}-01", f"{anio}-{mes:02d}-{num_dias}"
     api_url = (
-        f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+        f"{OPEN_METEO_URL}?latitude={lat}&longitude={lon}"
         f"&daily=precipitation_sum,relative_humidity_2m_mean&timezone=auto"
         f"&start_date={start_date}&end_date={end_date}"
     )
@@ -68,107 +81,209 @@ def obtener_clima_api(lat: float, lon: float, mes: int, anio: int):
     except requests.exceptions.RequestException:
         return None, None
 
-def calcular_probabilidad_avanzada(preds: dict, optimos: dict, pesos=None, config=None):
-    if pesos is None:
-        pesos = {"tmin": 0.18, "tmax": 0.18, "tmed": 0.24, "precip": 0.24, "hum": 0.16}
-    if config is None:
-        config = {
-            "precip_deficit_tol": 0.20,
-            "hum_tolerancia": 0.10,
-            "hum_rolloff": 0.50,
-            "temp_holgura_c": 5.0,
-            "tmed_holgura_c": 3.0,
-        }
-
-    def clamp01(x): return max(0.0, min(1.0, x))
-
-    def score_precipitacion(pred, p_opt, deficit_tol):
-        if p_opt <= 0: return 0.0
-        if pred >= p_opt: return 1.0
-        piso = p_opt * (1.0 - deficit_tol)
-        if pred <= piso: return 0.0
-        return (pred - piso) / (p_opt - piso)
-
-    def score_humedad(pred, h_opt, tol_centro, rolloff):
-        if h_opt <= 0: return 0.0
-        delta_rel = abs(pred - h_opt) / h_opt
-        if delta_rel <= tol_centro: return 1.0
-        exceso = delta_rel - tol_centro
-        if exceso >= rolloff: return 0.0
-        return 1.0 - (exceso / rolloff)
-
-    def score_temperatura(valor, rango_min, rango_max, holgura):
-        if rango_min is None or rango_max is None: return 0.0
-        if rango_min > rango_max: rango_min, rango_max = rango_max, rango_min
-        if rango_min <= valor <= rango_max: return 1.0
-        distancia = (rango_min - valor) if valor < rango_min else (valor - rango_max)
-        if distancia >= holgura: return 0.0
-        return 1.0 - (distancia / holgura)
-
-    def score_temperatura_central(valor, t_opt, holgura):
-        if t_opt is None or holgura is None or holgura <= 0: return 0.0
-        d = abs(valor - t_opt)
-        if d >= holgura: return 0.0
-        return 1.0 - (d / holgura)
-
-    p_opt = optimos.get("p_opt", (optimos["pmin"] + optimos["pmax"]) / 2.0)
-    h_opt = optimos.get("h_opt", (optimos["hmin"] + optimos["hmax"]) / 2.0)
-
-    tmin_pred = preds.get("tmin")
-    tmax_pred = preds.get("tmax")
-    tmed_pred = preds.get("tmed", None)
-    if tmed_pred is None and (tmin_pred is not None and tmax_pred is not None):
-        tmed_pred = (tmin_pred + tmax_pred) / 2.0
-
-    tmed_opt = optimos.get("tmed_opt", None)
-    if tmed_opt is None and ("tmin" in optimos and "tmax" in optimos):
-        tmed_opt = (optimos["tmin"] + optimos["tmax"]) / 2.0
-
-    s_tmin = score_temperatura(tmin_pred, optimos["tmin"], optimos["tmax"], config["temp_holgura_c"])
-    s_tmax = score_temperatura(tmax_pred, optimos["tmin"], optimos["tmax"], config["temp_holgura_c"])
-    s_tmed = score_temperatura_central(tmed_pred, tmed_opt, config["tmed_holgura_c"]) if tmed_pred is not None else 0.0
-    s_prec = score_precipitacion(preds["precip"], p_opt, config["precip_deficit_tol"])
-    s_hum  = score_humedad(preds["hum"], h_opt, config["hum_tolerancia"], config["hum_rolloff"])
-
-    total_pesos = sum(pesos.values()) or 1.0
-    score = (
-        pesos.get("tmin", 0.0)   * s_tmin +
-        pesos.get("tmax", 0.0)   * s_tmax +
-        pesos.get("tmed", 0.0)   * s_tmed +
-        pesos.get("precip", 0.0) * s_prec +
-        pesos.get("hum", 0.0)    * s_hum
-    ) / total_pesos
-
-    valor = int(round(100 * clamp01(score)))
-    return 99 if valor == 100 else valor
-
 # ================================= Datos ====================================
 MESES = ("Enero","Febrero","Marzo","Abril","Mayo","Junio","Julio","Agosto","Septiembre","Octubre","Noviembre","Diciembre")
 ANIOS = (datetime.now().year,)
 def mes_actual_nombre() -> str: return MESES[datetime.now().month - 1]
 
-try:
-    CONDICIONES_DF = pd.read_csv("./condiciones_ideales/CondicionesIdeales.csv", encoding="utf-8")
-    CONDICIONES_DF.columns = [col.strip().replace(' ', '_') for col in CONDICIONES_DF.columns]
-    CONDICIONES_DF["Cultivo_normalizado"] = CONDICIONES_DF["Cultivo"].apply(normalizar_texto)
-except Exception:
-    CONDICIONES_DF = pd.DataFrame()
+# ============================ Catálogo publicado =============================
+# Estados, municipios y coordenadas viajan en un solo JSON versionado que se arma
+# una vez al importar; la página solo lo referencia y el navegador lo cachea.
+def _armar_catalogos() -> bytes:
+    def _filas(nombres, coords):
+        return [[n, *coords.get(n, (None, None))] for n in nombres]
+    payload = {
+        "estados": _filas(estados, coordenadas),
+        "municipios": _filas(municipios, coordenadas_municipios),
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+CATALOGOS_JSON = _armar_catalogos()
+CATALOGOS_JSON_GZ = gzip.compress(CATALOGOS_JSON, compresslevel=9, mtime=0)
+CATALOGOS_VERSION = hashlib.sha256(CATALOGOS_JSON).hexdigest()[:12]
+
+# El pronóstico se entrena y guarda por lugar (los 12 meses salen del mismo
+# modelo); peticiones simultáneas del mismo lugar en frío entrenan una sola vez.
+# Si quien entrena es una precarga o un lote, hereda la prioridad de las
+# peticiones reales que se sumen a esperarlo (admision.esperando_a).
+@memo_coalescido(maxsize=128, al_esperar=esperando_a)
+def _pronostico_lugar(ruta: str, lugar: str):
+    return cache.obtener_o_calcular("pronostico", (ruta, lugar), lambda: _entrenar_pronostico(ruta, lugar))
+
+def _entrenar_pronostico(ruta: str, lugar: str):
+    # Entrenar en frío es lo más caro del servidor: pocos a la vez (admision.py)
+    with cupo("entrenamiento"):
+        return Prediccion(ruta=ruta, lugar=lugar)
 
-@lru_cache(maxsize=128)
 def _pred_cache(ruta: str, lugar: str, mes_solicitado: int):
-    return Prediccion(ruta=ruta, lugar=lugar, mes_solicitado=mes_solicitado)
+    df = _pronostico_lugar(ruta, lugar)
+    return df[df["Mes"] == mes_solicitado]
+
+def _recomendaciones_sin_cache(ruta, lugar, temp_min, temp_max, precipitacion, humedad):
+    recomendaciones = []
+    lista_cultivos = cultivos_del_lugar(ruta, lugar)
+    for cultivo in lista_cultivos:
+        optimos = optimos_cultivo(cultivo)
+        if optimos is not None:
+            preds = {"tmin": temp_min, "tmax": temp_max, "precip": precipitacion, "hum": humedad}
+            prob = calcular_probabilidad_avanzada(preds, optimos)
+
+            if prob >= 70: texto = f"✅ Alta probabilidad ({prob}%) de éxito para la siembra."
+            elif prob >= 40: texto = f"⚠️ Probabilidad media ({prob}%). La siembra es posible con precauciones."
+            else: texto = f"❌ Baja probabilidad ({prob}%). No se recomienda la siembra este mes."
+
+            recomendaciones.append({"cultivo": cultivo, "prob": prob, "texto": texto, "img_slug": slug_cultivo(cultivo)})
+    return sorted(recomendaciones, key=lambda x: x['prob'], reverse=True)
+
+def calcular_recomendaciones(ruta, lugar, temp_min, temp_max, precipitacion, humedad):
+    """Lista de cultivos del lugar con su probabilidad, ordenada de mayor a menor."""
+    clave = (ruta, lugar, temp_min, temp_max, precipitacion, humedad)
+    return cache.obtener_o_calcular("puntaje", clave, lambda: _recomendaciones_sin_cache(*clave))
+
+# ========================== Recomendaciones en lote ==========================
+# Cientos de parcelas suelen compartir lugar (un pronóstico) y celda de clima
+# (lat, lon, mes, año): se calcula una vez cada pieza única, en paralelo, y las
+# consultas se arman al final con búsquedas en diccionario.
+MAX_LOTE = int(os.environ.get("SIEMBRA_LOTE_MAX", "500"))
+_ejecutor_lote = ThreadPoolExecutor(max_workers=int(os.environ.get("SIEMBRA_LOTE_HILOS", "8")),
+                                    thread_name_prefix="lote", initializer=marcar_hilo_de_fondo)
+
+def _mes_de(valor) -> int:
+    # bool es subclase de int: True/False no son meses
+    if isinstance(valor, bool):
+        raise ValueError(f"mes inválido: {valor}")
+    if isinstance(valor, int) or (isinstance(valor, str) and valor.isdigit()):
+        mes = int(valor)
+        if 1 <= mes <= 12:
+            return mes
+    elif isinstance(valor, str):
+        nombres = [normalizar_texto(m) for m in MESES]
+        if normalizar_texto(valor.strip()) in nombres:
+            return nombres.index(normalizar_texto(valor.strip())) + 1
+    raise ValueError(f"mes inválido: {valor}")
+
+def _consulta_de(item) -> dict:
+    if not isinstance(item, dict):
+        raise ValueError("cada consulta debe ser un objeto")
+    ruta = item.get("ruta", "Estados")
+    lugar = (item.get("lugar") or "").strip()
+    if ruta not in ("Estados", "Municipios") or not lugar:
+        raise ValueError("ruta (Estados/Municipios) y lugar son obligatorios")
+    valor_anio = item.get("anio", ANIOS[0])
+    try:
+        anio = None if isinstance(valor_anio, bool) else int(valor_anio)
+    except (TypeError, ValueError):
+        anio = None
+    # Open-Meteo solo tiene pronóstico para los años que ofrece la página
+    if anio not in ANIOS:
+        raise ValueError(f"año inválido: {valor_anio} (disponibles: {', '.join(map(str, ANIOS))})")
+    return {"ruta": ruta, "lugar": lugar, "mes": _mes_de(item.get("mes", datetime.now().month)), "anio": anio}
+
+def _resultado_o_none(futuro):
+    try:
+        return futuro.result()
+    except Exception as e:
+        print(f"[LOTE] Falló una pieza del lote: {e}")
+        return None
+
+def recomendaciones_lote(items: list) -> Tuple[list, dict]:
+    """Resultados en el orden de items y cuántas piezas únicas se calcularon."""
+    consultas = []
+    for item in items:
+        try:
+            consultas.append(_consulta_de(item))
+        except ValueError as e:
+            consultas.append({"error": str(e)})
+    validas = [c for c in consultas if "error" not in c]
+
+    lugares = {(c["ruta"], c["lugar"]) for c in validas}
+    coords = {lugar: buscar_coords(*lugar) for lugar in lugares}
+    celdas = {(*coords[(c["ruta"], c["lugar"])], c["mes"], c["anio"]) for c in validas}
+    celdas = {celda for celda in celdas if all(celda)}
+
+    # Pronósticos y clima no dependen entre sí: se encolan juntos
+    with etapa("lote_insumos"):
+        f_pron = {lugar: _ejecutor_lote.submit(_pronostico_lugar, *lugar) for lugar in lugares}
+        f_clima = {celda: _ejecutor_lote.submit(obtener_clima_api, *celda) for celda in celdas}
+        pronosticos = {lugar: _resultado_o_none(f) for lugar, f in f_pron.items()}
+        climas = {celda: _resultado_o_none(f) or (None, None) for celda, f in f_clima.items()}
+
+    puntajes = {}
+    resultados = []
+    with etapa("lote_puntaje"):
+        for c in consultas:
+            if "error" in c:
+                resultados.append(c)
+                continue
+            lugar = (c["ruta"], c["lugar"])
+            resultado = dict(c, temp_min=None, temp_max=None, precipitacion=None, humedad=None, recomendaciones=[])
+            df = pronosticos.get(lugar)
+            fila = df[df["Mes"] == c["mes"]] if df is not None else None
+            if fila is None or fila.empty:
+                resultado["error"] = "sin pronóstico para el lugar"
+                resultados.append(resultado)
+                continue
+            resultado["temp_min"], resultado["temp_max"] = int(fila["Pred_TempMin"].iloc[0]), int(fila["Pred_tempMax"].iloc[0])
+            precipitacion, humedad = climas.get((*coords[lugar], c["mes"], c["anio"]), (None, None))
+            resultado["precipitacion"], resultado["humedad"] = precipitacion, humedad
+            if precipitacion is None or humedad is None:
+                resultado["error"] = "sin datos de clima"
+                resultados.append(resultado)
+                continue
+            clave = (*lugar, resultado["temp_min"], resultado["temp_max"], precipitacion, humedad)
+            if clave not in puntajes:
+                puntajes[clave] = [{"cultivo": r["cultivo"], "prob": r["prob"]} for r in calcular_recomendaciones(*clave)]
+            resultado["recomendaciones"] = puntajes[clave]
+            resultados.append(resultado)
+
+    unicos = {"consultas": len(consultas), "pronosticos": len(lugares), "celdas_clima": len(celdas), "puntajes": len(puntajes)}
+    return resultados, unicos
+
+def condiciones_y_recomendaciones(ruta, lugar, mes, anio, prefijo_etapa=""):
+    """(temp_min, temp_max, precipitacion, humedad, recomendaciones) de un lugar y mes, como en /generar."""
+    temp_min = temp_max = precipitacion = humedad = None
+    try:
+        with etapa(prefijo_etapa + "pronostico"):
+            df_pred = _pred_cache(ruta, lugar, mes)
+        temp_min, temp_max = int(df_pred["Pred_TempMin"].iloc[0]), int(df_pred["Pred_tempMax"].iloc[0])
+        lat, lon = buscar_coords(ruta, lugar)
+        with etapa(prefijo_etapa + "clima_api"):
+            precipitacion, humedad = obtener_clima_api(lat, lon, mes, anio)
+    except Rechazada:
+        raise  # servidor saturado: 503 con Retry-After, no una página sin datos
+    except Exception:
+        pass
+
+    recomendaciones = []
+    if all(v is not None for v in [temp_min, temp_max, precipitacion, humedad]):
+        try:
+            with etapa(prefijo_etapa + "puntaje"):
+                recomendaciones = calcular_recomendaciones(ruta, lugar, temp_min, temp_max, precipitacion, humedad)
+        except Exception:
+            pass
+    return temp_min, temp_max, precipitacion, humedad, recomendaciones
+
+# ================================ Precarga ===================================
+# La portada avisa en cuanto se elige un lugar (o un mes): se entrena/lee el
+# pronóstico de los 12 meses y se consultan el clima y los puntajes del mes
+# elegido, así el /generar que sigue sale de la caché. Ver precarga.py.
+precargador = Precargador(hilos=int(os.environ.get("SIEMBRA_PRECARGA_HILOS", "1")),
+                          max_pendientes=int(os.environ.get("SIEMBRA_PRECARGA_PENDIENTES", "32")))
+
+def _precalentar(ruta: str, lugar: str, mes: int, anio: int):
+    condiciones_y_recomendaciones(ruta, lugar, mes, anio, prefijo_etapa="precarga_")
 
 # ================================== Rutas ====================================
 @bp.route("/", methods=["GET"])
 def home():
     context = {
         "mes_sel": mes_actual_nombre(), "anio_sel": ANIOS[0], "recomendaciones": [],
-        "estados": estados, "municipios": municipios, "meses": MESES, "anios": ANIOS,
-        "coordenadas": coordenadas, "coordenadas_municipios": coordenadas_municipios
+        "meses": MESES, "anios": ANIOS, "catalogos_version": CATALOGOS_VERSION
     }
     return render_template("inicio_sm.html", **context)
 
 @bp.route("/generar", methods=["POST"])
+@perfilar
 def generar():
     ruta = request.form.get("ruta", "Estados")
     lugar = request.form.get("estado") if ruta == "Estados" else request.form.get("municipio")
@@ -177,89 +292,188 @@ def generar():
     mes_solicitado = MESES.index(mes_texto) + 1
 
     temp_min = temp_max = precipitacion = humedad = None
-    if lugar:
-        try:
-            df_pred = _pred_cache(ruta, lugar, mes_solicitado)
-            temp_min, temp_max = int(df_pred["Pred_TempMin"].iloc[0]), int(df_pred["Pred_tempMax"].iloc[0])
-            lat, lon = buscar_coords(ruta, lugar)
-            precipitacion, humedad = obtener_clima_api(lat, lon, mes_solicitado, anio)
-        except Exception:
-            pass
-
     recomendaciones = []
-    if lugar and all(v is not None for v in [temp_min, temp_max, precipitacion, humedad]):
-        try:
-            ruta_csv_cultivos = "./Ideal/CultivoEstado.csv" if ruta == "Estados" else "./Ideal/CultivoMunicipio.csv"
-            lista_cultivos = obtener_cultivos(ruta_csv_cultivos).get(lugar, [])
-            for cultivo in lista_cultivos:
-                cond = CONDICIONES_DF[CONDICIONES_DF["Cultivo_normalizado"] == normalizar_texto(cultivo)]
-                if not cond.empty:
-                    lluvia_opt  = float(str(cond["Lluvias_optima"].iloc[0]).replace(',', '.'))
-                    humedad_opt = float(str(cond["Humedad"].iloc[0]).replace(',', '.'))
-                    optimos = {
-                        "tmin": float(str(cond["Temp_min_optima"].iloc[0]).replace(',', '.')),
-                        "tmax": float(str(cond["Temp_max_optima"].iloc[0]).replace(',', '.')),
-                        "pmin": lluvia_opt * 0.8,  "pmax": lluvia_opt * 1.2,
-                        "hmin": humedad_opt * 0.9, "hmax": humedad_opt * 1.1,
-                        "p_opt": lluvia_opt, "h_opt": humedad_opt,
-                    }
-                    preds = {"tmin": temp_min, "tmax": temp_max, "precip": precipitacion, "hum": humedad}
-                    prob = calcular_probabilidad_avanzada(preds, optimos)
-
-                    if prob >= 70: texto = f"✅ Alta probabilidad ({prob}%) de éxito para la siembra."
-                    elif prob >= 40: texto = f"⚠️ Probabilidad media ({prob}%). La siembra es posible con precauciones."
-                    else: texto = f"❌ Baja probabilidad ({prob}%). No se recomienda la siembra este mes."
-
-                    recomendaciones.append({"cultivo": cultivo, "prob": prob, "texto": texto, "img_slug": slug_cultivo(cultivo)})
-        except Exception:
-            pass
+    if lugar:
+        temp_min, temp_max, precipitacion, humedad, recomendaciones = condiciones_y_recomendaciones(
+            ruta, lugar, mes_solicitado, anio)
 
     context = {
         "ruta_sel": ruta, "estado_sel": request.form.get("estado"), "municipio_sel": request.form.get("municipio"),
-        "mes_sel": mes_texto, "anio_sel": anio, "recomendaciones": sorted(recomendaciones, key=lambda x: x['prob'], reverse=True),
+        "mes_sel": mes_texto, "anio_sel": anio, "recomendaciones": recomendaciones,
         "temp_max": temp_max, "temp_min": temp_min, "temp_media": int((temp_min + temp_max) / 2) if temp_min is not None else None,
         "precipitacion": precipitacion, "humedad": humedad, "nombre_mes": mes_texto if lugar else None,
-        "estados": estados, "municipios": municipios, "meses": MESES, "anios": ANIOS,
-        "coordenadas": coordenadas, "coordenadas_municipios": coordenadas_municipios
+        "meses": MESES, "anios": ANIOS, "catalogos_version": CATALOGOS_VERSION
     }
-    return render_template("inicio_sm.html", **context)
+    with etapa("plantilla"):
+        return render_template("inicio_sm.html", **context)
+
+@bp.route("/api/recomendaciones/lote", methods=["POST"])
+def recomendaciones_en_lote():
+    """{"consultas": [{"id": ..., "ruta": "Estados", "lugar": "Jalisco", "mes": 6, "anio": 2025}, ...]}
+
+    Cada resultado conserva el "id" de su consulta; las consultas inválidas traen "error"
+    sin tumbar el lote.
+    """
+    cuerpo = request.get_json(silent=True)
+    items = cuerpo.get("consultas") if isinstance(cuerpo, dict) else cuerpo
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "se espera una lista de consultas"}), 400
+    if len(items) > MAX_LOTE:
+        return jsonify({"error": f"máximo {MAX_LOTE} consultas por lote"}), 413
+    resultados, unicos = recomendaciones_lote(items)
+    for item, resultado in zip(items, resultados):
+        if isinstance(item, dict) and "id" in item:
+            resultado["id"] = item["id"]
+    return jsonify({"resultados": resultados, "unicos": unicos})
+
+@bp.route("/precargar", methods=["POST"])
+def precargar():
+    """Recibe los mismos campos que /generar y responde 202 sin esperar el cálculo."""
+    ruta = request.form.get("ruta", "Estados")
+    lugar = request.form.get("estado") if ruta == "Estados" else request.form.get("municipio")
+    mes_texto = request.form.get("mes", mes_actual_nombre())
+    try:
+        anio = int(request.form.get("anio", ANIOS[0]))
+        mes = MESES.index(mes_texto) + 1
+    except ValueError:
+        return jsonify({"error": "mes o año inválido"}), 400
+    if ruta not in ("Estados", "Municipios") or not lugar:
+        return jsonify({"error": "ruta y lugar son obligatorios"}), 400
+    encolada = precargador.encolar((ruta, lugar, mes, anio), _precalentar, ruta, lugar, mes, anio)
+    return jsonify({"encolada": encolada}), 202
+
+@bp.route("/catalogos.<version>.json", methods=["GET"])
+def catalogos_json(version):
+    if version != CATALOGOS_VERSION:
+        abort(404)
+    usa_gzip = acepta_codificacion("gzip") > 0
+    resp = make_response(CATALOGOS_JSON_GZ if usa_gzip else CATALOGOS_JSON)
+    resp.mimetype = "application/json"
+    if usa_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    # Cada codificación es otra representación: su propio ETag
+    resp.headers["ETag"] = f'"{CATALOGOS_VERSION}-gz"' if usa_gzip else f'"{CATALOGOS_VERSION}"'
+    return resp
 
 # ================== NUEVO ENDPOINT DE VOZ ==================
-@bp.route("/procesar-voz", methods=["POST"])
-def procesar_voz_endpoint():
-    # 1. Recibir el archivo de audio del navegador
-    if 'audio_data' not in request.files:
-        return jsonify({"error": "No se encontró archivo de audio"}), 400
-
-    audio_file = request.files['audio_data']
-    
-    # 2. Guardar el archivo temporalmente en el servidor
-    # El navegador envía un blob, lo guardamos con un nombre temporal
-    temp_filename = "temp_audio_upload.webm" 
-    audio_file.save(temp_filename)
-
+# ffmpeg + Vosk + Gemma puede tardar hasta el timeout de Ollama (120 s): además del
+# endpoint síncrono hay uno de trabajos que responde de inmediato con un id y se
+# consulta después, para no tener un worker web ocupado durante toda la inferencia.
+trabajos_voz = ColaTrabajos("voz", hilos=int(os.environ.get("SIEMBRA_VOZ_HILOS", "2")),
+                            max_pendientes=int(os.environ.get("SIEMBRA_VOZ_PENDIENTES", "16")),
+                            vigencia_s=float(os.environ.get("SIEMBRA_VOZ_VIGENCIA_S", "600")))
+_ID_TRABAJO = re.compile(r"^[0-9a-f]{32}$")
+
+def _guardar_audio(audio_file) -> str:
+    # Nombre único: varias grabaciones pueden estar en proceso a la vez
+    extension = os.path.splitext(audio_file.filename or "")[1] or ".webm"
+    descriptor, ruta = tempfile.mkstemp(prefix="siembra-voz-", suffix=extension)
+    os.close(descriptor)
+    audio_file.save(ruta)
+    return ruta
+
+def _interpretar_audio(ruta_audio: str):
+    """(código HTTP, cuerpo JSON) de la cadena Vosk + Gemma. Borra el audio al terminar."""
     try:
         # 3. Transcribir el audio usando Agente.py -> Vosk
-        texto_voz = transcribir_desde_archivo(temp_filename)
-        
+        texto_voz = transcribir_desde_archivo(ruta_audio)
+
         if not texto_voz:
-            return jsonify({"error": "No se pudo transcribir (Vosk)"}), 500
+            return 500, {"error": "No se pudo transcribir (Vosk)"}
 
         # 4. Interpretar el texto usando Agente.py -> Gemma
         params = interpretar_con_gemma(texto_voz)
 
         if not any(params.values()):
-            return jsonify({"error": "No pude entender la solicitud (Gemma)"}), 400
-        
-        # 5. ¡Éxito! Devolver el JSON al navegador
+            return 400, {"error": "No pude entender la solicitud (Gemma)"}
+
         print(f"Parámetros de voz detectados: {params}")
-        return jsonify(params)
+        return 200, params
 
     except Exception as e:
         print(f"Error fatal en /procesar-voz: {e}")
-        return jsonify({"error": str(e)}), 500
-        
-    #finally:
+        return 500, {"error": str(e)}
+
+    finally:
         # 6. Limpiar siempre el archivo temporal
-       # if os.path.exists(temp_filename):
-           # os.remove(temp_filename)
\ No newline at end of file
+        if os.path.exists(ruta_audio):
+            os.remove(ruta_audio)
+
+# Un trabajo ya aceptado (202) puede esperar su turno más que una petición síncrona.
+# Su plazo total (en cola + inferencia) va en la respuesta 202 y el navegador consulta
+# hasta entonces; un trabajo que ya no alcanzaría a terminar a tiempo no se corre.
+ESPERA_VOZ_TRABAJOS_S = float(os.environ.get("SIEMBRA_VOZ_ESPERA_S", "300"))
+# ffmpeg + Vosk + Gemma una vez admitido (Ollama tiene 120 s de timeout)
+DURACION_MAX_VOZ_S = float(os.environ.get("SIEMBRA_VOZ_DURACION_MAX_S", "150"))
+
+def _interpretar_con_cupo(ruta_audio: str, espera_max_s: float = None):
+    """_interpretar_audio dentro del cupo "inferencia_voz", el que comparten /procesar-voz y
+    los trabajos (admision.py). Si no hay lugar borra el audio y lanza Rechazada."""
+    try:
+        with cupo("inferencia_voz", espera_max_s=espera_max_s):
+            return _interpretar_audio(ruta_audio)
+    except Rechazada:
+        if os.path.exists(ruta_audio):
+            os.remove(ruta_audio)
+        raise
+
+def _trabajo_voz(ruta_audio: str, vence: float):
+    """Lo que corre en trabajos_voz: espera el cupo solo mientras la inferencia quepa antes de `vence`."""
+    espera = vence - time.time() - DURACION_MAX_VOZ_S
+    try:
+        if espera < 0:
+            raise Rechazada("inferencia_voz", "plazo agotado en cola", 10)
+        return _interpretar_con_cupo(ruta_audio, espera)
+    except Rechazada as e:
+        if os.path.exists(ruta_audio):
+            os.remove(ruta_audio)
+        return 503, {"error": "Servidor ocupado, intenta de nuevo en unos segundos", "reintentar_s": e.reintentar_s}
+
+@bp.route("/procesar-voz", methods=["POST"])
+@perfilar
+def procesar_voz_endpoint():
+    # 1. Recibir el archivo de audio del navegador
+    if 'audio_data' not in request.files:
+        return jsonify({"error": "No se encontró archivo de audio"}), 400
+
+    # 2. Guardar el archivo temporalmente en el servidor
+    ruta_audio = _guardar_audio(request.files['audio_data'])
+
+    # 5. Devolver el JSON al navegador
+    codigo, cuerpo = _interpretar_con_cupo(ruta_audio)
+    return jsonify(cuerpo), codigo
+
+@bp.route("/procesar-voz/trabajos", methods=["POST"])
+def crear_trabajo_voz():
+    """Encola la grabación y responde 202 con el id; el resultado se consulta en su URL."""
+    if 'audio_data' not in request.files:
+        return jsonify({"error": "No se encontró archivo de audio"}), 400
+    ruta_audio = _guardar_audio(request.files['audio_data'])
+    plazo_s = ESPERA_VOZ_TRABAJOS_S + DURACION_MAX_VOZ_S
+    try:
+        id_trabajo = trabajos_voz.enviar(_trabajo_voz, ruta_audio, time.time() + plazo_s)
+    except ColaLlena:
+        os.remove(ruta_audio)
+        return jsonify({"error": "Hay demasiadas solicitudes de voz en proceso"}), 503, {"Retry-After": "10"}
+    except TrabajoNoRegistrado as e:
+        print(f"[VOZ] {e}")
+        os.remove(ruta_audio)
+        return jsonify({"error": "No se pudo registrar la solicitud de voz"}), 503, {"Retry-After": "10"}
+    url = url_for("inicio.estado_trabajo_voz", id_trabajo=id_trabajo)
+    return jsonify({"id": id_trabajo, "estado": "en_cola", "url": url, "plazo_s": plazo_s}), 202, {"Location": url}
+
+@bp.route("/procesar-voz/trabajos/<id_trabajo>", methods=["GET"])
+def estado_trabajo_voz(id_trabajo):
+    """estado: en_cola | procesando | listo | fallido. Al terminar trae codigo y resultado."""
+    try:
+        estado = trabajos_voz.estado(id_trabajo) if _ID_TRABAJO.match(id_trabajo) else None
+    except EstadoNoDisponible as e:
+        print(f"[VOZ] {e}")
+        return jsonify({"error": "No se pudo consultar la solicitud de voz"}), 503, {"Retry-After": "2"}
+    if estado is None:
+        return jsonify({"error": "Trabajo inexistente o caducado"}), 404
+    resp = jsonify(estado)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
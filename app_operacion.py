@@ -0,0 +1,73 @@
+# app_operacion.py — Blueprint con endpoints para operadores (estado interno del servidor)
+import os
+from functools import wraps
+
+from flask import Blueprint, Response, abort, jsonify, request, send_from_directory
+
+from cache_compartido import cache
+import admision
+import metricas
+import perfilador
+
+bp = Blueprint("operacion", __name__)
+
+# Las rutas de operación exigen la cabecera X-Operador-Token. Sin SIEMBRA_TOKEN_OPERADOR
+# quedan cerradas (403), igual que X-Perfilar en perfilador.py: /operacion/perfilador
+# puede encender el muestreo y bajar perfiles con los datos de los formularios.
+TOKEN_OPERADOR = os.environ.get("SIEMBRA_TOKEN_OPERADOR")
+
+def solo_operadores(vista):
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not TOKEN_OPERADOR or request.headers.get("X-Operador-Token") != TOKEN_OPERADOR:
+            abort(403)
+        return vista(*args, **kwargs)
+    return envoltura
+
+@bp.route("/operacion/cache", methods=["GET"])
+@solo_operadores
+def estadisticas_cache():
+    return jsonify(cache.estadisticas())
+
+def _lineas_cache():
+    """Estadísticas de la caché compartida como métricas Prometheus."""
+    lineas = []
+    campos = (("hits", "counter"), ("misses", "counter"), ("desalojos", "counter"),
+              ("expirados", "counter"), ("entradas", "gauge"), ("bytes", "gauge"))
+    estadisticas = cache.estadisticas()
+    for campo, tipo in campos:
+        nombre = f"siembra_cache_{campo}" + ("_total" if tipo == "counter" else "")
+        lineas += [f"# HELP {nombre} Caché compartida: {campo} por espacio", f"# TYPE {nombre} {tipo}"]
+        for espacio, datos in sorted(estadisticas.items()):
+            lineas.append(f'{nombre}{{espacio="{espacio}"}} {datos.get(campo, 0)}')
+    return lineas
+
+@bp.route("/metrics", methods=["GET"])
+@solo_operadores
+def metrics():
+    return Response(metricas.texto_prometheus(_lineas_cache()), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/operacion/admision", methods=["GET"])
+@solo_operadores
+def estado_admision():
+    """En curso y en cola por clase en este worker (ver admision.py)."""
+    return jsonify(admision.planificador.estado())
+
+# ============================== Perfilador ==================================
+@bp.route("/operacion/perfilador", methods=["GET", "POST"])
+@solo_operadores
+def perfilador_config():
+    """POST {"tasa": 0.05, "formato": "ambos", "minutos": 30} enciende el muestreo; tasa 0 lo apaga."""
+    if request.method == "POST":
+        datos = request.get_json(silent=True) or {}
+        try:
+            minutos = float(datos["minutos"]) if datos.get("minutos") else None
+            perfilador.configurar(float(datos.get("tasa", 0)), datos.get("formato", "ambos"), minutos)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify({"config": perfilador.configuracion(), "perfiles": perfilador.perfiles()})
+
+@bp.route("/operacion/perfilador/<path:archivo>", methods=["GET"])
+@solo_operadores
+def perfilador_archivo(archivo):
+    return send_from_directory(perfilador.DIR_PERFILES, archivo, as_attachment=True)
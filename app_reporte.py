@@ -1,8 +1,69 @@
-
 # app_reporte.py — Blueprint para "Reportes"
-from flask import Blueprint, render_template
+import re
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, jsonify, abort, redirect, send_file, url_for
+
+from activos import acepta_codificacion
+from app_inicio import CATALOGOS_VERSION
+from reportes import ReporteInvalido, obtener_reporte, ruta_artefacto
+
 bp = Blueprint("reporte", __name__)
 
+ANIO_INICIAL = 2015
+_CLAVE = re.compile(r"^[0-9a-f]{32}$")
+
+def _parametros():
+    ruta = request.args.get("ruta", "Estados")
+    lugar = (request.args.get("lugar") or "").strip()
+    try:
+        desde = int(request.args.get("desde", ANIO_INICIAL))
+        hasta = int(request.args.get("hasta", datetime.now().year))
+    except ValueError:
+        desde, hasta = ANIO_INICIAL, datetime.now().year
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    return ruta, lugar, desde, hasta
+
 @bp.route("/reporte")
 def reporte():
-    return render_template("reporte_sm.html")
+    ruta, lugar, desde, hasta = _parametros()
+    url_reporte = url_for("reporte.generar_reporte", ruta=ruta, lugar=lugar, desde=desde, hasta=hasta) if lugar else None
+    return render_template("reporte_sm.html", url_reporte=url_reporte, ruta_sel=ruta, lugar_sel=lugar,
+                           desde=desde, hasta=hasta, catalogos_version=CATALOGOS_VERSION)
+
+@bp.route("/reporte/generar")
+def generar_reporte():
+    """Genera (o reutiliza) el reporte y redirige a su artefacto inmutable."""
+    ruta, lugar, desde, hasta = _parametros()
+    if ruta not in ("Estados", "Municipios") or not lugar:
+        return jsonify({"error": "ruta (Estados/Municipios) y lugar son obligatorios"}), 400
+    try:
+        clave, _ = obtener_reporte(ruta, lugar, desde, hasta)
+    except ReporteInvalido as e:
+        return jsonify({"error": str(e)}), 404
+    return redirect(url_for("reporte.artefacto", clave=clave))
+
+@bp.route("/reporte/artefactos/<clave>.html")
+def artefacto(clave):
+    # La clave ya incluye la versión de los datos: el contenido de esta URL nunca cambia
+    if not _CLAVE.match(clave):
+        abort(404)
+    usa_gzip = acepta_codificacion("gzip") > 0
+    # Cada codificación es otra representación: su propio ETag
+    etag = f"{clave}-gz" if usa_gzip else clave
+    if request.if_none_match.contains(etag):
+        return "", 304, {"ETag": f'"{etag}"', "Vary": "Accept-Encoding",
+                         "Cache-Control": "public, max-age=31536000, immutable"}
+    try:
+        resp = send_file(ruta_artefacto(clave, comprimido=usa_gzip), mimetype="text/html", etag=False,
+                         conditional=False, max_age=31536000)
+    except FileNotFoundError:
+        abort(404)
+    resp.headers.pop("Content-Disposition", None)
+    if usa_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    resp.headers["ETag"] = f'"{etag}"'
+    return resp
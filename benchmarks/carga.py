@@ -0,0 +1,204 @@
+# benchmarks/carga.py — Prueba de carga local con servicios externos simulados
+#
+#   python -m benchmarks.carga                                   # app en proceso, niveles 1,2,4,8,16
+#   python -m benchmarks.carga --concurrencias 4,16,64 --duracion 20 --clima-latencia 0.2 --clima-fallos 0.05
+#   python -m benchmarks.carga --url http://127.0.0.1:8000       # contra servidor.py ya levantado
+#
+# Levanta Open-Meteo y Ollama simulados (latencia y tasa de fallos configurables),
+# reproduce una mezcla de peticiones a /, /generar y /procesar-voz con lugares y
+# meses al azar, y por cada nivel de concurrencia reporta rendimiento, p50/p90/p99
+# y tasa de errores por endpoint (los 503 con Retry-After del control de admisión
+# se cuentan aparte y no entran en las latencias). El punto de saturación es el
+# primer nivel en el que el rendimiento deja de crecer (< 10 %) o el p99 supera
+# --slo-p99-ms.
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.ejecutar import muestras_de_audio, preparar_entorno, resumir
+
+MESES = ("Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto",
+         "Septiembre", "Octubre", "Noviembre", "Diciembre")
+# Crecimiento mínimo de rendimiento entre niveles para no considerarlo saturado
+CRECIMIENTO_MINIMO = 0.10
+
+def _mezcla(texto: str) -> dict:
+    pesos = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        pesos[nombre.strip()] = float(peso)
+    return pesos
+
+def _levantar_app():
+    """Arranca la app en este proceso con un servidor WSGI multihilo."""
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    # El log por petición de werkzeug taparía el informe
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    servidor = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+class Generador:
+    """Produce peticiones de la mezcla de forma reproducible por hilo."""
+
+    def __init__(self, base: str, pesos: dict, audio: bytes, semilla: int):
+        from catalogos import estados, municipios
+        self.base, self.audio = base, audio
+        self.estados, self.municipios = estados, municipios
+        self.nombres = list(pesos)
+        self.pesos = [pesos[n] for n in self.nombres]
+        self.rnd = random.Random(semilla)
+
+    def siguiente(self, sesion: requests.Session):
+        tipo = self.rnd.choices(self.nombres, self.pesos)[0]
+        if tipo == "inicio":
+            return tipo, lambda: sesion.get(self.base + "/", timeout=180)
+        if tipo == "generar":
+            if self.rnd.random() < 0.7:
+                datos = {"ruta": "Estados", "estado": self.rnd.choice(self.estados)}
+            else:
+                datos = {"ruta": "Municipios", "municipio": self.rnd.choice(self.municipios)}
+            datos["mes"] = self.rnd.choice(MESES)
+            return tipo, lambda: sesion.post(self.base + "/generar", data=datos, timeout=180)
+        archivos = {"audio_data": ("grabacion_usuario.wav", self.audio, "audio/wav")}
+        return tipo, lambda: sesion.post(self.base + "/procesar-voz", files=archivos, timeout=180)
+
+def correr_nivel(base, pesos, audio, concurrencia, duracion, semilla):
+    muestras = {n: [] for n in pesos}
+    errores = {n: 0 for n in pesos}
+    # 503 con Retry-After: el control de admisión descartó la petición a propósito
+    rechazadas = {n: 0 for n in pesos}
+    lock = threading.Lock()
+    fin = time.monotonic() + duracion
+
+    def trabajador(i):
+        gen = Generador(base, pesos, audio, semilla * 1000 + i)
+        sesion = requests.Session()
+        while time.monotonic() < fin:
+            tipo, peticion = gen.siguiente(sesion)
+            inicio = time.perf_counter()
+            rechazada = False
+            try:
+                resp = peticion()
+                rechazada = resp.status_code == 503 and "Retry-After" in resp.headers
+                ok = resp.status_code < 500
+            except requests.RequestException:
+                ok = False
+            duracion_peticion = time.perf_counter() - inicio
+            with lock:
+                if rechazada:
+                    rechazadas[tipo] += 1
+                    continue
+                muestras[tipo].append(duracion_peticion)
+                if not ok:
+                    errores[tipo] += 1
+
+    hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(concurrencia)]
+    inicio = time.monotonic()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    transcurrido = time.monotonic() - inicio
+
+    por_endpoint = {}
+    for tipo in pesos:
+        n = len(muestras[tipo])
+        por_endpoint[tipo] = {**resumir(muestras[tipo]), "rps": round(n / transcurrido, 2),
+                              "errores": errores[tipo], "tasa_errores": round(errores[tipo] / n, 4) if n else None,
+                              "rechazadas": rechazadas[tipo]}
+    total = sum(len(m) for m in muestras.values())
+    todas = [x for m in muestras.values() for x in m]
+    return {"concurrencia": concurrencia, "rps": round(total / transcurrido, 2),
+            "global": resumir(todas), "endpoints": por_endpoint}
+
+def saturacion(niveles, slo_p99_ms):
+    """Primer nivel donde el rendimiento ya no crece o se rompe el SLO de p99."""
+    previo = None
+    for nivel in niveles:
+        p99 = nivel["global"].get("p99_ms")
+        if slo_p99_ms and p99 is not None and p99 > slo_p99_ms:
+            return nivel["concurrencia"], f"p99 {p99:.0f} ms > SLO {slo_p99_ms:.0f} ms"
+        if previo and nivel["rps"] < previo["rps"] * (1 + CRECIMIENTO_MINIMO):
+            return nivel["concurrencia"], f"rendimiento {previo['rps']} -> {nivel['rps']} req/s"
+        previo = nivel
+    return None, "no se alcanzó en los niveles probados"
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de Siembra+")
+    parser.add_argument("--url", help="Servidor ya levantado; si se omite, la app corre en este proceso")
+    parser.add_argument("--concurrencias", default="1,2,4,8,16")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por nivel")
+    parser.add_argument("--mezcla", default="inicio=0.5,generar=0.4,voz=0.1")
+    parser.add_argument("--clima-latencia", type=float, default=0.08)
+    parser.add_argument("--clima-fallos", type=float, default=0.0)
+    parser.add_argument("--ollama-latencia", type=float, default=1.5)
+    parser.add_argument("--ollama-fallos", type=float, default=0.0)
+    parser.add_argument("--slo-p99-ms", type=float, default=0.0)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", help="Archivo JSON con el informe")
+    args = parser.parse_args()
+
+    dir_temporal = tempfile.mkdtemp(prefix="siembra-carga-")
+    clima, ollama = preparar_entorno(
+        dir_temporal,
+        {"latencia_s": args.clima_latencia, "jitter_s": args.clima_latencia / 2,
+         "tasa_fallos": args.clima_fallos, "semilla": args.semilla},
+        {"latencia_s": args.ollama_latencia, "jitter_s": args.ollama_latencia / 2,
+         "tasa_fallos": args.ollama_fallos, "semilla": args.semilla})
+    servidor = None
+    if args.url:
+        base = args.url.rstrip("/")
+        print("[CARGA] Usando servidor externo. Para que use los simulados, arránquelo con:")
+        print(f"        SIEMBRA_OPEN_METEO_URL={os.environ['SIEMBRA_OPEN_METEO_URL']} "
+              f"SIEMBRA_OLLAMA_URL={os.environ['SIEMBRA_OLLAMA_URL']}")
+    else:
+        servidor, base = _levantar_app()
+
+    with open(muestras_de_audio(dir_temporal)[0], "rb") as f:
+        audio = f.read()
+    pesos = _mezcla(args.mezcla)
+
+    niveles = []
+    try:
+        for c in [int(x) for x in args.concurrencias.split(",")]:
+            print(f"[CARGA] Concurrencia {c} durante {args.duracion:.0f}s...", flush=True)
+            nivel = correr_nivel(base, pesos, audio, c, args.duracion, args.semilla)
+            niveles.append(nivel)
+            print(f"        {nivel['rps']} req/s · p50 {nivel['global'].get('p50_ms')} ms")
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+        clima.detener()
+        ollama.detener()
+
+    punto, motivo = saturacion(niveles, args.slo_p99_ms)
+
+    print(f"\n{'conc':>5} {'endpoint':<9}{'req/s':>9}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'errores':>9}"
+          f"{'503':>7}")
+    for nivel in niveles:
+        for tipo, d in nivel["endpoints"].items():
+            if not d.get("n"):
+                continue
+            print(f"{nivel['concurrencia']:>5} {tipo:<9}{d['rps']:>9}{d['p50_ms']:>11}{d['p90_ms']:>11}"
+                  f"{d['p99_ms']:>11}{d['tasa_errores']:>9.1%}{d['rechazadas']:>7}")
+    print(f"\n[CARGA] Saturación: {punto if punto else '-'} ({motivo})")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "niveles": niveles,
+                       "saturacion": {"concurrencia": punto, "motivo": motivo}}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+# benchmarks/ejecutar.py — Suite de rendimiento reproducible
+#
+#   python -m benchmarks.ejecutar                          # corre todo y compara con la línea base
+#   python -m benchmarks.ejecutar --suites prediccion,puntaje --salida resultados.json
+#   python -m benchmarks.ejecutar --guardar-linea-base     # reemplaza benchmarks/linea_base.json
+#
+# Suites:
+#   prediccion  Prediccion en frío y en caliente para cada lugar del catálogo con series en Datos/
+#   puntaje     calcular_probabilidad_avanzada para cultivo × lugar × mes
+#   generar     POST /generar de punta a punta (cliente de pruebas de Flask + Open-Meteo simulado)
+#   vad         recorte de silencios (actividad_voz), cuánto audio llega a Vosk y, si está vosk,
+#               la decodificación con y sin recorte (Agente.decodificar_pcm)
+#   voz         transcribir_desde_archivo (con y sin VAD) + interpretar_con_gemma (Ollama simulado)
+#
+# Sale con código 1 si algún caso empeora más que --tolerancia respecto a la línea base.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_BENCH = os.path.join(APP_DIR, "benchmarks")
+RUTA_LINEA_BASE = os.path.join(DIR_BENCH, "linea_base.json")
+DIR_AUDIO = os.path.join(DIR_BENCH, "audio")
+SUITES = ("prediccion", "puntaje", "generar", "vad", "voz")
+# Diferencias menores a esto se consideran ruido aunque superen la tolerancia relativa
+PISO_REGRESION_MS = 1.0
+
+# ================================ Estadística ================================
+def resumir(muestras_s):
+    ms = sorted(x * 1000 for x in muestras_s)
+    if not ms:
+        return {"n": 0}
+
+    def pct(p):
+        i = min(len(ms) - 1, max(0, int(round(p / 100 * (len(ms) - 1)))))
+        return round(ms[i], 4)
+
+    return {"n": len(ms), "media_ms": round(sum(ms) / len(ms), 4), "min_ms": round(ms[0], 4),
+            "p50_ms": pct(50), "p90_ms": pct(90), "p95_ms": pct(95), "p99_ms": pct(99),
+            "max_ms": round(ms[-1], 4)}
+
+def cronometrar(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+# ================================ Entorno ====================================
+def preparar_entorno(dir_temporal, config_clima=None, config_ollama=None):
+    """Levanta los servidores simulados y aísla caché y métricas antes de importar la app.
+
+    config_clima / config_ollama se pasan a ServidorStub (latencia_s, jitter_s, tasa_fallos...).
+    """
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+    from benchmarks.stubs import OllamaStub, OpenMeteoStub, ServidorStub
+
+    clima = ServidorStub(OpenMeteoStub, **(config_clima or {})).iniciar()
+    ollama = ServidorStub(OllamaStub, **(config_ollama or {})).iniciar()
+    os.environ["SIEMBRA_OPEN_METEO_URL"] = clima.url + "/v1/forecast"
+    os.environ["SIEMBRA_OLLAMA_URL"] = ollama.url + "/api/generate"
+    os.environ["SIEMBRA_CACHE_RUTA"] = os.path.join(dir_temporal, "cache.sqlite3")
+    os.environ["SIEMBRA_METRICAS_DIR"] = os.path.join(dir_temporal, "metricas")
+    return clima, ollama
+
+def lugares_en_datos():
+    """Lugares del catálogo (lo que llega a /generar) que traen en Datos/ las series de Prediccion.
+
+    Devuelve (lugares, sin_series). Los segundos no se pueden pronosticar y se reportan
+    aparte; cualquier otro error en un lugar de la primera lista hace fallar la suite.
+    """
+    import catalogos
+    from datos_clima import archivo_serie
+    from prediccion import VARIABLES
+
+    lugares, sin_series = [], []
+    for ruta, catalogo in (("Estados", catalogos.estados), ("Municipios", catalogos.municipios)):
+        for lugar in catalogo:
+            try:
+                for variable in VARIABLES[ruta].values():
+                    archivo_serie(ruta, lugar, variable)
+            except FileNotFoundError:
+                sin_series.append(f"{ruta}/{lugar}")
+                continue
+            lugares.append((ruta, lugar))
+    return lugares, sin_series
+
+# ================================= Suites ====================================
+def suite_prediccion(estado, repeticiones):
+    from prediccion import Prediccion
+    import app_inicio
+
+    lugares, sin_series = lugares_en_datos()
+    frio, caliente, errores, pronosticos = [], [], {}, {}
+    for ruta, lugar in lugares:
+        try:
+            duracion, df = cronometrar(Prediccion, ruta=ruta, lugar=lugar)
+        except Exception as e:
+            errores[f"{ruta}/{lugar}"] = f"{type(e).__name__}: {e}"
+            continue
+        frio.append(duracion)
+        pronosticos[(ruta, lugar)] = df
+        app_inicio._pronostico_lugar(ruta, lugar)  # deja la entrada caliente
+        for _ in range(repeticiones):
+            for mes in range(1, 13):
+                caliente.append(cronometrar(app_inicio._pred_cache, ruta, lugar, mes)[0])
+
+    # Un lugar con datos que no se puede pronosticar es un error de la app, no un caso a omitir
+    assert not errores, f"Prediccion falló en {len(errores)} lugares: {errores}"
+    estado["pronosticos"] = pronosticos
+    return {"prediccion.frio": resumir(frio), "prediccion.caliente": resumir(caliente)}, \
+        {"lugares": len(lugares), "sin_series": sin_series}
+
+def suite_puntaje(estado, repeticiones):
+    import cultivos
+
+    pronosticos = estado.get("pronosticos")
+    if not pronosticos:
+        from prediccion import Prediccion
+        pronosticos = {(ruta, lugar): Prediccion(ruta=ruta, lugar=lugar) for ruta, lugar in lugares_en_datos()[0]}
+
+    # Los mismos óptimos que usa la app (cultivos.optimos_cultivo), no una copia del parseo
+    optimos = [o for o in map(cultivos.optimos_cultivo, cultivos.CONDICIONES_DF["Cultivo"]) if o is not None]
+
+    rnd = random.Random(42)
+    casos = []
+    for df in pronosticos.values():
+        for _, fila in df.iterrows():
+            preds = {"tmin": int(fila["Pred_TempMin"]), "tmax": int(fila["Pred_tempMax"]),
+                     "precip": round(rnd.uniform(0, 250), 1), "hum": round(rnd.uniform(30, 95), 1)}
+            casos += [(preds, o) for o in optimos]
+
+    por_llamada, barrido = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for preds, opt in casos:
+            cultivos.calcular_probabilidad_avanzada(preds, opt)
+        total = time.perf_counter() - inicio
+        barrido.append(total)
+        por_llamada.append(total / max(1, len(casos)))
+    return {"puntaje.por_llamada": resumir(por_llamada), "puntaje.barrido_completo": resumir(barrido)}, \
+        {"combinaciones": len(casos)}
+
+def suite_generar(estado, repeticiones):
+    from app import create_app
+    import app_inicio
+    from cache_compartido import cache
+
+    app = create_app()
+    cliente = app.test_client()
+    mes = app_inicio.mes_actual_nombre()
+    lugares = [(r, l) for r, l in lugares_en_datos()[0] if r == "Estados"]
+
+    def post(ruta, lugar):
+        campo = "estado" if ruta == "Estados" else "municipio"
+        r = cliente.post("/generar", data={"ruta": ruta, campo: lugar, "mes": mes})
+        assert r.status_code == 200, r.status_code
+
+    cache.limpiar()
+    app_inicio._pronostico_lugar.cache_clear()
+    frio = [cronometrar(post, r, l)[0] for r, l in lugares]
+    caliente = [cronometrar(post, r, l)[0] for _ in range(repeticiones) for r, l in lugares]
+    inicio = cronometrar(cliente.get, "/")[0]
+    portada = [cronometrar(cliente.get, "/")[0] for _ in range(repeticiones * 5)]
+    return {"generar.frio": resumir(frio), "generar.caliente": resumir(caliente),
+            "inicio.get": resumir(portada)}, {"lugares": len(lugares), "primer_get_ms": round(inicio * 1000, 3)}
+
+def _audio_sintetico(destino):
+    """3 s a 16 kHz mono: silencio, un tramo de tonos y ruido, y silencio otra vez."""
+    rnd = random.Random(7)
+    muestras = []
+    for i in range(16000 * 3):
+        t = i / 16000
+        if 0.8 <= t < 2.2:
+            v = 0.3 * (((i * 220 // 16000) % 2) * 2 - 1) + rnd.uniform(-0.1, 0.1)
+        else:
+            v = rnd.uniform(-0.005, 0.005)
+        muestras.append(int(max(-1, min(1, v)) * 32767))
+    with wave.open(destino, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(struct.pack(f"<{len(muestras)}h", *muestras))
+    return destino
+
+def muestras_de_audio(dir_temporal):
+    archivos = []
+    if os.path.isdir(DIR_AUDIO):
+        archivos = [os.path.join(DIR_AUDIO, n) for n in sorted(os.listdir(DIR_AUDIO))
+                    if n.lower().endswith((".wav", ".webm", ".ogg", ".mp3"))]
+    return archivos or [_audio_sintetico(os.path.join(dir_temporal, "sintetico.wav"))]
+
+def _audio_con_pausas(destino):
+    """12 s como una nota de voz real: 2 s de silencio, dos frases con 5 s de aire muerto entre ellas."""
+    rnd = random.Random(11)
+    muestras = []
+    for i in range(16000 * 12):
+        t = i / 16000
+        if 2.0 <= t < 3.6 or 8.6 <= t < 10.0:
+            v = 0.3 * (((i * 180 // 16000) % 2) * 2 - 1) * rnd.uniform(0.3, 1.0)
+        else:
+            v = rnd.uniform(-0.004, 0.004)
+        muestras.append(int(max(-1, min(1, v)) * 32767))
+    with wave.open(destino, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(struct.pack(f"<{len(muestras)}h", *muestras))
+    return destino
+
+def _pcm_16k(archivo, dir_temporal):
+    """PCM s16le mono 16 kHz de una muestra (los formatos que no son WAV pasan por ffmpeg)."""
+    if not archivo.lower().endswith(".wav"):
+        if shutil.which("ffmpeg") is None:
+            return None
+        convertido = os.path.join(dir_temporal, "vad.wav")
+        subprocess.run(["ffmpeg", "-i", archivo, "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", "-y", convertido],
+                       check=True, capture_output=True)
+        archivo = convertido
+    with wave.open(archivo, "rb") as wf:
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+def suite_vad(estado, repeticiones):
+    from actividad_voz import recortar_silencios
+
+    # La decodificación necesita vosk y el modelo, como la suite voz; el recorte se mide siempre
+    try:
+        import Agente
+    except Exception as e:
+        Agente, sin_vosk = None, f"no se pudo importar Agente.py ({e})"
+
+    muestras = muestras_de_audio(estado["dir_temporal"])
+    muestras.append(_audio_con_pausas(os.path.join(estado["dir_temporal"], "pausas.wav")))
+    tiempos, recortado, completo, detalle = [], [], [], {}
+    for archivo in muestras:
+        leido = _pcm_16k(archivo, estado["dir_temporal"])
+        if leido is None:
+            continue
+        pcm, tasa = leido
+        for _ in range(repeticiones * 20):
+            duracion, (voz, info) = cronometrar(recortar_silencios, pcm, tasa)
+            tiempos.append(duracion)
+        detalle[os.path.basename(archivo)] = {**info, "fraccion_a_vosk": round(info["voz_s"] / info["original_s"], 3)
+                                              if info["original_s"] else None}
+        if Agente is not None:
+            # Solo KaldiRecognizer sobre el PCM ya leído: el ahorro del recorte sin ruido de E/S
+            for _ in range(repeticiones):
+                recortado.append(cronometrar(Agente.decodificar_pcm, voz, tasa)[0])
+                completo.append(cronometrar(Agente.decodificar_pcm, pcm, tasa)[0])
+
+    casos = {"vad.recorte": resumir(tiempos)}
+    if Agente is None:
+        detalle["decodificacion"] = f"omitida: {sin_vosk}"
+    else:
+        casos["vad.decodificar"], casos["vad.decodificar_completo"] = resumir(recortado), resumir(completo)
+        con, sin = casos["vad.decodificar"], casos["vad.decodificar_completo"]
+        detalle["ahorro_p50_decodificacion"] = round(1 - con["p50_ms"] / sin["p50_ms"], 3) if sin.get("p50_ms") else None
+    return casos, detalle
+
+def suite_voz(estado, repeticiones):
+    try:
+        import Agente
+    except Exception as e:
+        raise RuntimeError(f"no se pudo importar Agente.py ({e})")
+
+    muestras = muestras_de_audio(estado["dir_temporal"])
+    muestras.append(_audio_con_pausas(os.path.join(estado["dir_temporal"], "pausas.wav")))
+    # Los WAV 16 kHz mono van directo a Vosk; el resto (webm, ogg...) necesita ffmpeg
+    if shutil.which("ffmpeg") is None:
+        muestras = [m for m in muestras if Agente.es_wav_para_vosk(m)]
+    transcribir, sin_vad, interpretar = [], [], []
+    usar_vad = Agente.USAR_VAD
+    try:
+        for original in muestras:
+            for _ in range(repeticiones):
+                # transcribir_desde_archivo escribe junto a la entrada: se trabaja sobre una copia
+                copia = os.path.join(estado["dir_temporal"], "entrada" + os.path.splitext(original)[1])
+                for vad, tiempos in ((True, transcribir), (False, sin_vad)):
+                    shutil.copyfile(original, copia)
+                    Agente.USAR_VAD = vad
+                    duracion, texto = cronometrar(Agente.transcribir_desde_archivo, copia)
+                    tiempos.append(duracion)
+                interpretar.append(cronometrar(Agente.interpretar_con_gemma, texto or "quiero sembrar maíz en jalisco")[0])
+    finally:
+        Agente.USAR_VAD = usar_vad
+    con, sin = resumir(transcribir), resumir(sin_vad)
+    ahorro = round(1 - con["p50_ms"] / sin["p50_ms"], 3) if sin.get("p50_ms") else None
+    return ({"voz.transcribir": con, "voz.transcribir_sin_vad": sin, "voz.interpretar": resumir(interpretar)},
+            {"ahorro_p50_vad": ahorro})
+
+FUNCIONES = {"prediccion": suite_prediccion, "puntaje": suite_puntaje, "generar": suite_generar, "vad": suite_vad,
+             "voz": suite_voz}
+
+# ============================== Comparación ==================================
+def comparar(resultados, linea_base, tolerancia):
+    regresiones, filas = [], []
+    for caso, actual in sorted(resultados.items()):
+        base = linea_base.get("resultados", {}).get(caso)
+        if not base or "p50_ms" not in actual or "p50_ms" not in base:
+            filas.append((caso, actual.get("p50_ms"), None, ""))
+            continue
+        cambio = (actual["p50_ms"] - base["p50_ms"]) / base["p50_ms"] if base["p50_ms"] else 0.0
+        es_regresion = cambio > tolerancia and actual["p50_ms"] - base["p50_ms"] > PISO_REGRESION_MS
+        if es_regresion:
+            regresiones.append(caso)
+        filas.append((caso, actual["p50_ms"], base["p50_ms"], "REGRESIÓN" if es_regresion else f"{cambio:+.0%}"))
+    return regresiones, filas
+
+def _version_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de Siembra+")
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", help="Archivo JSON donde escribir los resultados")
+    parser.add_argument("--linea-base", default=RUTA_LINEA_BASE)
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento relativo permitido en p50")
+    parser.add_argument("--guardar-linea-base", action="store_true")
+    args = parser.parse_args()
+
+    dir_temporal = tempfile.mkdtemp(prefix="siembra-bench-")
+    clima, ollama = preparar_entorno(dir_temporal)
+    random.seed(0)
+
+    estado = {"dir_temporal": dir_temporal}
+    resultados, detalles, omitidas = {}, {}, {}
+    try:
+        for nombre in [s.strip() for s in args.suites.split(",") if s.strip()]:
+            print(f"[BENCH] Suite {nombre}...", flush=True)
+            try:
+                casos, detalle = FUNCIONES[nombre](estado, args.repeticiones)
+            except RuntimeError as e:
+                omitidas[nombre] = str(e)
+                print(f"[BENCH]   omitida: {e}")
+                continue
+            resultados.update(casos)
+            detalles[nombre] = detalle
+    finally:
+        clima.detener()
+        ollama.detener()
+        shutil.rmtree(dir_temporal, ignore_errors=True)
+
+    informe = {
+        "meta": {"fecha": datetime.now().isoformat(timespec="seconds"), "commit": _version_git(),
+                 "python": platform.python_version(), "plataforma": platform.platform(),
+                 "cpus": os.cpu_count(), "repeticiones": args.repeticiones},
+        "resultados": resultados, "detalles": detalles, "omitidas": omitidas,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+
+    if args.guardar_linea_base:
+        with open(args.linea_base, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"[BENCH] Línea base guardada en {args.linea_base}")
+
+    try:
+        with open(args.linea_base, encoding="utf-8") as f:
+            linea_base = json.load(f)
+    except (OSError, ValueError):
+        linea_base = {}
+    regresiones, filas = comparar(resultados, linea_base, args.tolerancia)
+
+    print(f"\n{'caso':<28}{'p50 ms':>12}{'base ms':>12}  cambio")
+    for caso, actual, base, nota in filas:
+        print(f"{caso:<28}{actual if actual is not None else '-':>12}{base if base is not None else '-':>12}  {nota}")
+    for nombre, razon in omitidas.items():
+        print(f"{nombre:<28}{'omitida':>12}  {razon}")
+    if regresiones:
+        print(f"\n[BENCH] Regresiones (> {args.tolerancia:.0%} en p50): {', '.join(regresiones)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
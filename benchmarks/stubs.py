@@ -0,0 +1,115 @@
+# benchmarks/stubs.py — Servidores locales que imitan a Open-Meteo y a Ollama
+#
+# Permiten medir la app sin red ni GPU: responden con datos deterministas, con la
+# latencia y la tasa de fallos que se les configure.
+#
+#   clima = ServidorStub(OpenMeteoStub, latencia_s=0.05, tasa_fallos=0.01).iniciar()
+#   os.environ["SIEMBRA_OPEN_METEO_URL"] = clima.url + "/v1/forecast"
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class _ManejadorBase(BaseHTTPRequestHandler):
+    # Los atributos de configuración los pone ServidorStub en una subclase
+    latencia_s = 0.0
+    jitter_s = 0.0
+    tasa_fallos = 0.0
+    aleatorio = random.Random(0)
+    lock = threading.Lock()
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _esperar_y_fallar(self) -> bool:
+        with self.lock:
+            espera = self.latencia_s + self.aleatorio.uniform(0, self.jitter_s)
+            falla = self.aleatorio.random() < self.tasa_fallos
+        if espera > 0:
+            time.sleep(espera)
+        if falla:
+            self._responder(503, {"error": "fallo simulado"})
+        return falla
+
+    def _responder(self, codigo: int, cuerpo: dict):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+def _semilla(*partes) -> int:
+    return int(hashlib.sha256("|".join(map(str, partes)).encode()).hexdigest()[:8], 16)
+
+class OpenMeteoStub(_ManejadorBase):
+    """GET /v1/forecast?latitude=..&longitude=..&start_date=..&end_date=.."""
+
+    def do_GET(self):
+        if self._esperar_y_fallar():
+            return
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        try:
+            inicio = date.fromisoformat(q["start_date"])
+            fin = date.fromisoformat(q["end_date"])
+        except (KeyError, ValueError):
+            self._responder(400, {"error": True, "reason": "fechas inválidas"})
+            return
+        dias = (fin - inicio).days + 1
+        rnd = random.Random(_semilla(q.get("latitude"), q.get("longitude"), q["start_date"]))
+        self._responder(200, {
+            "latitude": float(q.get("latitude", 0)),
+            "longitude": float(q.get("longitude", 0)),
+            "daily": {
+                "time": [date.fromordinal(inicio.toordinal() + i).isoformat() for i in range(dias)],
+                "precipitation_sum": [round(rnd.uniform(0, 8), 1) for _ in range(dias)],
+                "relative_humidity_2m_mean": [round(rnd.uniform(40, 90), 1) for _ in range(dias)],
+            },
+        })
+
+class OllamaStub(_ManejadorBase):
+    """POST /api/generate — contesta el JSON que esperaría interpretar_con_gemma."""
+
+    respuestas = (
+        {"ruta": "Estados", "lugar": "Jalisco", "cultivo": "Maíz grano", "mes": 6},
+        {"ruta": "Estados", "lugar": "Guanajuato", "cultivo": "Frijol", "mes": 9},
+        {"ruta": "Municipios", "lugar": "Xalapa", "cultivo": "Tomate rojo (jitomate)", "mes": 3},
+        {"ruta": "Estados", "lugar": "Veracruz", "cultivo": None, "mes": 11},
+    )
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+        if self._esperar_y_fallar():
+            return
+        elegida = self.respuestas[_semilla(cuerpo.get("prompt", "")) % len(self.respuestas)]
+        self._responder(200, {"model": cuerpo.get("model"), "response": json.dumps(elegida, ensure_ascii=False),
+                              "done": True})
+
+class ServidorStub:
+    def __init__(self, manejador, host: str = "127.0.0.1", puerto: int = 0,
+                 latencia_s: float = 0.0, jitter_s: float = 0.0, tasa_fallos: float = 0.0, semilla: int = 0):
+        config = {"latencia_s": latencia_s, "jitter_s": jitter_s, "tasa_fallos": tasa_fallos,
+                  "aleatorio": random.Random(semilla), "lock": threading.Lock()}
+        self._clase = type(manejador.__name__, (manejador,), config)
+        self._servidor = ThreadingHTTPServer((host, puerto), self._clase)
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> "ServidorStub":
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
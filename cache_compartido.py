@@ -0,0 +1,217 @@
+# cache_compartido.py — Caché de resultados compartida entre procesos (SQLite local)
+#
+# Todos los workers de servidor.py usan el mismo archivo, así que un pronóstico,
+# una consulta de clima o un cálculo de puntajes hecho por un worker le sirve a
+# los demás. Cada espacio de nombres ("pronostico", "clima", "puntaje", ...) tiene
+# su límite en bytes y su TTL; al pasarse del límite se desaloja lo menos usado.
+#
+# Las estadísticas (aciertos, fallos, desalojos) se acumulan en memoria y se
+# vuelcan al archivo como mucho cada segundo, para no escribir en cada lectura.
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA_POR_DEFECTO = os.environ.get("SIEMBRA_CACHE_RUTA", os.path.join(APP_DIR, "cache", "siembra_cache.sqlite3"))
+
+MB = 1024 * 1024
+# espacio: (límite en bytes, TTL en segundos)
+ESPACIOS = {
+    "pronostico": (64 * MB, 7 * 24 * 3600),
+    "clima":      (4 * MB, 3 * 3600),
+    "puntaje":    (16 * MB, 3 * 3600),
+}
+ESPACIO_GENERICO = (8 * MB, 3600)
+# Solo se reescribe ultimo_acceso si quedó más viejo que esto (LRU aproximado)
+RESOLUCION_LRU_S = 30.0
+INTERVALO_VOLCADO_S = 1.0
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    espacio TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    valor BLOB NOT NULL,
+    tam INTEGER NOT NULL,
+    expira REAL NOT NULL,
+    ultimo_acceso REAL NOT NULL,
+    PRIMARY KEY (espacio, clave)
+);
+CREATE INDEX IF NOT EXISTS entradas_lru ON entradas (espacio, ultimo_acceso);
+CREATE TABLE IF NOT EXISTS estadisticas (
+    espacio TEXT NOT NULL,
+    campo TEXT NOT NULL,
+    valor INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (espacio, campo)
+);
+"""
+
+_FALTA = object()
+
+class CacheCompartido:
+    def __init__(self, ruta: str = RUTA_POR_DEFECTO, espacios: Optional[Dict[str, Tuple[int, float]]] = None):
+        self.ruta = ruta
+        self.espacios = dict(ESPACIOS if espacios is None else espacios)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pendientes: Counter = Counter()
+        self._ultimo_volcado = time.monotonic()
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+
+    # ------------------------------------------------------------- conexión ---
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso: tras un fork no se reutiliza la del padre
+        con = getattr(self._local, "con", None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta, timeout=10, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(_ESQUEMA)
+            self._local.con, self._local.pid = con, os.getpid()
+        return con
+
+    @staticmethod
+    def _clave(clave: Hashable) -> str:
+        return json.dumps(clave, ensure_ascii=False, sort_keys=True, default=str)
+
+    def _limites(self, espacio: str) -> Tuple[int, float]:
+        return self.espacios.get(espacio, ESPACIO_GENERICO)
+
+    # -------------------------------------------------------- estadísticas ---
+    def _contar(self, espacio: str, campo: str, n: int = 1):
+        with self._lock:
+            self._pendientes[(espacio, campo)] += n
+            toca = time.monotonic() - self._ultimo_volcado >= INTERVALO_VOLCADO_S
+        if toca:
+            self.volcar_estadisticas()
+
+    def volcar_estadisticas(self):
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, Counter()
+            self._ultimo_volcado = time.monotonic()
+        if not pendientes:
+            return
+        try:
+            self._conexion().executemany(
+                "INSERT INTO estadisticas (espacio, campo, valor) VALUES (?, ?, ?) "
+                "ON CONFLICT (espacio, campo) DO UPDATE SET valor = valor + excluded.valor",
+                [(e, c, n) for (e, c), n in pendientes.items()],
+            )
+        except sqlite3.Error as e:
+            print(f"[CACHE] No se pudieron guardar las estadísticas: {e}")
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        """Contadores y ocupación por espacio (sumando todos los procesos)."""
+        self.volcar_estadisticas()
+        con = self._conexion()
+        resultado: Dict[str, Dict[str, Any]] = {}
+        for espacio in self.espacios:
+            limite, ttl = self._limites(espacio)
+            resultado[espacio] = {"hits": 0, "misses": 0, "guardados": 0, "desalojos": 0, "expirados": 0,
+                                  "entradas": 0, "bytes": 0, "limite_bytes": limite, "ttl_s": ttl}
+        for espacio, campo, valor in con.execute("SELECT espacio, campo, valor FROM estadisticas"):
+            resultado.setdefault(espacio, {}).update({campo: valor})
+        for espacio, n, tam in con.execute("SELECT espacio, COUNT(*), COALESCE(SUM(tam), 0) FROM entradas GROUP BY espacio"):
+            resultado.setdefault(espacio, {}).update({"entradas": n, "bytes": tam})
+        for datos in resultado.values():
+            consultas = datos.get("hits", 0) + datos.get("misses", 0)
+            datos["tasa_aciertos"] = round(datos.get("hits", 0) / consultas, 4) if consultas else None
+        return resultado
+
+    # ------------------------------------------------------------ operaciones ---
+    def obtener(self, espacio: str, clave: Hashable, defecto: Any = None) -> Any:
+        texto, ahora = self._clave(clave), time.time()
+        try:
+            con = self._conexion()
+            fila = con.execute(
+                "SELECT valor, expira, ultimo_acceso FROM entradas WHERE espacio = ? AND clave = ?",
+                (espacio, texto),
+            ).fetchone()
+            if fila is None:
+                self._contar(espacio, "misses")
+                return defecto
+            valor, expira, ultimo = fila
+            if expira <= ahora:
+                con.execute("DELETE FROM entradas WHERE espacio = ? AND clave = ?", (espacio, texto))
+                self._contar(espacio, "misses")
+                self._contar(espacio, "expirados")
+                return defecto
+            if ahora - ultimo > RESOLUCION_LRU_S:
+                con.execute("UPDATE entradas SET ultimo_acceso = ? WHERE espacio = ? AND clave = ?",
+                            (ahora, espacio, texto))
+            resultado = pickle.loads(valor)
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError) as e:
+            print(f"[CACHE] Error al leer {espacio}: {e}")
+            return defecto
+        self._contar(espacio, "hits")
+        return resultado
+
+    def guardar(self, espacio: str, clave: Hashable, valor: Any, ttl: Optional[float] = None):
+        limite, ttl_defecto = self._limites(espacio)
+        datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(datos) > limite:
+            return  # no cabe ni sola: no vale la pena vaciar el espacio por ella
+        ahora = time.time()
+        try:
+            con = self._conexion()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                con.execute(
+                    "INSERT OR REPLACE INTO entradas (espacio, clave, valor, tam, expira, ultimo_acceso) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (espacio, self._clave(clave), datos, len(datos), ahora + (ttl or ttl_defecto), ahora),
+                )
+                expirados = con.execute("DELETE FROM entradas WHERE espacio = ? AND expira <= ?",
+                                        (espacio, ahora)).rowcount
+                desalojos = self._desalojar(con, espacio, limite)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"[CACHE] Error al guardar en {espacio}: {e}")
+            return
+        self._contar(espacio, "guardados")
+        if expirados:
+            self._contar(espacio, "expirados", expirados)
+        if desalojos:
+            self._contar(espacio, "desalojos", desalojos)
+
+    @staticmethod
+    def _desalojar(con: sqlite3.Connection, espacio: str, limite: int) -> int:
+        ocupado = con.execute("SELECT COALESCE(SUM(tam), 0) FROM entradas WHERE espacio = ?", (espacio,)).fetchone()[0]
+        desalojos = 0
+        if ocupado <= limite:
+            return 0
+        for clave, tam in con.execute(
+            "SELECT clave, tam FROM entradas WHERE espacio = ? ORDER BY ultimo_acceso", (espacio,)
+        ).fetchall():
+            if ocupado <= limite:
+                break
+            con.execute("DELETE FROM entradas WHERE espacio = ? AND clave = ?", (espacio, clave))
+            ocupado -= tam
+            desalojos += 1
+        return desalojos
+
+    def obtener_o_calcular(self, espacio: str, clave: Hashable, funcion: Callable[[], Any],
+                           ttl: Optional[float] = None, guardar_si: Callable[[Any], bool] = None) -> Any:
+        valor = self.obtener(espacio, clave, _FALTA)
+        if valor is not _FALTA:
+            return valor
+        valor = funcion()
+        if guardar_si is None or guardar_si(valor):
+            self.guardar(espacio, clave, valor, ttl)
+        return valor
+
+    def limpiar(self, espacio: Optional[str] = None):
+        con = self._conexion()
+        if espacio is None:
+            con.execute("DELETE FROM entradas")
+        else:
+            con.execute("DELETE FROM entradas WHERE espacio = ?", (espacio,))
+
+cache = CacheCompartido()
@@ -0,0 +1,110 @@
+# coalescencia.py — Una sola ejecución por clave para cálculos caros (single-flight)
+#
+# Si N peticiones piden al mismo tiempo algo que todavía no está calculado, solo
+# la primera lo calcula; las demás esperan ese mismo resultado en lugar de repetir
+# el trabajo (por ejemplo, entrenar los mismos Random Forest N veces).
+#
+# al_esperar(hilo_lider) es un context manager opcional que envuelve la espera de
+# cada seguidor; admision.esperando_a lo usa para que el líder herede la prioridad
+# de quien lo espera.
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any, Callable, ContextManager, Dict, Hashable, Optional
+
+class _Llamada:
+    __slots__ = ("evento", "resultado", "error", "hilo")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.hilo = threading.get_ident()
+
+class UnaSolaVez:
+    """Coalesce llamadas concurrentes con la misma clave en una sola ejecución."""
+
+    def __init__(self, al_esperar: Optional[Callable[[int], ContextManager]] = None):
+        self._lock = threading.Lock()
+        self._en_curso: Dict[Hashable, _Llamada] = {}
+        self._al_esperar = al_esperar or (lambda hilo: nullcontext())
+
+    def hacer(self, clave: Hashable, funcion: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            llamada = self._en_curso.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = self._en_curso[clave] = _Llamada()
+
+        if not lider:
+            with self._al_esperar(llamada.hilo):
+                llamada.evento.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion(*args, **kwargs)
+            return llamada.resultado
+        except BaseException as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            llamada.evento.set()
+
+    def en_curso(self, clave: Hashable) -> bool:
+        with self._lock:
+            return clave in self._en_curso
+
+def memo_coalescido(maxsize: int = 128, al_esperar: Optional[Callable[[int], ContextManager]] = None):
+    """Como functools.lru_cache, pero los fallos concurrentes de una misma clave se
+    calculan una sola vez. Los errores no se guardan en caché."""
+
+    def decorador(funcion):
+        cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        lock = threading.Lock()
+        vuelo = UnaSolaVez(al_esperar)
+        stats = {"hits": 0, "misses": 0}
+
+        def _calcular(clave, args, kwargs):
+            # Otro hilo pudo terminar justo antes de que entráramos como líder
+            with lock:
+                if clave in cache:
+                    return cache[clave]
+            valor = funcion(*args, **kwargs)
+            with lock:
+                cache[clave] = valor
+                cache.move_to_end(clave)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return valor
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            clave = (args, tuple(sorted(kwargs.items())))
+            with lock:
+                if clave in cache:
+                    cache.move_to_end(clave)
+                    stats["hits"] += 1
+                    return cache[clave]
+                stats["misses"] += 1
+            return vuelo.hacer(clave, _calcular, clave, args, kwargs)
+
+        def cache_info():
+            with lock:
+                return {**stats, "maxsize": maxsize, "currsize": len(cache)}
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                stats.update(hits=0, misses=0)
+
+        envoltura.cache_info = cache_info
+        envoltura.cache_clear = cache_clear
+        envoltura.en_curso = lambda *args, **kwargs: vuelo.en_curso((args, tuple(sorted(kwargs.items()))))
+        return envoltura
+
+    return decorador
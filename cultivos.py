@@ -1,8 +1,124 @@
+import unicodedata
+from functools import lru_cache
+from typing import Optional
+
 import pandas as pd
 
+# Puntaje de adecuación de cultivos: funciones puras sobre Ideal/ y
+# condiciones_ideales/, sin Flask ni Agente, para que reportes, exportación y
+# benchmarks puedan usarlas sin cargar el blueprint (ni el modelo de voz).
+
+@lru_cache(maxsize=None)
 def obtener_cultivos(ruta_csv):
     df = pd.read_csv(ruta_csv)
-    
+
     # Agrupar por entidad y convertir a diccionario
     return df.groupby("Entidad")["Cultivo"].apply(list).to_dict()
 
+def normalizar_texto(texto: str) -> str:
+    if not isinstance(texto, str):
+        return texto
+    if isinstance(texto, str) and ',' in texto:
+        texto = texto.replace(',', '.')
+    texto = unicodedata.normalize("NFD", str(texto)).encode("ascii", "ignore").decode("utf-8")
+    return texto.upper()
+
+try:
+    CONDICIONES_DF = pd.read_csv("./condiciones_ideales/CondicionesIdeales.csv", encoding="utf-8")
+    CONDICIONES_DF.columns = [col.strip().replace(' ', '_') for col in CONDICIONES_DF.columns]
+    CONDICIONES_DF["Cultivo_normalizado"] = CONDICIONES_DF["Cultivo"].apply(normalizar_texto)
+except Exception:
+    CONDICIONES_DF = pd.DataFrame()
+
+def cultivos_del_lugar(ruta: str, lugar: str) -> list:
+    ruta_csv_cultivos = "./Ideal/CultivoEstado.csv" if ruta == "Estados" else "./Ideal/CultivoMunicipio.csv"
+    return obtener_cultivos(ruta_csv_cultivos).get(lugar, [])
+
+def optimos_cultivo(cultivo: str) -> Optional[dict]:
+    """Condiciones ideales del cultivo en el formato de calcular_probabilidad_avanzada."""
+    cond = CONDICIONES_DF[CONDICIONES_DF["Cultivo_normalizado"] == normalizar_texto(cultivo)]
+    if cond.empty:
+        return None
+    lluvia_opt  = float(str(cond["Lluvias_optima"].iloc[0]).replace(',', '.'))
+    humedad_opt = float(str(cond["Humedad"].iloc[0]).replace(',', '.'))
+    return {
+        "tmin": float(str(cond["Temp_min_optima"].iloc[0]).replace(',', '.')),
+        "tmax": float(str(cond["Temp_max_optima"].iloc[0]).replace(',', '.')),
+        "pmin": lluvia_opt * 0.8,  "pmax": lluvia_opt * 1.2,
+        "hmin": humedad_opt * 0.9, "hmax": humedad_opt * 1.1,
+        "p_opt": lluvia_opt, "h_opt": humedad_opt,
+    }
+
+def calcular_probabilidad_avanzada(preds: dict, optimos: dict, pesos=None, config=None):
+    if pesos is None:
+        pesos = {"tmin": 0.18, "tmax": 0.18, "tmed": 0.24, "precip": 0.24, "hum": 0.16}
+    if config is None:
+        config = {
+            "precip_deficit_tol": 0.20,
+            "hum_tolerancia": 0.10,
+            "hum_rolloff": 0.50,
+            "temp_holgura_c": 5.0,
+            "tmed_holgura_c": 3.0,
+        }
+
+    def clamp01(x): return max(0.0, min(1.0, x))
+
+    def score_precipitacion(pred, p_opt, deficit_tol):
+        if p_opt <= 0: return 0.0
+        if pred >= p_opt: return 1.0
+        piso = p_opt * (1.0 - deficit_tol)
+        if pred <= piso: return 0.0
+        return (pred - piso) / (p_opt - piso)
+
+    def score_humedad(pred, h_opt, tol_centro, rolloff):
+        if h_opt <= 0: return 0.0
+        delta_rel = abs(pred - h_opt) / h_opt
+        if delta_rel <= tol_centro: return 1.0
+        exceso = delta_rel - tol_centro
+        if exceso >= rolloff: return 0.0
+        return 1.0 - (exceso / rolloff)
+
+    def score_temperatura(valor, rango_min, rango_max, holgura):
+        if rango_min is None or rango_max is None: return 0.0
+        if rango_min > rango_max: rango_min, rango_max = rango_max, rango_min
+        if rango_min <= valor <= rango_max: return 1.0
+        distancia = (rango_min - valor) if valor < rango_min else (valor - rango_max)
+        if distancia >= holgura: return 0.0
+        return 1.0 - (distancia / holgura)
+
+    def score_temperatura_central(valor, t_opt, holgura):
+        if t_opt is None or holgura is None or holgura <= 0: return 0.0
+        d = abs(valor - t_opt)
+        if d >= holgura: return 0.0
+        return 1.0 - (d / holgura)
+
+    p_opt = optimos.get("p_opt", (optimos["pmin"] + optimos["pmax"]) / 2.0)
+    h_opt = optimos.get("h_opt", (optimos["hmin"] + optimos["hmax"]) / 2.0)
+
+    tmin_pred = preds.get("tmin")
+    tmax_pred = preds.get("tmax")
+    tmed_pred = preds.get("tmed", None)
+    if tmed_pred is None and (tmin_pred is not None and tmax_pred is not None):
+        tmed_pred = (tmin_pred + tmax_pred) / 2.0
+
+    tmed_opt = optimos.get("tmed_opt", None)
+    if tmed_opt is None and ("tmin" in optimos and "tmax" in optimos):
+        tmed_opt = (optimos["tmin"] + optimos["tmax"]) / 2.0
+
+    s_tmin = score_temperatura(tmin_pred, optimos["tmin"], optimos["tmax"], config["temp_holgura_c"])
+    s_tmax = score_temperatura(tmax_pred, optimos["tmin"], optimos["tmax"], config["temp_holgura_c"])
+    s_tmed = score_temperatura_central(tmed_pred, tmed_opt, config["tmed_holgura_c"]) if tmed_pred is not None else 0.0
+    s_prec = score_precipitacion(preds["precip"], p_opt, config["precip_deficit_tol"])
+    s_hum  = score_humedad(preds["hum"], h_opt, config["hum_tolerancia"], config["hum_rolloff"])
+
+    total_pesos = sum(pesos.values()) or 1.0
+    score = (
+        pesos.get("tmin", 0.0)   * s_tmin +
+        pesos.get("tmax", 0.0)   * s_tmax +
+        pesos.get("tmed", 0.0)   * s_tmed +
+        pesos.get("precip", 0.0) * s_prec +
+        pesos.get("hum", 0.0)    * s_hum
+    ) / total_pesos
+
+    valor = int(round(100 * clamp01(score)))
+    return 99 if valor == 100 else valor
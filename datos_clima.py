@@ -0,0 +1,132 @@
+# datos_clima.py — Series climáticas de Datos/ compiladas en memoria
+#
+# Los CSV de Datos/ son de solo lectura: se leen una sola vez por proceso y se
+# sirven desde memoria. En producción (servidor.py) se cargan en el proceso
+# padre antes del fork, así los workers comparten esas páginas copy-on-write.
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_DATOS = os.path.join(APP_DIR, "Datos")
+
+_TABLAS: Dict[str, pd.DataFrame] = {}
+
+def _clave(ruta: str) -> str:
+    completa = ruta if os.path.isabs(ruta) else os.path.join(APP_DIR, ruta)
+    return os.path.relpath(os.path.normpath(completa), APP_DIR).replace(os.sep, "/")
+
+def cargar_todo(directorio: str = DIR_DATOS) -> int:
+    """Lee todos los CSV de Datos/ a memoria. Devuelve cuántas tablas hay cargadas."""
+    for raiz, _, nombres in os.walk(directorio):
+        for nombre in nombres:
+            if not nombre.lower().endswith(".csv"):
+                continue
+            completa = os.path.join(raiz, nombre)
+            clave = _clave(completa)
+            if clave not in _TABLAS:
+                _TABLAS[clave] = pd.read_csv(completa)
+    return len(_TABLAS)
+
+def leer_csv(ruta: str) -> pd.DataFrame:
+    """Equivalente a pd.read_csv(ruta) pero servido desde memoria.
+
+    Devuelve una copia: quien llama puede renombrar o modificar columnas sin
+    tocar la tabla compartida.
+    """
+    clave = _clave(ruta)
+    tabla = _TABLAS.get(clave)
+    if tabla is None:
+        tabla = pd.read_csv(os.path.join(APP_DIR, clave))
+        _TABLAS[clave] = tabla
+    return tabla.copy()
+
+def tablas_cargadas() -> Dict[str, pd.DataFrame]:
+    return _TABLAS
+
+# ============================ Series por lugar ===============================
+# Nombre de archivo -> variable. Estados: "<Lugar>-<sufijo>.csv"; municipios:
+# "<PREFIJO>-<LUGAR>.csv" (algunos sueltos en Datos/municipios/ y con carpetas
+# que no coinciden con el catálogo, por eso se indexa por el nombre del archivo).
+VARIABLES_ESTADOS = {"TempMin": "temp_min", "tempMax": "temp_max", "tempMedia": "temp_media", "Lluvias": "lluvia"}
+VARIABLES_MUNICIPIOS = {
+    "LLUVIA TOTAL MENSUAL": "lluvia",
+    "LLUVIA MÁXIMA 24 H.": "lluvia_max_24h",
+    "TEMP MEDIA": "temp_media",
+    "TEMPERATURA MEDIA MENSUAL": "temp_media",
+    "TEMP MÁX PROM": "temp_max",
+    "TEMPERATURA MÁXIMA PROMEDIO": "temp_max",
+    "TEMP MÁX EXT": "temp_max_ext",
+    "TEMPERATURA MÁXIMA EXTREMA": "temp_max_ext",
+    "TEMP MÍN PROM": "temp_min",
+    "TEMPERATURA MÍNIMA PROMEDIO": "temp_min",
+    "TEMP MÍN EXT": "temp_min_ext",
+    "TEMPERATURA MÍNIMA EXTREMA": "temp_min_ext",
+    "EVAPORACIÓN MENSUAL": "evaporacion",
+}
+
+# Nombres del catálogo que no coinciden con los de Datos/
+ALIAS = {
+    ("Estados", "MEXICO"): "ESTADO DE MEXICO",
+    ("Municipios", "SANTIAGO"): "SANTIAGO TUXTLA",
+    ("Municipios", "TEMAPACHE"): "ALAMO TEMAPACHE",
+}
+
+def normalizar_lugar(nombre: str) -> str:
+    sin_acentos = unicodedata.normalize("NFD", nombre).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_acentos.upper().split())
+
+@lru_cache(maxsize=1)
+def indice_series() -> Dict[Tuple[str, str], Dict[str, str]]:
+    """(ruta, lugar normalizado) -> {variable: ruta relativa del CSV}."""
+    indice: Dict[Tuple[str, str], Dict[str, str]] = {}
+    for ruta, carpeta in (("Estados", "Estados"), ("Municipios", "municipios")):
+        for raiz, _, nombres in os.walk(os.path.join(DIR_DATOS, carpeta)):
+            for nombre in nombres:
+                base, ext = os.path.splitext(nombre)
+                if ext.lower() != ".csv" or "-" not in base:
+                    continue
+                if ruta == "Estados":
+                    lugar, _, sufijo = base.rpartition("-")
+                    variable = VARIABLES_ESTADOS.get(sufijo)
+                else:
+                    prefijo, _, lugar = base.rpartition("-")
+                    variable = VARIABLES_MUNICIPIOS.get(prefijo.strip())
+                if variable:
+                    clave = (ruta, normalizar_lugar(lugar))
+                    indice.setdefault(clave, {})[variable] = _clave(os.path.join(raiz, nombre))
+    return indice
+
+def archivo_serie(ruta: str, lugar: str, variable: str) -> str:
+    """Ruta relativa del CSV de una variable del lugar; FileNotFoundError si Datos/ no la trae."""
+    normalizado = normalizar_lugar(lugar)
+    normalizado = ALIAS.get((ruta, normalizado), normalizado)
+    clave = indice_series().get((ruta, normalizado), {}).get(variable)
+    if clave is None:
+        raise FileNotFoundError(f"Datos/ no trae {variable} para {ruta}/{lugar}")
+    return clave
+
+@lru_cache(maxsize=256)
+def series_lugar(ruta: str, lugar: str) -> Dict[str, pd.DataFrame]:
+    """Series mensuales de un lugar: {variable: DataFrame índice Mes 1..12 × columnas año (int)}.
+
+    Las tablas se comparten entre llamadas: no modificarlas.
+    """
+    series = {}
+    normalizado = normalizar_lugar(lugar)
+    normalizado = ALIAS.get((ruta, normalizado), normalizado)
+    for variable, clave in sorted(indice_series().get((ruta, normalizado), {}).items()):
+        df = leer_csv(clave)
+        df = df.rename(columns=lambda c: "Mes" if str(c).strip().lstrip("\ufeff").upper() == "MES" else c)
+        anios = [c for c in df.columns if str(c).strip().isdigit()]
+        tabla = df.set_index(df["Mes"].astype(int))[anios].apply(pd.to_numeric, errors="coerce")
+        tabla.columns = [int(c) for c in anios]
+        series[variable] = tabla.reindex(range(1, 13)).sort_index(axis=1).astype(float)
+    return series
+
+def lugares_con_series(ruta: str) -> Dict[str, Tuple[str, ...]]:
+    """{lugar normalizado: variables disponibles} para una ruta."""
+    return {lugar: tuple(sorted(v)) for (r, lugar), v in indice_series().items() if r == ruta}
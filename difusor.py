@@ -0,0 +1,99 @@
+# difusor.py — Un cálculo periódico repartido a muchos suscriptores (Server-Sent Events)
+#
+#   difusor = Difusor(lambda: json.dumps(almacen.ventanas()), intervalo_s=2.0)
+#   buzon = difusor.suscribir()
+#   while True:
+#       datos = buzon.tomar(timeout=15)   # None si no hubo nada nuevo
+#
+# El valor se calcula una sola vez por tick, sin importar cuántos clientes haya,
+# y solo mientras haya al menos uno suscrito. Cada suscriptor tiene un buzón de un
+# solo lugar: si el cliente es lento y no alcanzó a leer, la actualización nueva
+# reemplaza a la pendiente (se cuenta como descartada) en vez de acumularse, así
+# un cliente lento nunca hace crecer la memoria ni frena a los demás.
+import threading
+import time
+from typing import Callable, Optional, Set
+
+class Saturado(RuntimeError):
+    pass
+
+class Buzon:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._valor = None
+        self._pendiente = False
+        self.cerrado = False
+        self.descartadas = 0
+
+    def poner(self, valor):
+        with self._cond:
+            if self._pendiente:
+                self.descartadas += 1
+            self._valor, self._pendiente = valor, True
+            self._cond.notify()
+
+    def tomar(self, timeout: float) -> Optional[str]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._pendiente or self.cerrado, timeout)
+            if not self._pendiente:
+                return None
+            self._pendiente = False
+            return self._valor
+
+    def cerrar(self):
+        with self._cond:
+            self.cerrado = True
+            self._cond.notify()
+
+class Difusor:
+    def __init__(self, calcular: Callable[[], str], intervalo_s: float = 2.0, max_suscriptores: int = 16):
+        self.calcular = calcular
+        self.intervalo_s = intervalo_s
+        self.max_suscriptores = max_suscriptores
+        self._suscriptores: Set[Buzon] = set()
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._ultimo: Optional[str] = None
+
+    def suscribir(self) -> Buzon:
+        buzon = Buzon()
+        with self._lock:
+            if len(self._suscriptores) >= self.max_suscriptores:
+                raise Saturado(f"máximo {self.max_suscriptores} suscriptores por proceso")
+            self._suscriptores.add(buzon)
+            if self._ultimo is not None:
+                buzon.poner(self._ultimo)  # el recién llegado no espera al siguiente tick
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="difusor", daemon=True)
+                self._hilo.start()
+        return buzon
+
+    def desuscribir(self, buzon: Buzon):
+        buzon.cerrar()
+        with self._lock:
+            self._suscriptores.discard(buzon)
+
+    def suscriptores(self) -> int:
+        with self._lock:
+            return len(self._suscriptores)
+
+    def _bucle(self):
+        while True:
+            inicio = time.monotonic()
+            with self._lock:
+                if not self._suscriptores:
+                    # Sin clientes no se calcula; el siguiente suscriptor vuelve a arrancar el hilo
+                    self._hilo, self._ultimo = None, None
+                    return
+            try:
+                valor = self.calcular()
+            except Exception as e:
+                print(f"[DIFUSOR] Error al calcular: {e}")
+                valor = None
+            if valor is not None and valor != self._ultimo:
+                with self._lock:
+                    self._ultimo = valor
+                    destinatarios = list(self._suscriptores)
+                for buzon in destinatarios:
+                    buzon.poner(valor)
+            time.sleep(max(0.0, self.intervalo_s - (time.monotonic() - inicio)))
@@ -0,0 +1,126 @@
+# exportacion.py — Exportación masiva de la adecuación cultivo × lugar × mes
+#
+#   python exportacion.py --formato csv --salida adecuacion.csv.gz
+#   curl -H "Accept-Encoding: gzip" "http://127.0.0.1:8000/api/exportacion/adecuacion?formato=ndjson" | gunzip
+#
+# Recorre las listas de cultivos de Ideal/ y puntúa cada cultivo en cada mes con
+# la climatología del lugar (agregados_clima: una consulta de tiempo constante por
+# mes y variable) y calcular_probabilidad_avanzada, igual que los reportes. Las
+# filas salen de un generador y se escriben en bloques conforme se calculan: la
+# memoria no crece con el tamaño de la exportación.
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+
+from agregados_clima import serie_agregable
+from cultivos import obtener_cultivos, optimos_cultivo
+
+RUTAS = ("Estados", "Municipios")
+CSV_CULTIVOS = {"Estados": "./Ideal/CultivoEstado.csv", "Municipios": "./Ideal/CultivoMunicipio.csv"}
+COLUMNAS = ("ruta", "lugar", "cultivo", "mes", "temp_min", "temp_max", "lluvia", "prob", "recomendado")
+FORMATOS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# Filas por bloque escrito: suficiente para no pagar una escritura por fila
+FILAS_POR_BLOQUE = 500
+
+def climatologia(ruta: str, lugar: str, desde: int = 0, hasta: int = 9999) -> Optional[Dict[str, list]]:
+    """{variable: [12 medias mensuales]} para temp_min, temp_max y lluvia; None si falta alguna serie."""
+    resultado = {}
+    for variable in ("temp_min", "temp_max", "lluvia"):
+        serie = serie_agregable(ruta, lugar, variable)
+        if serie is None:
+            return None
+        resultado[variable] = [serie.consultar(desde, hasta, mes, mes)["media"] for mes in range(1, 13)]
+    return resultado
+
+def filas(rutas: Iterable[str] = RUTAS, desde: int = 0, hasta: int = 9999) -> Iterator[tuple]:
+    """Una tupla por (ruta, lugar, cultivo, mes) en el orden de COLUMNAS.
+
+    Los lugares sin series climáticas en Datos/ salen con temperaturas, lluvia y prob vacías.
+    """
+    from reportes import UMBRAL_RECOMENDADO, probabilidades_mensuales
+
+    optimos_por_cultivo = {}
+    for ruta in rutas:
+        for lugar, cultivos in obtener_cultivos(CSV_CULTIVOS[ruta]).items():
+            clima = climatologia(ruta, lugar, desde, hasta)
+            for cultivo in cultivos:
+                if cultivo not in optimos_por_cultivo:
+                    optimos_por_cultivo[cultivo] = optimos_cultivo(cultivo)
+                optimos = optimos_por_cultivo[cultivo]
+                if optimos is None:
+                    continue
+                probs = probabilidades_mensuales(optimos, clima) if clima else [None] * 12
+                for i, prob in enumerate(probs):
+                    valores = (clima["temp_min"][i], clima["temp_max"][i], clima["lluvia"][i]) if clima else (None,) * 3
+                    yield (ruta, lugar, cultivo, i + 1, *valores, prob,
+                           None if prob is None else prob >= UMBRAL_RECOMENDADO)
+
+def codificar(filas_: Iterable[tuple], formato: str = "csv") -> Iterator[str]:
+    """Texto en bloques de FILAS_POR_BLOQUE filas. CSV con encabezado; NDJSON, un objeto por línea."""
+    if formato not in FORMATOS:
+        raise ValueError(f"formato inválido: {formato} (csv o ndjson)")
+    bufer = io.StringIO()
+    escritor = csv.writer(bufer, lineterminator="\n")
+    if formato == "csv":
+        escritor.writerow(COLUMNAS)
+    pendientes = 0
+    for fila in filas_:
+        if formato == "csv":
+            escritor.writerow(["" if v is None else v for v in fila])
+        else:
+            bufer.write(json.dumps(dict(zip(COLUMNAS, fila)), ensure_ascii=False, separators=(",", ":")))
+            bufer.write("\n")
+        pendientes += 1
+        if pendientes >= FILAS_POR_BLOQUE:
+            yield bufer.getvalue()
+            bufer.seek(0)
+            bufer.truncate()
+            pendientes = 0
+    if bufer.tell():
+        yield bufer.getvalue()
+
+def comprimir(trozos: Iterable[str], nivel: int = 6) -> Iterator[bytes]:
+    """gzip incremental: cada bloque se comprime y se entrega sin esperar al final."""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # 31 = contenedor gzip
+    for trozo in trozos:
+        datos = compresor.compress(trozo.encode("utf-8")) + compresor.flush(zlib.Z_SYNC_FLUSH)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+# ==================================== CLI ====================================
+def main():
+    parser = argparse.ArgumentParser(description="Exporta la adecuación de cada cultivo en cada lugar y mes")
+    parser.add_argument("--formato", choices=sorted(FORMATOS), default="csv")
+    parser.add_argument("--ruta", choices=RUTAS + ("todas",), default="todas")
+    parser.add_argument("--desde", type=int, default=0, help="Primer año de la climatología")
+    parser.add_argument("--hasta", type=int, default=9999, help="Último año de la climatología")
+    parser.add_argument("--salida", default="-", help="Archivo de salida ('-' = stdout; '.gz' comprime)")
+    args = parser.parse_args()
+
+    salida = args.salida if args.salida == "-" else os.path.abspath(args.salida)
+    # Las listas de cultivos y condiciones ideales se leen con rutas relativas
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    rutas = RUTAS if args.ruta == "todas" else (args.ruta,)
+    trozos = codificar(filas(rutas, args.desde, args.hasta), args.formato)
+
+    datos = sys.stdout
+    # Los avisos que imprimen los módulos de la app van a stderr, no entre las filas
+    with contextlib.redirect_stdout(sys.stderr):
+        if salida == "-":
+            for trozo in trozos:
+                datos.write(trozo)
+            return
+        with open(salida, "wb") as f:
+            for bloque in (comprimir(trozos) if salida.endswith(".gz") else (t.encode("utf-8") for t in trozos)):
+                f.write(bloque)
+        print(f"[EXPORTACION] {salida} · {os.path.getsize(salida)} bytes")
+
+if __name__ == "__main__":
+    main()
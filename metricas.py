@@ -0,0 +1,221 @@
+# metricas.py — Instrumentación del camino caliente (histogramas, contadores, Server-Timing)
+#
+#   from metricas import etapa
+#   with etapa("entrenamiento"):
+#       modelo.fit(X, y)
+#
+# Cada etapa alimenta el histograma siembra_etapa_segundos{etapa="..."} y, si
+# corre dentro de una petición de Flask, se agrega a la cabecera Server-Timing de
+# la respuesta. Todo se expone en texto Prometheus en /metrics (app_operacion.py).
+#
+# Con varios workers cada proceso lleva sus propias métricas y las vuelca cada
+# pocos segundos a cache/metricas/<pid>.json; /metrics suma las de todos.
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+from flask import g, has_request_context, request
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_VOLCADOS = os.environ.get("SIEMBRA_METRICAS_DIR", os.path.join(APP_DIR, "cache", "metricas"))
+INTERVALO_VOLCADO_S = 5.0
+# Volcados sin actualizar por más de esto son de workers que ya no existen
+VIGENCIA_VOLCADO_S = 300.0
+
+# Cubetas en segundos: de 1 ms (caché caliente) a 2 min (timeout de Ollama)
+CUBETAS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, cubetas: Iterable[float] = CUBETAS):
+        self.nombre, self.ayuda = nombre, ayuda
+        self.cubetas = tuple(cubetas)
+        self._lock = threading.Lock()
+        # etiquetas -> [conteos por cubeta..., +Inf, suma]
+        self._series: Dict[Etiquetas, list] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        i = bisect.bisect_left(self.cubetas, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [0] * (len(self.cubetas) + 1) + [0.0]
+            serie[i] += 1
+            serie[-1] += valor
+
+    def instantanea(self) -> Dict[Etiquetas, list]:
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str):
+        self.nombre, self.ayuda = nombre, ayuda
+        self._lock = threading.Lock()
+        self._series: Dict[Etiquetas, float] = {}
+
+    def incrementar(self, n: float = 1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + n
+
+    def instantanea(self) -> Dict[Etiquetas, float]:
+        with self._lock:
+            return dict(self._series)
+
+ETAPAS = Histograma("siembra_etapa_segundos", "Duración de cada etapa del camino caliente")
+PETICIONES = Histograma("siembra_peticion_segundos", "Duración total de la petición por endpoint")
+RESPUESTAS = Contador("siembra_respuestas_total", "Respuestas por endpoint y código HTTP")
+_REGISTRO = {"histogramas": [ETAPAS, PETICIONES], "contadores": [RESPUESTAS]}
+
+def histograma(nombre: str, ayuda: str, cubetas: Iterable[float] = CUBETAS) -> Histograma:
+    """Registra (o devuelve, si ya existe) un histograma adicional."""
+    for h in _REGISTRO["histogramas"]:
+        if h.nombre == nombre:
+            return h
+    h = Histograma(nombre, ayuda, cubetas)
+    _REGISTRO["histogramas"].append(h)
+    return h
+
+def contador(nombre: str, ayuda: str) -> Contador:
+    for c in _REGISTRO["contadores"]:
+        if c.nombre == nombre:
+            return c
+    c = Contador(nombre, ayuda)
+    _REGISTRO["contadores"].append(c)
+    return c
+
+@contextmanager
+def etapa(nombre: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        ETAPAS.observar(duracion, etapa=nombre)
+        if has_request_context():
+            tiempos = g.setdefault("server_timing", [])
+            tiempos.append((nombre, duracion))
+
+# ============================== Integración Flask ============================
+def _antes():
+    g.inicio_peticion = time.perf_counter()
+
+def _despues(resp):
+    inicio = g.pop("inicio_peticion", None)
+    if inicio is None:
+        return resp
+    total = time.perf_counter() - inicio
+    endpoint = request.endpoint or "desconocido"
+    PETICIONES.observar(total, endpoint=endpoint)
+    RESPUESTAS.incrementar(endpoint=endpoint, codigo=str(resp.status_code))
+
+    # Una etapa puede repetirse (p. ej. varias lecturas de CSV): se suman
+    acumulado: Dict[str, float] = {}
+    for nombre, duracion in g.pop("server_timing", []):
+        acumulado[nombre] = acumulado.get(nombre, 0.0) + duracion
+    partes = [f"{n};dur={d * 1000:.1f}" for n, d in acumulado.items()]
+    partes.append(f"total;dur={total * 1000:.1f}")
+    resp.headers["Server-Timing"] = ", ".join(partes)
+
+    _volcar_si_toca()
+    return resp
+
+def init_app(app):
+    app.before_request(_antes)
+    app.after_request(_despues)
+
+# ======================= Volcado y suma entre procesos =======================
+_ultimo_volcado = [0.0]
+
+def _serializar() -> dict:
+    return {
+        "histogramas": {h.nombre: [[list(map(list, k)), v] for k, v in h.instantanea().items()]
+                        for h in _REGISTRO["histogramas"]},
+        "contadores": {c.nombre: [[list(map(list, k)), v] for k, v in c.instantanea().items()]
+                       for c in _REGISTRO["contadores"]},
+    }
+
+def _volcar_si_toca():
+    ahora = time.monotonic()
+    if ahora - _ultimo_volcado[0] < INTERVALO_VOLCADO_S:
+        return
+    _ultimo_volcado[0] = ahora
+    volcar()
+
+def volcar():
+    try:
+        os.makedirs(DIR_VOLCADOS, exist_ok=True)
+        destino = os.path.join(DIR_VOLCADOS, f"{os.getpid()}.json")
+        temporal = destino + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(_serializar(), f)
+        os.replace(temporal, destino)
+    except OSError as e:
+        print(f"[METRICAS] No se pudo volcar: {e}")
+
+def _instantaneas_de_todos() -> Iterable[dict]:
+    yield _serializar()
+    try:
+        nombres = os.listdir(DIR_VOLCADOS)
+    except OSError:
+        return
+    propio, ahora = f"{os.getpid()}.json", time.time()
+    for nombre in nombres:
+        if not nombre.endswith(".json") or nombre == propio:
+            continue
+        ruta = os.path.join(DIR_VOLCADOS, nombre)
+        try:
+            if ahora - os.path.getmtime(ruta) > VIGENCIA_VOLCADO_S:
+                continue
+            with open(ruta, encoding="utf-8") as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue
+
+def _etiquetas_texto(etiquetas: Etiquetas, extra: str = "") -> str:
+    partes = [f'{k}="{v}"' for k, v in etiquetas]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+def texto_prometheus(extra: Iterable[str] = ()) -> str:
+    """Métricas de todos los workers en formato de texto de Prometheus."""
+    histos: Dict[str, Dict[Etiquetas, list]] = {}
+    conts: Dict[str, Dict[Etiquetas, float]] = {}
+    for inst in _instantaneas_de_todos():
+        for nombre, series in inst["histogramas"].items():
+            destino = histos.setdefault(nombre, {})
+            for etiquetas, valores in series:
+                clave = tuple(map(tuple, etiquetas))
+                previo = destino.get(clave)
+                destino[clave] = valores if previo is None else [a + b for a, b in zip(previo, valores)]
+        for nombre, series in inst["contadores"].items():
+            destino = conts.setdefault(nombre, {})
+            for etiquetas, valor in series:
+                clave = tuple(map(tuple, etiquetas))
+                destino[clave] = destino.get(clave, 0) + valor
+
+    lineas = []
+    for h in _REGISTRO["histogramas"]:
+        lineas += [f"# HELP {h.nombre} {h.ayuda}", f"# TYPE {h.nombre} histogram"]
+        for etiquetas, valores in sorted(histos.get(h.nombre, {}).items()):
+            acumulado = 0
+            for limite, n in zip(h.cubetas + (float("inf"),), valores[:-1]):
+                acumulado += n
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                etiqueta_le = 'le="' + le + '"'
+                lineas.append(f"{h.nombre}_bucket{_etiquetas_texto(etiquetas, etiqueta_le)} {acumulado}")
+            lineas.append(f"{h.nombre}_sum{_etiquetas_texto(etiquetas)} {valores[-1]:.6f}")
+            lineas.append(f"{h.nombre}_count{_etiquetas_texto(etiquetas)} {acumulado}")
+    for c in _REGISTRO["contadores"]:
+        lineas += [f"# HELP {c.nombre} {c.ayuda}", f"# TYPE {c.nombre} counter"]
+        for etiquetas, valor in sorted(conts.get(c.nombre, {}).items()):
+            lineas.append(f"{c.nombre}{_etiquetas_texto(etiquetas)} {valor:g}")
+    lineas.extend(extra)
+    return "\n".join(lineas) + "\n"
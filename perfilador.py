@@ -0,0 +1,190 @@
+# perfilador.py — Perfilado bajo demanda de peticiones en vivo
+#
+#   @bp.route("/generar", methods=["POST"])
+#   @perfilar
+#   def generar(): ...
+#
+# Perfila una fracción muestreada de las peticiones, o las que traen la cabecera
+# X-Perfilar: 1 junto con un X-Operador-Token válido. Por cada petición perfilada
+# deja en DIR_PERFILES:
+#   <base>.folded  pilas colapsadas ("a;b;c 12"), listas para flamegraph.pl o speedscope
+#   <base>.prof    estadísticas de cProfile (python -m pstats / snakeviz)
+#   <base>.json    endpoint, formulario, duración y código de respuesta
+# y conserva solo los últimos MAX_PERFILES.
+#
+# La tasa y el formato se cambian en caliente con POST /operacion/perfilador, que
+# escribe DIR_PERFILES/config.json; cada worker lo relee cada pocos segundos.
+# Apagado (tasa 0 y sin cabecera) cuesta una comparación por petición; con
+# SIEMBRA_PERFILADOR=0 el decorador devuelve la vista sin envolver.
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import request
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HABILITADO = os.environ.get("SIEMBRA_PERFILADOR", "1") != "0"
+DIR_PERFILES = os.environ.get("SIEMBRA_PERFILADOR_DIR", os.path.join(APP_DIR, "cache", "perfiles"))
+MAX_PERFILES = int(os.environ.get("SIEMBRA_PERFILADOR_MAX", "50"))
+INTERVALO_MUESTREO_S = float(os.environ.get("SIEMBRA_PERFILADOR_INTERVALO_MS", "5")) / 1000
+TOKEN_OPERADOR = os.environ.get("SIEMBRA_TOKEN_OPERADOR")
+RUTA_CONFIG = os.path.join(DIR_PERFILES, "config.json")
+RELECTURA_CONFIG_S = 2.0
+FORMATOS = ("colapsado", "pstats", "ambos")
+
+_config = {"tasa": float(os.environ.get("SIEMBRA_PERFILADOR_TASA", "0")), "formato": "ambos", "hasta": None}
+_estado = {"revisado": 0.0, "mtime": None}
+# cProfile no admite dos perfiles activos a la vez en el mismo proceso (3.12+)
+_ocupado = threading.Lock()
+
+# ================================ Configuración ==============================
+def configuracion() -> dict:
+    _releer_config()
+    return dict(_config)
+
+def configurar(tasa: float, formato: str = "ambos", minutos: float = None) -> dict:
+    """Guarda la configuración para todos los workers. minutos limita cuánto dura encendido."""
+    if not 0 <= tasa <= 1:
+        raise ValueError("tasa debe estar entre 0 y 1")
+    if formato not in FORMATOS:
+        raise ValueError(f"formato debe ser uno de {FORMATOS}")
+    nueva = {"tasa": tasa, "formato": formato, "hasta": time.time() + minutos * 60 if minutos else None}
+    os.makedirs(DIR_PERFILES, exist_ok=True)
+    temporal = RUTA_CONFIG + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(nueva, f)
+    os.replace(temporal, RUTA_CONFIG)
+    _estado["revisado"] = 0.0
+    return configuracion()
+
+def _releer_config():
+    ahora = time.monotonic()
+    if ahora - _estado["revisado"] < RELECTURA_CONFIG_S:
+        return
+    _estado["revisado"] = ahora
+    try:
+        mtime = os.path.getmtime(RUTA_CONFIG)
+    except OSError:
+        return
+    if mtime == _estado["mtime"]:
+        return
+    try:
+        with open(RUTA_CONFIG, encoding="utf-8") as f:
+            _config.update(json.load(f))
+        _estado["mtime"] = mtime
+    except (OSError, ValueError) as e:
+        print(f"[PERFILADOR] Configuración ilegible: {e}")
+
+def _toca_perfilar() -> bool:
+    _releer_config()
+    if request.headers.get("X-Perfilar") == "1":
+        return bool(TOKEN_OPERADOR) and request.headers.get("X-Operador-Token") == TOKEN_OPERADOR
+    tasa = _config["tasa"]
+    if not tasa:
+        return False
+    if _config.get("hasta") and time.time() > _config["hasta"]:
+        return False
+    return random.random() < tasa
+
+# ================================= Muestreo ==================================
+class _Muestreador(threading.Thread):
+    """Toma la pila del hilo de la petición cada INTERVALO_MUESTREO_S."""
+
+    def __init__(self, id_hilo: int):
+        super().__init__(daemon=True)
+        self.id_hilo = id_hilo
+        self.pilas = Counter()
+        self._alto = threading.Event()
+
+    def run(self):
+        while not self._alto.wait(INTERVALO_MUESTREO_S):
+            marco = sys._current_frames().get(self.id_hilo)
+            partes = []
+            while marco is not None:
+                codigo = marco.f_code
+                partes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                marco = marco.f_back
+            if partes:
+                self.pilas[";".join(reversed(partes))] += 1
+
+    def detener(self):
+        self._alto.set()
+        self.join()
+
+# ================================= Decorador =================================
+def perfilar(vista):
+    if not HABILITADO:
+        return vista
+
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not _toca_perfilar() or not _ocupado.acquire(blocking=False):
+            return vista(*args, **kwargs)
+        formato = _config.get("formato", "ambos")
+        perfil = cProfile.Profile() if formato in ("pstats", "ambos") else None
+        muestreador = _Muestreador(threading.get_ident()) if formato in ("colapsado", "ambos") else None
+        respuesta, inicio = None, time.perf_counter()
+        try:
+            if muestreador:
+                muestreador.start()
+            if perfil:
+                perfil.enable()
+            respuesta = vista(*args, **kwargs)
+            return respuesta
+        finally:
+            if perfil:
+                perfil.disable()
+            if muestreador:
+                muestreador.detener()
+            _ocupado.release()
+            _guardar(vista.__name__, time.perf_counter() - inicio, respuesta, perfil, muestreador)
+    return envoltura
+
+def _codigo(respuesta):
+    if isinstance(respuesta, tuple):
+        return respuesta[1] if len(respuesta) > 1 and isinstance(respuesta[1], int) else 200
+    return getattr(respuesta, "status_code", None if respuesta is None else 200)
+
+def _guardar(endpoint, duracion, respuesta, perfil, muestreador):
+    try:
+        os.makedirs(DIR_PERFILES, exist_ok=True)
+        base = os.path.join(DIR_PERFILES, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}"
+                                          f"-{threading.get_ident() % 10000:04d}-{duracion * 1000:.0f}ms")
+        if perfil:
+            perfil.dump_stats(base + ".prof")
+        if muestreador:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for pila, n in muestreador.pilas.most_common():
+                    f.write(f"{pila} {n}\n")
+        meta = {"endpoint": endpoint, "ruta": request.path, "duracion_ms": round(duracion * 1000, 1),
+                "codigo": _codigo(respuesta), "formulario": request.form.to_dict(),
+                "archivos": {k: v.filename for k, v in request.files.items()}}
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        _podar()
+    except OSError as e:
+        print(f"[PERFILADOR] No se pudo guardar el perfil: {e}")
+
+def perfiles() -> list:
+    """Bases de los perfiles guardados, del más reciente al más antiguo."""
+    try:
+        nombres = os.listdir(DIR_PERFILES)
+    except OSError:
+        return []
+    bases = {n.rsplit(".", 1)[0] for n in nombres
+             if n.endswith((".prof", ".folded", ".json")) and n != "config.json"}
+    return sorted(bases, reverse=True)
+
+def _podar():
+    for base in perfiles()[MAX_PERFILES:]:
+        for ext in (".prof", ".folded", ".json"):
+            try:
+                os.remove(os.path.join(DIR_PERFILES, base + ext))
+            except FileNotFoundError:
+                pass
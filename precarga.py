@@ -0,0 +1,67 @@
+# precarga.py — Trabajo especulativo en segundo plano, deduplicado y de baja prioridad
+#
+#   precargador = Precargador(hilos=1, max_pendientes=32)
+#   precargador.encolar(("Estados", "Jalisco", 6, 2025), calentar, "Estados", "Jalisco", 6, 2025)
+#
+# Pensado para adelantar cálculos que probablemente se pidan enseguida (p. ej. el
+# pronóstico de un lugar recién elegido en la portada). Nada de esto debe competir
+# con peticiones reales:
+#   - una clave que ya está en cola o en curso no se vuelve a encolar;
+#   - la cola es corta: si está llena, la precarga se descarta (es solo una apuesta);
+#   - los hilos bajan su prioridad en el sistema operativo (nice) donde se puede.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Set
+
+from admision import marcar_hilo_de_fondo
+from metricas import contador
+
+# Cuánto se baja la prioridad de los hilos de precarga (0 = igual que las peticiones)
+NICE_PRECARGA = int(os.environ.get("SIEMBRA_PRECARGA_NICE", "10"))
+
+PRECARGAS = contador("siembra_precargas_total", "Precargas por resultado (encolada, repetida, descartada, error)")
+
+def _bajar_prioridad():
+    # También para admision: sus cupos van detrás de las peticiones reales
+    marcar_hilo_de_fondo()
+    # En Linux, PRIO_PROCESS con el id nativo del hilo afecta solo a ese hilo
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), NICE_PRECARGA)
+    except (AttributeError, OSError):
+        pass
+
+class Precargador:
+    def __init__(self, hilos: int = 1, max_pendientes: int = 32):
+        self.max_pendientes = max_pendientes
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="precarga",
+                                            initializer=_bajar_prioridad)
+        self._lock = threading.Lock()
+        self._pendientes: Set[Hashable] = set()
+
+    def encolar(self, clave: Hashable, funcion: Callable, *args) -> bool:
+        """True si se encoló; False si ya estaba pendiente o la cola está llena."""
+        with self._lock:
+            if clave in self._pendientes:
+                PRECARGAS.incrementar(resultado="repetida")
+                return False
+            if len(self._pendientes) >= self.max_pendientes:
+                PRECARGAS.incrementar(resultado="descartada")
+                return False
+            self._pendientes.add(clave)
+        PRECARGAS.incrementar(resultado="encolada")
+        self._ejecutor.submit(self._correr, clave, funcion, args)
+        return True
+
+    def _correr(self, clave: Hashable, funcion: Callable, args: tuple):
+        try:
+            funcion(*args)
+        except Exception as e:
+            PRECARGAS.incrementar(resultado="error")
+            print(f"[PRECARGA] {clave} falló: {e}")
+        finally:
+            with self._lock:
+                self._pendientes.discard(clave)
+
+    def pendientes(self) -> int:
+        return len(self._pendientes)
@@ -1,6 +1,14 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
+from datos_clima import archivo_serie, leer_csv
+from metricas import etapa
+
+# Serie de datos_clima que entrena cada pronóstico: los municipios usan las extremas
+VARIABLES = {
+    "Estados": {"TempMin": "temp_min", "tempMax": "temp_max"},
+    "Municipios": {"TempMin": "temp_min_ext", "tempMax": "temp_max_ext"},
+}
 
 def Prediccion(ruta, lugar, mes_solicitado=None, Cultivo=None):
     """
@@ -8,24 +16,17 @@ def Prediccion(ruta, lugar, mes_solicitado=None, Cultivo=None):
     Compatible con Estados y Municipios.
     """
     
-    # Definir archivos según ruta
-    if ruta == "Estados":
-        archivos = {
-            "TempMin": f"./Datos/Estados/{lugar}/{lugar}-TempMin.csv",
-            "tempMax": f"./Datos/Estados/{lugar}/{lugar}-tempMax.csv"
-        }
-    elif ruta == "Municipios":
-        archivos = {
-            "TempMin": f"./Datos/Municipios/{lugar}/TEMP MÍN EXT-{lugar}.csv",
-            "tempMax": f"./Datos/Municipios/{lugar}/TEMP MÁX EXT-{lugar}.csv"
-        }
-    else:
+    # Definir archivos según ruta (los nombres de carpeta en Datos/ no siempre
+    # coinciden con el catálogo: se buscan en el índice de datos_clima)
+    if ruta not in VARIABLES:
         raise ValueError("Ruta desconocida")
+    archivos = {tipo: archivo_serie(ruta, lugar, variable) for tipo, variable in VARIABLES[ruta].items()}
     
     predicciones = {}
     
     for tipo, archivo in archivos.items():
-        df = pd.read_csv(archivo)
+        with etapa("csv"):
+            df = leer_csv(archivo)
         
         # Normalizar columnas
         df.rename(columns=lambda x: "Mes" if x.upper() == "MES" else x, inplace=True)
@@ -49,12 +50,14 @@ def Prediccion(ruta, lugar, mes_solicitado=None, Cultivo=None):
         X = df_largo[["Mes", "Año"]]
         y = df_largo["Valor"]
         modelo = RandomForestRegressor(n_estimators=100, random_state=42)
-        modelo.fit(X, y)
+        with etapa("entrenamiento"):
+            modelo.fit(X, y)
         
         # Predecir para 2025
         meses = list(range(1, 13))
         futuros = pd.DataFrame({"Mes": meses, "Año": [2025]*12})
-        futuros[f"Pred_{tipo}"] = modelo.predict(futuros)
+        with etapa("prediccion_rf"):
+            futuros[f"Pred_{tipo}"] = modelo.predict(futuros)
         predicciones[tipo] = futuros[f"Pred_{tipo}"]
 
     # Combinar predicciones
@@ -0,0 +1,223 @@
+# reportes.py — Reportes climáticos generados bajo demanda con caché direccionada por contenido
+#
+#   clave, archivo = obtener_reporte("Estados", "Jalisco", 2015, 2024)
+#
+# El reporte (HTML autocontenido, listo para imprimir a PDF) se arma con las
+# series de Datos/ y la adecuación de cultivos de cultivos.py. Se guarda en
+# DIR_REPORTES/<clave>.html, donde la clave es el sha256 de los parámetros, de la
+# versión de la plantilla y de la versión de los datos (hash del contenido de
+# Datos/, Ideal/ y condiciones_ideales/). Mientras nada de eso cambie, pedir el
+# mismo reporte devuelve los mismos bytes del disco; si cambia un CSV, cambia la
+# clave y se regenera.
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import render_template
+
+from coalescencia import UnaSolaVez
+from cultivos import calcular_probabilidad_avanzada, cultivos_del_lugar, optimos_cultivo
+from datos_clima import series_lugar
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_REPORTES = os.environ.get("SIEMBRA_REPORTES_DIR", os.path.join(APP_DIR, "cache", "reportes"))
+MAX_REPORTES = int(os.environ.get("SIEMBRA_REPORTES_MAX", "200"))
+# Subir cuando cambie la plantilla o el cálculo: invalida todos los reportes guardados
+VERSION_PLANTILLA = "1"
+FUENTES = ("Datos", "Ideal", "condiciones_ideales")
+# Cada cuánto se revisan los mtime de las fuentes para detectar cambios
+REVISION_FUENTES_S = 5.0
+UMBRAL_RECOMENDADO = 70
+PESOS_CLIMATOLOGIA = {"tmin": 0.18, "tmax": 0.18, "tmed": 0.24, "precip": 0.24, "hum": 0.0}
+
+MESES = ("Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto",
+         "Septiembre", "Octubre", "Noviembre", "Diciembre")
+NOMBRES_VARIABLES = {
+    "temp_min": "Temperatura mínima (°C)", "temp_max": "Temperatura máxima (°C)",
+    "temp_media": "Temperatura media (°C)", "lluvia": "Lluvia mensual (mm)",
+    "lluvia_max_24h": "Lluvia máxima en 24 h (mm)", "temp_min_ext": "Temperatura mínima extrema (°C)",
+    "temp_max_ext": "Temperatura máxima extrema (°C)", "evaporacion": "Evaporación mensual (mm)",
+}
+# En la lluvia y la evaporación el total anual es la suma; en lo demás, el promedio
+ACUMULABLES = ("lluvia", "evaporacion")
+
+class ReporteInvalido(ValueError):
+    pass
+
+# ============================= Versión de los datos ==========================
+_version = {"firma": None, "hash": None, "revisado": 0.0}
+_lock_version = threading.Lock()
+
+def _archivos_fuente() -> List[str]:
+    archivos = []
+    for fuente in FUENTES:
+        for raiz, _, nombres in os.walk(os.path.join(APP_DIR, fuente)):
+            archivos += [os.path.join(raiz, n) for n in nombres if n.lower().endswith(".csv")]
+    return sorted(archivos)
+
+def version_datos() -> str:
+    """Hash del contenido de las fuentes. Solo se recalcula si cambió algún tamaño o mtime."""
+    with _lock_version:
+        if _version["hash"] and time.monotonic() - _version["revisado"] < REVISION_FUENTES_S:
+            return _version["hash"]
+        archivos = _archivos_fuente()
+        firma = tuple((a, os.stat(a).st_size, os.stat(a).st_mtime_ns) for a in archivos)
+        if firma != _version["firma"]:
+            h = hashlib.sha256()
+            for ruta in archivos:
+                h.update(os.path.relpath(ruta, APP_DIR).replace(os.sep, "/").encode("utf-8") + b"\0")
+                with open(ruta, "rb") as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+            _version.update(firma=firma, hash=h.hexdigest()[:16])
+        _version["revisado"] = time.monotonic()
+        return _version["hash"]
+
+def clave_reporte(ruta: str, lugar: str, desde: int, hasta: int) -> str:
+    entradas = {"ruta": ruta, "lugar": lugar, "desde": desde, "hasta": hasta,
+                "plantilla": VERSION_PLANTILLA, "datos": version_datos()}
+    return hashlib.sha256(json.dumps(entradas, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+
+# =============================== Contenido ===================================
+def _redondear(x) -> Optional[float]:
+    return None if x is None or not math.isfinite(x) else round(float(x), 1)
+
+def _grafica(lineas: Dict[str, List[Optional[float]]], ancho: int = 640, alto: int = 220, margen: int = 36) -> dict:
+    """Coordenadas SVG de varias series de 12 meses sobre un mismo eje."""
+    valores = [v for serie in lineas.values() for v in serie if v is not None]
+    if not valores:
+        return {}
+    vmin, vmax = min(valores), max(valores)
+    if vmax - vmin < 1e-9:
+        vmin, vmax = vmin - 1, vmax + 1
+    x = lambda i: margen + i * (ancho - 2 * margen) / 11
+    y = lambda v: alto - margen - (v - vmin) * (alto - 2 * margen) / (vmax - vmin)
+    series = {nombre: " ".join(f"{x(i):.1f},{y(v):.1f}" for i, v in enumerate(serie) if v is not None)
+              for nombre, serie in lineas.items()}
+    marcas = [{"y": round(y(vmin + k * (vmax - vmin) / 4), 1), "valor": round(vmin + k * (vmax - vmin) / 4, 1)}
+              for k in range(5)]
+    return {"ancho": ancho, "alto": alto, "margen": margen, "series": series, "marcas": marcas,
+            "meses": [{"x": round(x(i), 1), "nombre": MESES[i][:3]} for i in range(12)]}
+
+def _barras(serie: List[Optional[float]], ancho: int = 640, alto: int = 200, margen: int = 36) -> dict:
+    tope = max([v for v in serie if v is not None] or [0]) or 1.0
+    paso = (ancho - 2 * margen) / 12
+    barras = [{"x": round(margen + i * paso + paso * 0.15, 1), "ancho": round(paso * 0.7, 1),
+               "y": round(alto - margen - (v or 0) * (alto - 2 * margen) / tope, 1),
+               "alto": round((v or 0) * (alto - 2 * margen) / tope, 1), "valor": v, "mes": MESES[i][:3]}
+              for i, v in enumerate(serie)]
+    return {"ancho": ancho, "alto": alto, "margen": margen, "tope": round(tope, 1), "barras": barras}
+
+def probabilidades_mensuales(optimos: dict, climatologia: Dict[str, list]) -> List[Optional[int]]:
+    """Probabilidad de éxito de cada mes (None si falta algún dato) con la climatología dada.
+
+    Datos/ no trae humedad: se puntúa solo con temperatura y lluvia (peso de humedad en cero).
+    """
+    probs = []
+    for i in range(12):
+        tmin, tmax, lluvia = (climatologia[v][i] for v in ("temp_min", "temp_max", "lluvia"))
+        if None in (tmin, tmax, lluvia):
+            probs.append(None)
+            continue
+        preds = {"tmin": tmin, "tmax": tmax, "precip": lluvia, "hum": optimos["h_opt"]}
+        probs.append(calcular_probabilidad_avanzada(preds, optimos, pesos=PESOS_CLIMATOLOGIA))
+    return probs
+
+def contexto_reporte(ruta: str, lugar: str, desde: int, hasta: int) -> dict:
+    series = series_lugar(ruta, lugar)
+    if not series:
+        raise ReporteInvalido(f"No hay series climáticas para {lugar}")
+    anios_disponibles = sorted({a for tabla in series.values() for a in tabla.columns})
+    anios = [a for a in anios_disponibles if desde <= a <= hasta]
+    if not anios:
+        raise ReporteInvalido(f"Sin datos entre {desde} y {hasta}; hay {anios_disponibles[0]}–{anios_disponibles[-1]}")
+
+    variables, climatologia = [], {}
+    for variable, tabla in series.items():
+        datos = tabla.reindex(columns=anios).to_numpy()
+        # Un mes sin ningún año con dato da NaN (y un RuntimeWarning que aquí se espera)
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            media, minimo, maximo = np.nanmean(datos, axis=1), np.nanmin(datos, axis=1), np.nanmax(datos, axis=1)
+            anual = np.nansum(datos, axis=0) if variable in ACUMULABLES else np.nanmean(datos, axis=0)
+        meses_con_dato = (~np.isnan(datos)).sum(axis=0)
+        climatologia[variable] = [_redondear(v) for v in media]
+        variables.append({
+            "clave": variable, "nombre": NOMBRES_VARIABLES.get(variable, variable),
+            "meses": [{"mes": MESES[i], "media": _redondear(media[i]), "min": _redondear(minimo[i]),
+                       "max": _redondear(maximo[i])} for i in range(12)],
+            # Un año sin los 12 meses no es comparable en la suma anual
+            "anual": [{"anio": a, "valor": _redondear(anual[j]) if meses_con_dato[j] else None,
+                       "completo": bool(meses_con_dato[j] == 12)} for j, a in enumerate(anios)],
+        })
+
+    graficas = {}
+    temperaturas = {v: climatologia[v] for v in ("temp_min", "temp_media", "temp_max") if v in climatologia}
+    if temperaturas:
+        graficas["temperatura"] = _grafica(temperaturas)
+    if "lluvia" in climatologia:
+        graficas["lluvia"] = _barras(climatologia["lluvia"])
+
+    cultivos = []
+    if all(v in climatologia for v in ("temp_min", "temp_max", "lluvia")):
+        for cultivo in cultivos_del_lugar(ruta, lugar):
+            optimos = optimos_cultivo(cultivo)
+            if optimos is None:
+                continue
+            probs = probabilidades_mensuales(optimos, climatologia)
+            validos = [p for p in probs if p is not None]
+            cultivos.append({"cultivo": cultivo, "probs": probs, "mejor": max(validos) if validos else None,
+                             "meses_recomendados": [MESES[i] for i, p in enumerate(probs)
+                                                    if p is not None and p >= UMBRAL_RECOMENDADO]})
+        cultivos.sort(key=lambda c: -1 if c["mejor"] is None else c["mejor"], reverse=True)
+
+    return {"ruta": ruta, "lugar": lugar, "desde": anios[0], "hasta": anios[-1], "anios": anios,
+            "meses": MESES, "variables": variables, "graficas": graficas, "cultivos": cultivos,
+            "umbral": UMBRAL_RECOMENDADO, "version_datos": version_datos(),
+            "generado": time.strftime("%Y-%m-%d %H:%M")}
+
+# ============================ Artefactos en disco ============================
+_una_vez = UnaSolaVez()
+
+def ruta_artefacto(clave: str, comprimido: bool = False) -> str:
+    return os.path.join(DIR_REPORTES, f"{clave}.html" + (".gz" if comprimido else ""))
+
+def obtener_reporte(ruta: str, lugar: str, desde: int, hasta: int) -> Tuple[str, str]:
+    """Devuelve (clave, archivo). Genera el reporte solo si no está ya en disco."""
+    clave = clave_reporte(ruta, lugar, desde, hasta)
+    archivo = ruta_artefacto(clave)
+    if os.path.exists(archivo):
+        return clave, archivo
+    # Peticiones simultáneas del mismo reporte lo generan una sola vez
+    _una_vez.hacer(clave, _generar, clave, ruta, lugar, desde, hasta)
+    return clave, archivo
+
+def _generar(clave: str, ruta: str, lugar: str, desde: int, hasta: int):
+    if os.path.exists(ruta_artefacto(clave)):
+        return
+    html = render_template("reporte_generado.html", **contexto_reporte(ruta, lugar, desde, hasta)).encode("utf-8")
+    os.makedirs(DIR_REPORTES, exist_ok=True)
+    for destino, datos in ((ruta_artefacto(clave, True), gzip.compress(html, compresslevel=9, mtime=0)),
+                           (ruta_artefacto(clave), html)):
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(datos)
+        os.replace(temporal, destino)  # el .html va al final: su existencia marca el reporte completo
+    _podar()
+
+def _podar():
+    try:
+        archivos = [os.path.join(DIR_REPORTES, n) for n in os.listdir(DIR_REPORTES) if n.endswith(".html")]
+        archivos.sort(key=os.path.getmtime, reverse=True)
+        for archivo in archivos[MAX_REPORTES:]:
+            for ruta in (archivo, archivo + ".gz"):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+    except OSError as e:
+        print(f"[REPORTES] Error al podar: {e}")
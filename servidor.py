@@ -0,0 +1,122 @@
+# servidor.py — Punto de entrada de producción (gunicorn, precarga y fork)
+#
+#   python servidor.py --workers 4 --bind 0.0.0.0:8000
+#
+# El proceso padre carga una sola vez todo lo pesado y de solo lectura (modelo
+# Vosk, series de Datos/, condiciones ideales, listas de cultivos y, si se pide,
+# los pronósticos) y después hace fork de los workers. Los workers comparten esas
+# páginas copy-on-write en lugar de tener cada uno su propia copia.
+# Solo funciona en Linux/macOS (fork). En Windows siga usando `python app.py`.
+import argparse
+import gc
+import multiprocessing
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+
+def _memoria_proceso(pid="self") -> dict:
+    """RSS / PSS / USS en MB leídos de /proc/<pid>/smaps_rollup (Linux)."""
+    campos = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for linea in f:
+                nombre, _, resto = linea.partition(":")
+                if nombre in campos:
+                    campos[nombre] = int(resto.split()[0])
+    except OSError:
+        return {}
+    return {
+        "rss": campos["Rss"] / 1024,
+        "pss": campos["Pss"] / 1024,
+        "uss": (campos["Private_Clean"] + campos["Private_Dirty"]) / 1024,
+    }
+
+def _formato_memoria(mem: dict) -> str:
+    if not mem:
+        return "memoria no disponible"
+    return f"RSS {mem['rss']:.0f} MB · PSS {mem['pss']:.0f} MB · USS {mem['uss']:.0f} MB"
+
+def precargar(pronosticos: bool = False):
+    """Carga en el proceso actual los activos de solo lectura. Devuelve la app Flask."""
+    inicio = time.perf_counter()
+
+    import datos_clima
+    n_tablas = datos_clima.cargar_todo()
+
+    # Importar la app trae consigo Agente.py (modelo Vosk) y CondicionesIdeales.csv
+    from app import create_app
+    import app_inicio
+    from cultivos import obtener_cultivos
+    obtener_cultivos("./Ideal/CultivoEstado.csv")
+    obtener_cultivos("./Ideal/CultivoMunicipio.csv")
+
+    if pronosticos:
+        from catalogos import estados, municipios
+        for ruta, lugares in (("Estados", estados), ("Municipios", municipios)):
+            for lugar in lugares:
+                try:
+                    app_inicio._pronostico_lugar(ruta, lugar)
+                except Exception:
+                    pass  # lugar sin datos en Datos/
+
+    app = create_app()
+    print(f"[SERVIDOR] Precarga lista en {time.perf_counter() - inicio:.1f}s "
+          f"({n_tablas} tablas de Datos/) · {_formato_memoria(_memoria_proceso())}")
+    return app
+
+class ServidorSiembra(BaseApplication):
+    def __init__(self, opciones: dict, pronosticos: bool = False):
+        self.opciones = opciones
+        self.pronosticos = pronosticos
+        super().__init__()
+
+    def load_config(self):
+        for clave, valor in self.opciones.items():
+            self.cfg.set(clave, valor)
+
+    def load(self):
+        # Con preload_app=True esto corre una sola vez, en el proceso padre
+        gc.disable()
+        app = precargar(self.pronosticos)
+        # La capacidad de admisión sigue a los hilos reales de cada worker (--threads)
+        import admision
+        admision.ajustar_a_hilos(self.opciones["threads"])
+        gc.enable()
+        # Mueve lo cargado a la generación permanente: el recolector ya no escribe
+        # en esos objetos y las páginas siguen compartidas tras el fork.
+        gc.freeze()
+        return app
+
+def _post_worker_init(worker):
+    print(f"[SERVIDOR] Worker {worker.pid} listo · {_formato_memoria(_memoria_proceso())}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de producción de Siembra+")
+    parser.add_argument("--bind", default=os.environ.get("SIEMBRA_BIND", "0.0.0.0:8000"))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("SIEMBRA_WORKERS", multiprocessing.cpu_count())))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SIEMBRA_THREADS", 4)))
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("SIEMBRA_TIMEOUT", 180)))
+    parser.add_argument("--pronosticos", action="store_true",
+                        help="Entrena los pronósticos de todos los lugares antes del fork")
+    args = parser.parse_args()
+
+    # La app usa rutas relativas (./Datos, ./Ideal, ...): se arranca desde su carpeta
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    opciones = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        # Mayor que el timeout de Ollama (120 s) para no matar workers con voz en curso
+        "timeout": args.timeout,
+        "preload_app": True,
+        "post_worker_init": _post_worker_init,
+        "accesslog": "-",
+    }
+    ServidorSiembra(opciones, pronosticos=args.pronosticos).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+// static/js/disp-monit.js
+
+// ========= MONITOREO EN TIEMPO REAL (Server-Sent Events) =========
+// El servidor calcula las ventanas deslizantes una vez por tick y las empuja a
+// todas las pestañas abiertas; aquí solo se pintan. EventSource se reconecta solo.
+// Dispositivo mostrado: ?dispositivo=7 en la URL, o el primero que reporte.
+(function () {
+  const panel = document.getElementById('monitoreo');
+  if (!panel || !window.EventSource) return;
+
+  const hora = document.getElementById('hora-monitoreo');
+  const valores = panel.querySelectorAll('[data-variable]');
+  const elegido = new URLSearchParams(location.search).get('dispositivo');
+  // Posiciones en [n, media, min, max]
+  const POS = { media: 1, min: 2, max: 3 };
+
+  function pintar(dispositivos) {
+    const id = elegido && dispositivos[elegido] ? elegido : Object.keys(dispositivos)[0];
+    if (!id) return;
+    const disp = dispositivos[id];
+    valores.forEach(el => {
+      // Humedad y temperatura al momento: ventana corta; si no hay, la de una hora
+      const serie = (disp['5m'] || {})[el.dataset.variable] || (disp['1h'] || {})[el.dataset.variable];
+      if (!serie) return;
+      el.textContent = `${Math.round(serie[POS[el.dataset.agregado]])}${el.dataset.unidad}`;
+    });
+    if (hora && disp.ultima_ts) {
+      const t = new Date(disp.ultima_ts * 1000);
+      hora.textContent = t.toLocaleTimeString('es-MX', { hour12: false });
+      hora.setAttribute('datetime', t.toISOString());
+    }
+  }
+
+  const fuente = new EventSource(panel.dataset.stream);
+  fuente.addEventListener('ventanas', e => {
+    try {
+      pintar(JSON.parse(e.data));
+    } catch (err) {
+      console.error('Evento de monitoreo inválido:', err);
+    }
+  });
+  fuente.onerror = () => console.warn('Monitoreo: conexión perdida, reintentando…');
+})();
@@ -1,5 +1,36 @@
 // static/js/inicio.js
 
+// ========= CATÁLOGOS (estados, municipios y coordenadas) =========
+// El servidor ya no pinta las <option>: se llenan desde un JSON versionado que el
+// navegador guarda en caché. Al terminar se emite 'catalogos:listos'.
+(function () {
+  const form = document.querySelector('form[data-catalogos]');
+  if (!form) return;
+
+  function llenar(selectEl, filas) {
+    if (!selectEl) return;
+    const seleccionado = selectEl.value;
+    const frag = document.createDocumentFragment();
+    frag.appendChild(selectEl.options[0].cloneNode(true)); // placeholder
+    for (const [nombre, lat, lng] of filas) {
+      const opt = new Option(nombre, nombre, false, nombre === seleccionado);
+      opt.dataset.lat = lat ?? '';
+      opt.dataset.lng = lng ?? '';
+      frag.appendChild(opt);
+    }
+    selectEl.replaceChildren(frag);
+  }
+
+  fetch(form.dataset.catalogos)
+    .then(r => r.json())
+    .then(cat => {
+      llenar(document.getElementById('estado'), cat.estados);
+      llenar(document.getElementById('municipio'), cat.municipios);
+      document.dispatchEvent(new Event('catalogos:listos'));
+    })
+    .catch(err => console.error('No se pudo cargar el catálogo:', err));
+})();
+
 // ========= TU CÓDIGO EXISTENTE (MAPA, UBICARME, RUTA) =========
 (function () {
   const rutaRadios = document.querySelectorAll('input[name="ruta"]');
@@ -50,13 +81,38 @@
     // (Tu lógica de ubicarme original)
   });
 
-  window.addEventListener('load', () => {
+  document.addEventListener('catalogos:listos', () => {
     if (centerFromSelect(selMunicipio, 12)) return;
     if (centerFromSelect(selEstado, 7)) return;
     setMap(19.5333, -96.9167, 12); // Xalapa por defecto
   });
 })();
 
+// ========= PRECARGA =========
+// Al elegir lugar (o mes) se avisa al servidor para que adelante en segundo plano
+// el pronóstico, el clima y los puntajes: el "Generar" que sigue sale de la caché.
+(function () {
+  const form = document.querySelector('form[data-precarga]');
+  if (!form) return;
+  let ultima = '';
+
+  function precargar() {
+    const datos = new FormData(form);
+    const ruta = datos.get('ruta') || 'Estados';
+    const lugar = ruta === 'Municipios' ? datos.get('municipio') : datos.get('estado');
+    if (!lugar) return;
+    const clave = [ruta, lugar, datos.get('mes'), datos.get('anio')].join('|');
+    if (clave === ultima) return;
+    ultima = clave;
+    // Es solo una optimización: si falla, /generar lo calcula como siempre
+    fetch(form.dataset.precarga, { method: 'POST', body: datos, keepalive: true }).catch(() => {});
+  }
+
+  ['estado', 'municipio', 'mes', 'anio'].forEach(id =>
+    document.getElementById(id)?.addEventListener('change', precargar));
+  form.querySelectorAll('input[name="ruta"]').forEach(r => r.addEventListener('change', precargar));
+})();
+
 // ========= TU CÓDIGO EXISTENTE (CARRUSEL) =========
 document.addEventListener('DOMContentLoaded', () => {
     const sliderContainer = document.querySelector('.recom-container');
@@ -186,28 +242,97 @@ const siembraBotButton = document.querySelector('.ICON-SIEMBRABOT');
   });
 
   // --- 5. Función para enviar el audio a Flask ---
+  // El servidor encola la grabación y responde de inmediato con un id de trabajo;
+  // aquí se consulta su estado hasta que termina (Vosk + Gemma puede tardar).
+  const espera = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+  // plazoS viene del servidor (en cola + inferencia): pasado eso el trabajo ya no corre
+  async function esperarTrabajo(url, plazoS) {
+    let intervalo = 500;
+    const limite = Date.now() + ((plazoS || 180) + 5) * 1000;
+    while (Date.now() < limite) {
+      await espera(intervalo);
+      const resp = await fetch(url, { cache: 'no-store' });
+      if (resp.status === 503) {
+        // El servidor no pudo leer el estado por ahora: el trabajo sigue, se vuelve a preguntar
+        intervalo = Math.max(intervalo, 1000 * (Number(resp.headers.get('Retry-After')) || 2));
+        continue;
+      }
+      if (!resp.ok) throw new Error(`Error ${resp.status} al consultar el trabajo`);
+      const trabajo = await resp.json();
+      if (trabajo.estado === 'listo' || trabajo.estado === 'fallido') return trabajo;
+      if (trabajo.estado === 'procesando') botSubText.textContent = 'Interpretando tu solicitud...';
+      intervalo = Math.min(intervalo * 1.5, 2000);
+    }
+    throw new Error('El asistente tardó demasiado en responder');
+  }
+
+  // Convierte la grabación a WAV PCM 16 kHz mono, lo que Vosk consume directamente:
+  // el servidor ya no tiene que lanzar ffmpeg por cada solicitud.
+  async function aWav16k(blob) {
+    const Contexto = window.AudioContext || window.webkitAudioContext;
+    const ctx = new Contexto();
+    try {
+      const audio = await ctx.decodeAudioData(await blob.arrayBuffer());
+      const tasa = 16000;
+      // Un destino de 1 canal mezcla a mono; el contexto a 16 kHz remuestrea
+      const offline = new OfflineAudioContext(1, Math.ceil(audio.duration * tasa), tasa);
+      const fuente = offline.createBufferSource();
+      fuente.buffer = audio;
+      fuente.connect(offline.destination);
+      fuente.start();
+      const mono = (await offline.startRendering()).getChannelData(0);
+
+      const datos = new DataView(new ArrayBuffer(44 + mono.length * 2));
+      const escribir = (pos, texto) => [...texto].forEach((c, i) => datos.setUint8(pos + i, c.charCodeAt(0)));
+      escribir(0, 'RIFF'); datos.setUint32(4, 36 + mono.length * 2, true); escribir(8, 'WAVE');
+      escribir(12, 'fmt '); datos.setUint32(16, 16, true); datos.setUint16(20, 1, true); datos.setUint16(22, 1, true);
+      datos.setUint32(24, tasa, true); datos.setUint32(28, tasa * 2, true); datos.setUint16(32, 2, true); datos.setUint16(34, 16, true);
+      escribir(36, 'data'); datos.setUint32(40, mono.length * 2, true);
+      for (let i = 0; i < mono.length; i++) {
+        const v = Math.max(-1, Math.min(1, mono[i]));
+        datos.setInt16(44 + i * 2, v < 0 ? v * 0x8000 : v * 0x7FFF, true);
+      }
+      return new Blob([datos], { type: 'audio/wav' });
+    } finally {
+      ctx.close();
+    }
+  }
+
   async function enviarAudioAlServidor(audioBlob) {
+    let archivo = audioBlob, nombre = 'grabacion_usuario.webm';
+    try {
+      archivo = await aWav16k(audioBlob);
+      nombre = 'grabacion_usuario.wav';
+    } catch (err) {
+      // Sin Web Audio (o sin poder decodificar) se manda el webm y el servidor usa ffmpeg
+      console.warn('No se pudo convertir a WAV 16 kHz; se envía webm:', err);
+    }
     const formData = new FormData();
     // 'audio_data' debe coincidir con request.files['audio_data'] en Flask
-    formData.append('audio_data', audioBlob, 'grabacion_usuario.webm');
+    formData.append('audio_data', archivo, nombre);
 
     try {
-      // Usamos la ruta del endpoint que definiste en app_inicio.py
-      const response = await fetch('/procesar-voz', {
+      const envio = await fetch('/procesar-voz/trabajos', {
         method: 'POST',
         body: formData
       });
+      if (!envio.ok) {
+        const errorData = await envio.json();
+        throw new Error(errorData.error || `Error ${envio.status}`);
+      }
+      const aceptado = await envio.json();
+      const trabajo = await esperarTrabajo(aceptado.url, aceptado.plazo_s);
 
       // Restaurar botón
       botText.textContent = 'SiembraBot';
       botSubText.textContent = 'Presiona aquí para usar el asistente.';
 
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.error || `Error ${response.status}`);
+      if (trabajo.estado === 'fallido') {
+        throw new Error(trabajo.resultado?.error || `Error ${trabajo.codigo}`);
       }
 
-      const params = await response.json();
+      const params = trabajo.resultado;
       console.log('Parámetros recibidos de Gemma:', params);
 
       // Rellenamos el formulario
@@ -11,3 +11,25 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   }
 });
+
+// ========= LUGARES DEL FORMULARIO DE REPORTE =========
+// Sugerencias del <datalist> desde el mismo JSON de catálogos que usa la página de inicio
+(function () {
+  const form = document.querySelector('form[data-catalogos]');
+  if (!form) return;
+  const lista = document.getElementById('lugares-reporte');
+  const ruta = form.querySelector('select[name="ruta"]');
+  let catalogos = null;
+
+  function llenar() {
+    if (!catalogos) return;
+    const filas = ruta.value === 'Municipios' ? catalogos.municipios : catalogos.estados;
+    lista.replaceChildren(...filas.map(([nombre]) => new Option(nombre)));
+  }
+
+  fetch(form.dataset.catalogos)
+    .then(r => r.json())
+    .then(cat => { catalogos = cat; llenar(); })
+    .catch(err => console.error('No se pudo cargar el catálogo:', err));
+  ruta.addEventListener('change', llenar);
+})();
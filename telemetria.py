@@ -0,0 +1,324 @@
+# telemetria.py — Almacén de lecturas de los dispositivos de campo
+#
+#   from telemetria import almacen, decodificar_json, decodificar_binario
+#   lecturas = decodificar_json(request.get_json())
+#   almacen.agregar(lecturas)
+#
+# Las lecturas crudas se guardan por columnas y particionadas por día (UTC):
+#   cache/telemetria/2025-06-01/ts.<pid>.f8, dispositivo.<pid>.u4, temperatura.<pid>.f4, ...
+# Cada worker escribe en sus propios archivos (solo se agregan bytes al final),
+# así que no hace falta bloquear entre procesos; al leer se juntan los de todos.
+#
+# Con cada lote se actualizan, de forma vectorizada, los agregados por
+# dispositivo a resolución de minuto, hora y día (n, suma, mín, máx) en SQLite.
+# Los tableros consultan esos agregados y nunca recorren las lecturas crudas.
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_TELEMETRIA = os.environ.get("SIEMBRA_TELEMETRIA_DIR", os.path.join(APP_DIR, "cache", "telemetria"))
+
+VARIABLES = ("humedad_suelo", "temperatura", "humedad")
+# columna: tipo numpy (también es la extensión del archivo)
+COLUMNAS = {"dispositivo": "u4", "ts": "f8", **{v: "f4" for v in VARIABLES}}
+# Formato binario: registros de 24 bytes little-endian
+#   uint32 dispositivo · float64 ts (epoch s) · float32 humedad_suelo · float32 temperatura · float32 humedad
+DTYPE_BINARIO = np.dtype([("dispositivo", "<u4"), ("ts", "<f8")] + [(v, "<f4") for v in VARIABLES])
+
+# resolución: (segundos, días que se conservan; None = siempre)
+RESOLUCIONES = {"minuto": (60, 7), "hora": (3600, 180), "dia": (86400, None)}
+DIAS_CRUDOS = int(os.environ.get("SIEMBRA_TELEMETRIA_DIAS_CRUDOS", "90"))
+MAX_LECTURAS_POR_LOTE = 100_000
+# Lecturas con fecha adelantada más de esto se rechazan (reloj del dispositivo mal puesto)
+TOLERANCIA_FUTURO_S = 24 * 3600
+TS_MINIMO = 946684800.0  # 2000-01-01
+INTERVALO_PODA_S = 3600.0
+# Ventanas deslizantes del tablero en vivo, calculadas con los agregados por minuto
+VENTANAS = {"5m": 300, "1h": 3600}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS agregados (
+    dispositivo INTEGER NOT NULL,
+    resolucion TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    suma REAL NOT NULL,
+    minimo REAL NOT NULL,
+    maximo REAL NOT NULL,
+    PRIMARY KEY (dispositivo, resolucion, variable, inicio)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS agregados_recientes ON agregados (resolucion, inicio);
+CREATE TABLE IF NOT EXISTS dispositivos (
+    dispositivo INTEGER PRIMARY KEY,
+    primera_ts REAL NOT NULL,
+    ultima_ts REAL NOT NULL,
+    lecturas INTEGER NOT NULL
+);
+"""
+
+class LoteInvalido(ValueError):
+    pass
+
+# ================================ Decodificación =============================
+def _vacio(n: int = 0) -> Dict[str, np.ndarray]:
+    return {c: np.zeros(n, dtype=t) for c, t in COLUMNAS.items()}
+
+def decodificar_json(cuerpo) -> Dict[str, np.ndarray]:
+    """{"lecturas": [[dispositivo, ts, humedad_suelo, temperatura, humedad], ...]}
+
+    Si el lote es de un solo dispositivo puede ir arriba y omitirse en cada fila:
+    {"dispositivo": 7, "lecturas": [[ts, humedad_suelo, temperatura, humedad], ...]}.
+    Un valor faltante se manda como null.
+    """
+    if not isinstance(cuerpo, dict) or not isinstance(cuerpo.get("lecturas"), list):
+        raise LoteInvalido('se esperaba {"lecturas": [[...], ...]}')
+    filas = cuerpo["lecturas"]
+    if len(filas) > MAX_LECTURAS_POR_LOTE:
+        raise LoteInvalido(f"máximo {MAX_LECTURAS_POR_LOTE} lecturas por lote")
+    if not filas:
+        return _vacio()
+    por_fila = len(VARIABLES) + (1 if "dispositivo" in cuerpo else 2)
+    try:
+        matriz = np.asarray(filas, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise LoteInvalido("las lecturas deben ser filas numéricas del mismo largo")
+    if matriz.ndim != 2 or matriz.shape[1] != por_fila:
+        raise LoteInvalido(f"cada lectura debe tener {por_fila} valores")
+    if "dispositivo" in cuerpo:
+        try:
+            dispositivo = int(cuerpo["dispositivo"])
+        except (TypeError, ValueError):
+            raise LoteInvalido("dispositivo debe ser un entero")
+        matriz = np.column_stack([np.full(len(matriz), dispositivo, dtype=np.float64), matriz])
+    columnas = {"dispositivo": matriz[:, 0], "ts": matriz[:, 1]}
+    for i, v in enumerate(VARIABLES, start=2):
+        columnas[v] = matriz[:, i]
+    return columnas
+
+def decodificar_binario(datos: bytes) -> Dict[str, np.ndarray]:
+    if len(datos) % DTYPE_BINARIO.itemsize:
+        raise LoteInvalido(f"el cuerpo debe ser múltiplo de {DTYPE_BINARIO.itemsize} bytes")
+    if len(datos) // DTYPE_BINARIO.itemsize > MAX_LECTURAS_POR_LOTE:
+        raise LoteInvalido(f"máximo {MAX_LECTURAS_POR_LOTE} lecturas por lote")
+    registros = np.frombuffer(datos, dtype=DTYPE_BINARIO)
+    return {c: registros[c] for c in COLUMNAS}
+
+def _validar(columnas: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], int]:
+    """Descarta filas con dispositivo o fecha imposibles y convierte a los tipos de COLUMNAS."""
+    disp, ts = columnas["dispositivo"], columnas["ts"]
+    ok = (np.isfinite(ts) & (ts >= TS_MINIMO) & (ts <= time.time() + TOLERANCIA_FUTURO_S)
+          & np.isfinite(disp) & (disp >= 0) & (disp <= np.iinfo(np.uint32).max))
+    limpias = {c: np.asarray(columnas[c][ok], dtype=t) for c, t in COLUMNAS.items()}
+    return limpias, int(len(ok) - ok.sum())
+
+# ================================= Almacén ===================================
+class AlmacenTelemetria:
+    def __init__(self, directorio: str = DIR_TELEMETRIA):
+        self.directorio = directorio
+        self.ruta_db = os.path.join(directorio, "agregados.sqlite3")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ultima_poda = 0.0
+        os.makedirs(directorio, exist_ok=True)
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso, como en cache_compartido
+        con = getattr(self._local, "con", None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta_db, timeout=10, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(_ESQUEMA)
+            self._local.con, self._local.pid = con, os.getpid()
+        return con
+
+    # ------------------------------------------------------------- escritura ---
+    def agregar(self, columnas: Dict[str, np.ndarray]) -> Dict[str, int]:
+        """Guarda un lote decodificado. Devuelve cuántas lecturas se aceptaron y rechazaron."""
+        columnas, rechazadas = _validar(columnas)
+        n = len(columnas["ts"])
+        if n:
+            with self._lock:
+                self._escribir_crudas(columnas)
+            self._actualizar_agregados(columnas)
+            self._podar_si_toca()
+        return {"aceptadas": n, "rechazadas": rechazadas}
+
+    def _escribir_crudas(self, columnas: Dict[str, np.ndarray]):
+        dias = (columnas["ts"] // 86400).astype(np.int64)
+        pid = os.getpid()
+        for dia in np.unique(dias):
+            mascara = dias == dia
+            carpeta = os.path.join(self.directorio, _fecha(int(dia) * 86400))
+            os.makedirs(carpeta, exist_ok=True)
+            for c, t in COLUMNAS.items():
+                with open(os.path.join(carpeta, f"{c}.{pid}.{t}"), "ab") as f:
+                    columnas[c][mascara].tofile(f)
+
+    def _actualizar_agregados(self, columnas: Dict[str, np.ndarray]):
+        disp, ts = columnas["dispositivo"].astype(np.int64), columnas["ts"]
+        filas = []
+        for resolucion, (segundos, _) in RESOLUCIONES.items():
+            cubeta = (ts // segundos).astype(np.int64) * segundos
+            orden = np.lexsort((cubeta, disp))
+            d, c = disp[orden], cubeta[orden]
+            cambio = np.ones(len(orden), dtype=bool)
+            cambio[1:] = (d[1:] != d[:-1]) | (c[1:] != c[:-1])
+            inicios = np.flatnonzero(cambio)
+            for v in VARIABLES:
+                valores = columnas[v][orden].astype(np.float64)
+                validos = np.isfinite(valores)
+                n = np.add.reduceat(validos.astype(np.int64), inicios)
+                suma = np.add.reduceat(np.where(validos, valores, 0.0), inicios)
+                minimo = np.minimum.reduceat(np.where(validos, valores, np.inf), inicios)
+                maximo = np.maximum.reduceat(np.where(validos, valores, -np.inf), inicios)
+                con_datos = n > 0
+                filas += zip(d[inicios][con_datos].tolist(), [resolucion] * int(con_datos.sum()),
+                             c[inicios][con_datos].tolist(), [v] * int(con_datos.sum()),
+                             n[con_datos].tolist(), suma[con_datos].tolist(),
+                             minimo[con_datos].tolist(), maximo[con_datos].tolist())
+
+        # Resumen por dispositivo para listar los que están reportando
+        orden = np.argsort(disp, kind="stable")
+        d = disp[orden]
+        inicios = np.flatnonzero(np.r_[True, d[1:] != d[:-1]])
+        resumen = zip(d[inicios].tolist(), np.minimum.reduceat(ts[orden], inicios).tolist(),
+                      np.maximum.reduceat(ts[orden], inicios).tolist(), np.diff(np.r_[inicios, len(d)]).tolist())
+
+        con = self._conexion()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.executemany(
+                "INSERT INTO agregados (dispositivo, resolucion, inicio, variable, n, suma, minimo, maximo) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (dispositivo, resolucion, variable, inicio) DO UPDATE SET "
+                "n = n + excluded.n, suma = suma + excluded.suma, "
+                "minimo = MIN(minimo, excluded.minimo), maximo = MAX(maximo, excluded.maximo)",
+                filas,
+            )
+            con.executemany(
+                "INSERT INTO dispositivos (dispositivo, primera_ts, ultima_ts, lecturas) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (dispositivo) DO UPDATE SET primera_ts = MIN(primera_ts, excluded.primera_ts), "
+                "ultima_ts = MAX(ultima_ts, excluded.ultima_ts), lecturas = lecturas + excluded.lecturas",
+                resumen,
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def _podar_si_toca(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_poda < INTERVALO_PODA_S:
+            return
+        self._ultima_poda = ahora
+        try:
+            self.podar()
+        except (OSError, sqlite3.Error) as e:
+            print(f"[TELEMETRIA] Error al podar: {e}")
+
+    def podar(self):
+        """Borra agregados y particiones crudas más viejos que su retención."""
+        ahora = time.time()
+        con = self._conexion()
+        for resolucion, (_, dias) in RESOLUCIONES.items():
+            if dias is not None:
+                con.execute("DELETE FROM agregados WHERE resolucion = ? AND inicio < ?",
+                            (resolucion, ahora - dias * 86400))
+        limite = _fecha(ahora - DIAS_CRUDOS * 86400)
+        for nombre in self.particiones():
+            if nombre < limite:
+                shutil.rmtree(os.path.join(self.directorio, nombre), ignore_errors=True)
+
+    # --------------------------------------------------------------- lectura ---
+    def particiones(self) -> List[str]:
+        return sorted(n for n in os.listdir(self.directorio)
+                      if len(n) == 10 and os.path.isdir(os.path.join(self.directorio, n)))
+
+    def leer_dia(self, fecha: str) -> Dict[str, np.ndarray]:
+        """Lecturas crudas de un día (AAAA-MM-DD) de todos los workers, ordenadas por ts."""
+        carpeta = os.path.join(self.directorio, fecha)
+        if not os.path.isdir(carpeta):
+            return _vacio()
+        pids = sorted({n.split(".")[1] for n in os.listdir(carpeta) if n.startswith("ts.")})
+        partes = []
+        for pid in pids:
+            # Un escritor pudo quedar a medias: se recorta al largo común de sus columnas
+            cols = {c: np.fromfile(os.path.join(carpeta, f"{c}.{pid}.{t}"), dtype=t) for c, t in COLUMNAS.items()}
+            largo = min(len(a) for a in cols.values())
+            partes.append({c: a[:largo] for c, a in cols.items()})
+        if not partes:
+            return _vacio()
+        columnas = {c: np.concatenate([p[c] for p in partes]) for c in COLUMNAS}
+        orden = np.argsort(columnas["ts"], kind="stable")
+        return {c: a[orden] for c, a in columnas.items()}
+
+    def agregados(self, dispositivo: int, resolucion: str, desde: float, hasta: float,
+                  variables: Iterable[str] = VARIABLES) -> Dict[str, list]:
+        """{variable: [[inicio, n, media, min, max], ...]} en [desde, hasta)."""
+        segundos = RESOLUCIONES[resolucion][0]
+        variables = list(variables)
+        series: Dict[str, list] = {v: [] for v in variables}
+        marcas = ",".join("?" * len(variables))
+        consulta = self._conexion().execute(
+            "SELECT variable, inicio, n, suma, minimo, maximo FROM agregados "
+            f"WHERE dispositivo = ? AND resolucion = ? AND variable IN ({marcas}) AND inicio >= ? AND inicio < ? "
+            "ORDER BY variable, inicio",
+            (dispositivo, resolucion, *variables, int(desde // segundos * segundos), hasta),
+        )
+        for variable, inicio, n, suma, minimo, maximo in consulta:
+            series[variable].append([inicio, n, round(suma / n, 3), round(minimo, 3), round(maximo, 3)])
+        return series
+
+    def ventanas(self, ventanas: Dict[str, int] = VENTANAS, ahora: Optional[float] = None) -> dict:
+        """Resumen de todos los dispositivos en cada ventana deslizante (granularidad de un minuto).
+
+        {"ts": ..., "dispositivos": {"7": {"ultima_ts": ..., "5m": {"temperatura": [n, media, min, max]}}}}
+        """
+        ahora = time.time() if ahora is None else ahora
+        con = self._conexion()
+        resultado: Dict[str, dict] = {}
+        for dispositivo, ultima in con.execute("SELECT dispositivo, ultima_ts FROM dispositivos "
+                                               "WHERE ultima_ts >= ?", (ahora - max(ventanas.values()),)):
+            resultado[str(dispositivo)] = {"ultima_ts": ultima, **{nombre: {} for nombre in ventanas}}
+        for nombre, segundos in ventanas.items():
+            consulta = con.execute(
+                "SELECT dispositivo, variable, SUM(n), SUM(suma), MIN(minimo), MAX(maximo) FROM agregados "
+                "WHERE resolucion = 'minuto' AND inicio >= ? GROUP BY dispositivo, variable",
+                (int((ahora - segundos) // 60 * 60),),
+            )
+            for dispositivo, variable, n, suma, minimo, maximo in consulta:
+                if str(dispositivo) in resultado:
+                    resultado[str(dispositivo)][nombre][variable] = [n, round(suma / n, 3), round(minimo, 3),
+                                                                      round(maximo, 3)]
+        return {"ts": round(ahora, 3), "dispositivos": resultado}
+
+    def dispositivos(self) -> List[dict]:
+        return [{"dispositivo": d, "primera_ts": p, "ultima_ts": u, "lecturas": n}
+                for d, p, u, n in self._conexion().execute(
+                    "SELECT dispositivo, primera_ts, ultima_ts, lecturas FROM dispositivos ORDER BY dispositivo")]
+
+def _fecha(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+def leer_instante(texto: Optional[str], defecto: float) -> float:
+    """Epoch en segundos o fecha ISO 8601 (sin zona = UTC)."""
+    if not texto:
+        return defecto
+    try:
+        return float(texto)
+    except ValueError:
+        pass
+    fecha = datetime.fromisoformat(texto)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.timestamp()
+
+almacen = AlmacenTelemetria()
@@ -0,0 +1,8 @@
+# Las pruebas importan los módulos planos de la raíz y leen Datos/, Ideal/, ...
+# con rutas relativas, igual que la app: se corren desde la raíz del proyecto.
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
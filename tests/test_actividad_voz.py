@@ -0,0 +1,48 @@
+# Recorte de silencios antes de Vosk (actividad_voz.py).
+import numpy as np
+import pytest
+
+from actividad_voz import MARGEN_S, recortar_silencios
+
+TASA = 16000
+
+def _pcm(*trozos) -> bytes:
+    return np.concatenate(trozos).astype("<i2").tobytes()
+
+def _ruido(segundos: float, dbfs: float, semilla: int = 0) -> np.ndarray:
+    rnd = np.random.default_rng(semilla)
+    return rnd.normal(0, 32768 * 10 ** (dbfs / 20), int(segundos * TASA)).clip(-32768, 32767)
+
+def _voz(segundos: float, dbfs: float = -15) -> np.ndarray:
+    # Tono con envolvente silábica (~4 Hz): suficiente para el detector por energía
+    t = np.arange(int(segundos * TASA)) / TASA
+    envolvente = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    return 32768 * 10 ** (dbfs / 20) * np.sqrt(2) * envolvente * np.sin(2 * np.pi * 220 * t)
+
+def test_voz_con_pausas_se_recorta():
+    pcm = _pcm(_ruido(0.8, -60), _voz(1.0), _ruido(1.5, -60, 1), _voz(1.0), _ruido(0.8, -60, 2))
+    voz, info = recortar_silencios(pcm, TASA)
+    assert info["recortado"]
+    assert info["tramos"] == 2
+    assert info["original_s"] == pytest.approx(5.1)
+    # Los 2 s de voz, más a lo sumo el margen a cada lado de cada tramo
+    assert 2.0 <= info["voz_s"] <= 2.0 + 4 * MARGEN_S + 0.1
+    assert len(voz) == round(info["voz_s"] * TASA) * 2
+
+@pytest.mark.parametrize("dbfs", [-20, -30])
+def test_nivel_parejo_no_se_descarta(dbfs):
+    # Voz sobre viento o ruido de campo: sin silencios no hay piso que superar
+    pcm = _pcm(_ruido(2.0, dbfs))
+    voz, info = recortar_silencios(pcm, TASA)
+    assert not info["recortado"]
+    assert voz == pcm
+    assert info["voz_s"] == info["original_s"] == 2.0
+
+def test_silencio_total_se_deja_entero():
+    pcm = bytes(2 * TASA)
+    voz, info = recortar_silencios(pcm, TASA)
+    assert voz == pcm and not info["recortado"]
+
+def test_audio_vacio():
+    voz, info = recortar_silencios(b"", TASA)
+    assert voz == b"" and info["original_s"] == 0
@@ -0,0 +1,155 @@
+# Planificador de admisión (admision.py).
+import threading
+import time
+
+import pytest
+
+import admision
+from admision import Clase, Planificador, Rechazada
+from coalescencia import UnaSolaVez
+
+@pytest.fixture
+def planificador(monkeypatch):
+    def crear(capacidad=8, **clases):
+        p = Planificador(clases, capacidad)
+        monkeypatch.setattr(admision, "planificador", p)
+        return p
+    return crear
+
+def _en_fila(p, fondo=None):
+    with p._cond:
+        return sum(1 for t in p._esperando if fondo is None or t.fondo == fondo)
+
+def _esperar_a_que(condicion, limite_s=2.0):
+    fin = time.monotonic() + limite_s
+    while not condicion():
+        assert time.monotonic() < fin, "no se cumplió a tiempo"
+        time.sleep(0.002)
+
+def _hilo(funcion, fondo=False):
+    def correr():
+        if fondo:
+            admision.marcar_hilo_de_fondo()
+        funcion()
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    return hilo
+
+def test_prioridad_y_fondo(planificador):
+    p = planificador(calculo=Clase(1, 8, 2.0, 1, 5), lote=Clase(1, 8, 2.0, 3, 30))
+    orden = []
+
+    suelta = threading.Event()
+
+    def pedir(nombre, etiqueta):
+        with admision.cupo(nombre):
+            orden.append(etiqueta)
+            if etiqueta == "ocupante":
+                suelta.wait(2)
+
+    ocupante = _hilo(lambda: pedir("calculo", "ocupante"))
+    _esperar_a_que(lambda: orden == ["ocupante"])
+    hilos = [_hilo(lambda: pedir("calculo", "fondo"), fondo=True)]
+    _esperar_a_que(lambda: _en_fila(p) == 1)
+    hilos.append(_hilo(lambda: pedir("calculo", "real")))
+    _esperar_a_que(lambda: _en_fila(p) == 2)
+    suelta.set()
+    for hilo in [ocupante, *hilos]:
+        hilo.join(2)
+    # El hilo de fondo llegó antes pero va detrás de la petición real
+    assert orden == ["ocupante", "real", "fondo"]
+
+def test_cola_llena_rechaza_de_inmediato(planificador):
+    p = planificador(voz=Clase(1, 1, 5.0, 2, 10))
+    suelta = threading.Event()
+
+    def ocupar():
+        with admision.cupo("voz"):
+            suelta.wait(2)
+
+    hilos = [_hilo(ocupar)]
+    _esperar_a_que(lambda: p.estado()["clases"]["voz"]["en_curso"] == 1)
+    hilos.append(_hilo(ocupar))
+    _esperar_a_que(lambda: _en_fila(p) == 1)
+    inicio = time.perf_counter()
+    with pytest.raises(Rechazada) as error:
+        p.entrar("voz")
+    assert time.perf_counter() - inicio < 0.1
+    assert error.value.motivo == "cola llena" and error.value.reintentar_s == 10
+    suelta.set()
+    for hilo in hilos:
+        hilo.join(2)
+    assert p.estado()["clases"]["voz"]["en_curso"] == 0
+
+def test_lider_de_fondo_hereda_la_prioridad_de_quien_lo_espera(planificador):
+    # Una precarga entra como líder del pronóstico de un lugar y espera cupo de
+    # entrenamiento con la penalización de fondo; un /generar del mismo lugar se une
+    # a esa llamada. Con entrenamientos reales llegando sin parar, sin herencia la
+    # precarga nunca pasa y el /generar termina en "espera agotada".
+    p = planificador(entrenamiento=Clase(1, 50, 1.5, 1, 15, en_total=False))
+    vuelo = UnaSolaVez(al_esperar=admision.esperando_a)
+    alto = threading.Event()
+    otros = []
+
+    def entrenar_otro():
+        with admision.cupo("entrenamiento"):
+            time.sleep(0.02)
+
+    def flujo():
+        # Siempre hay entrenamientos reales en la fila
+        while not alto.is_set():
+            if _en_fila(p, fondo=False) < 3:
+                otros.append(_hilo(entrenar_otro))
+            time.sleep(0.002)
+
+    def entrenar_lugar():
+        with admision.cupo("entrenamiento"):
+            time.sleep(0.02)
+            return "pronostico"
+
+    resultado = {}
+    generador = _hilo(flujo)
+    _esperar_a_que(lambda: _en_fila(p, fondo=False) >= 1)
+    precarga = _hilo(lambda: resultado.setdefault("precarga", vuelo.hacer("Jalisco", entrenar_lugar)), fondo=True)
+    _esperar_a_que(lambda: _en_fila(p, fondo=True) == 1)
+
+    inicio = time.perf_counter()
+    try:
+        valor = vuelo.hacer("Jalisco", lambda: "no debe calcularse otra vez")
+    finally:
+        alto.set()
+    espera = time.perf_counter() - inicio
+    precarga.join(2)
+    generador.join(2)
+    for hilo in otros:
+        hilo.join(2)
+    assert valor == resultado["precarga"] == "pronostico"
+    assert espera < 1.0
+    # La herencia termina con la espera
+    assert p.estado()["urgidos"] == 0
+
+def test_ajustar_a_hilos(planificador, monkeypatch):
+    p = planificador(calculo=Clase(3, 16, 10.0, 1, 5), en_vivo=Clase(2, 0, 0.0, 4, 30))
+    monkeypatch.delenv("SIEMBRA_ADMISION_CAPACIDAD", raising=False)
+    monkeypatch.delenv("SIEMBRA_ADMISION_EN_VIVO", raising=False)
+    admision.ajustar_a_hilos(16)
+    assert (p.capacidad, p.clases["en_vivo"].limite) == (15, 14)
+    admision.ajustar_a_hilos(2)
+    assert (p.capacidad, p.clases["en_vivo"].limite) == (1, 1)
+    monkeypatch.setenv("SIEMBRA_ADMISION_CAPACIDAD", "6")
+    admision.ajustar_a_hilos(2)
+    assert p.capacidad == 6
+
+def test_streams_en_vivo_cuentan_contra_la_capacidad(planificador):
+    # 4 hilos: capacidad 3, a lo más 2 streams; el tercero se rechaza sin esperar
+    p = planificador(3, calculo=Clase(3, 16, 0.2, 1, 5), en_vivo=Clase(2, 0, 0.0, 4, 30))
+    p.entrar("en_vivo")
+    p.entrar("en_vivo")
+    with pytest.raises(Rechazada) as e:
+        p.entrar("en_vivo")
+    assert e.value.motivo == "cola llena"
+    # Con dos streams abiertos solo cabe un cálculo: el hilo libre sigue libre
+    p.entrar("calculo")
+    with pytest.raises(Rechazada):
+        p.entrar("calculo")
+    assert p.estado()["en_curso_total"] == 3
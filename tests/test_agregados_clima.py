@@ -0,0 +1,82 @@
+# Consultas de agregados_clima contra la agregación por fuerza bruta.
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import agregados_clima
+from agregados_clima import SerieAgregable
+
+def _tabla_sintetica(rnd: random.Random) -> pd.DataFrame:
+    inicio = rnd.randint(1950, 2000)
+    anios = list(range(inicio, inicio + rnd.randint(1, 40)))
+    # Años faltantes en medio, como 2018–2019 en algunos estados
+    if len(anios) > 5:
+        hueco = rnd.randrange(1, len(anios) - 3)
+        del anios[hueco:hueco + rnd.randint(1, 2)]
+    valores = np.array([[rnd.uniform(-5, 300) for _ in anios] for _ in range(12)])
+    valores[np.array([[rnd.random() < 0.1 for _ in anios] for _ in range(12)])] = np.nan
+    return pd.DataFrame(valores, index=range(1, 13), columns=anios)
+
+def _fuerza_bruta(tabla, desde, hasta, mes_desde, mes_hasta):
+    meses = (list(range(mes_desde, mes_hasta + 1)) if mes_desde <= mes_hasta
+             else list(range(mes_desde, 13)) + list(range(1, mes_hasta + 1)))
+    anios = [a for a in tabla.columns if desde <= a <= hasta]
+    valores = tabla.loc[meses, anios].to_numpy().ravel()
+    return valores[np.isfinite(valores)]
+
+def _cerca(obtenido, esperado):
+    if esperado is None:
+        return obtenido is None
+    return obtenido is not None and math.isclose(obtenido, esperado, rel_tol=1e-6, abs_tol=2e-3)
+
+def test_consultas_aleatorias_igual_que_fuerza_bruta():
+    rnd = random.Random(38)
+    consultas = 0
+    for _ in range(60):
+        tabla = _tabla_sintetica(rnd)
+        serie = SerieAgregable(tabla)
+        primero, ultimo = min(tabla.columns), max(tabla.columns)
+        for _ in range(100):
+            desde = rnd.randint(primero - 3, ultimo + 1)
+            hasta = rnd.randint(desde - 1, ultimo + 3)
+            mes_desde, mes_hasta = rnd.randint(1, 12), rnd.randint(1, 12)
+            r = serie.consultar(desde, hasta, mes_desde, mes_hasta)
+            v = _fuerza_bruta(tabla, desde, hasta, mes_desde, mes_hasta)
+            base = _fuerza_bruta(tabla, primero, ultimo, mes_desde, mes_hasta)
+            media = float(v.mean()) if v.size else None
+            climatologia = float(base.mean()) if base.size else None
+            assert r["n"] == v.size
+            assert _cerca(r["media"], media)
+            assert _cerca(r["suma"], float(v.sum()) if v.size else None)
+            assert _cerca(r["min"], float(v.min()) if v.size else None)
+            assert _cerca(r["max"], float(v.max()) if v.size else None)
+            assert _cerca(r["climatologia"], climatologia)
+            if media is not None and climatologia is not None:
+                assert _cerca(r["anomalia"], media - climatologia)
+            consultas += 1
+    assert consultas == 6000
+
+def test_series_reales_de_datos():
+    rnd = random.Random(7)
+    serie = agregados_clima.serie_agregable("Estados", "Jalisco", "lluvia")
+    if serie is None:
+        pytest.skip("Datos/ no trae la lluvia de Jalisco")
+    tabla = agregados_clima.series_lugar("Estados", "Jalisco")["lluvia"]
+    for _ in range(200):
+        desde = rnd.randint(serie.anio_inicial, serie.anio_final)
+        hasta = rnd.randint(desde, serie.anio_final)
+        mes_desde, mes_hasta = rnd.randint(1, 12), rnd.randint(1, 12)
+        v = _fuerza_bruta(tabla, desde, hasta, mes_desde, mes_hasta)
+        r = serie.consultar(desde, hasta, mes_desde, mes_hasta)
+        assert r["n"] == v.size
+        assert _cerca(r["media"], float(v.mean()) if v.size else None)
+
+def test_indice_acotado(monkeypatch):
+    monkeypatch.setattr(agregados_clima, "MAX_SERIES", 2)
+    monkeypatch.setattr(agregados_clima, "_SERIES", agregados_clima.OrderedDict())
+    for variable in ("lluvia", "temp_min", "temp_max"):
+        assert agregados_clima.serie_agregable("Estados", "Jalisco", variable) is not None
+    assert list(k[2] for k in agregados_clima._SERIES) == ["temp_min", "temp_max"]
@@ -0,0 +1,83 @@
+# Cola de trabajos en segundo plano (trabajos.py).
+import os
+import threading
+import time
+
+import pytest
+
+from trabajos import ColaLlena, ColaTrabajos, EstadoNoDisponible, TrabajoNoRegistrado
+
+def _esperar(cola, id_trabajo, limite_s=5.0):
+    fin = time.monotonic() + limite_s
+    while time.monotonic() < fin:
+        estado = cola.estado(id_trabajo)
+        if estado and estado["estado"] in ("listo", "fallido"):
+            return estado
+        time.sleep(0.01)
+    raise AssertionError(f"{id_trabajo} no terminó")
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "trabajos.sqlite3")
+
+def test_listo_y_visible_desde_otro_worker(ruta):
+    cola = ColaTrabajos("prueba", hilos=1, ruta=ruta)
+    id_trabajo = cola.enviar(lambda x: (200, {"doble": x * 2}), 21)
+    estado = _esperar(cola, id_trabajo)
+    assert estado["estado"] == "listo" and estado["codigo"] == 200 and estado["resultado"] == {"doble": 42}
+    # Otro proceso abre la misma tabla con su propia instancia
+    assert ColaTrabajos("prueba", ruta=ruta).estado(id_trabajo)["resultado"] == {"doble": 42}
+    assert ColaTrabajos("otra", ruta=ruta).estado(id_trabajo) is None
+
+def test_cola_llena(ruta):
+    suelta = threading.Event()
+    cola = ColaTrabajos("prueba", hilos=1, max_pendientes=2, ruta=ruta)
+    ids = [cola.enviar(lambda: (suelta.wait(5), (200, {}))[1]) for _ in range(2)]
+    with pytest.raises(ColaLlena):
+        cola.enviar(lambda: (200, {}))
+    assert cola.pendientes() == 2
+    suelta.set()
+    for id_trabajo in ids:
+        assert _esperar(cola, id_trabajo)["estado"] == "listo"
+    assert cola.pendientes() == 0
+    cola.enviar(lambda: (200, {}))  # hay lugar otra vez
+
+def test_fallos(ruta):
+    cola = ColaTrabajos("prueba", hilos=1, ruta=ruta)
+
+    def revienta():
+        raise ValueError("sin audio")
+
+    estado = _esperar(cola, cola.enviar(revienta))
+    assert estado["estado"] == "fallido" and estado["codigo"] == 500 and "sin audio" in estado["resultado"]["error"]
+    estado = _esperar(cola, cola.enviar(lambda: (422, {"error": "No se pudo transcribir"})))
+    assert estado["estado"] == "fallido" and estado["codigo"] == 422
+    assert cola.pendientes() == 0
+
+def test_caducidad(ruta):
+    cola = ColaTrabajos("prueba", hilos=1, vigencia_s=0.2, ruta=ruta)
+    id_trabajo = cola.enviar(lambda: (200, {}))
+    assert _esperar(cola, id_trabajo)["estado"] == "listo"
+    time.sleep(0.3)
+    assert cola.estado(id_trabajo) is None
+
+def test_sin_almacenamiento_no_da_id(tmp_path):
+    # Una carpeta en lugar del archivo: SQLite no puede abrirla
+    cola = ColaTrabajos("prueba", hilos=1, ruta=str(tmp_path))
+    with pytest.raises(TrabajoNoRegistrado):
+        cola.enviar(lambda: (200, {}))
+    assert cola.pendientes() == 0
+
+def test_estado_ilegible_no_es_inexistente(ruta):
+    cola = ColaTrabajos("prueba", hilos=1, ruta=ruta)
+    id_trabajo = cola.enviar(lambda: (200, {}))
+    _esperar(cola, id_trabajo)
+    # Archivo dañado: lo que haya en el WAL tampoco sirve para leerlo
+    for sufijo in ("-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    with open(ruta, "wb") as f:
+        f.write(b"esto no es una base SQLite" * 8)
+    otra = ColaTrabajos("prueba", ruta=ruta)  # conexión nueva, como la de otro worker
+    with pytest.raises(EstadoNoDisponible):
+        otra.estado(id_trabajo)
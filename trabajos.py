@@ -0,0 +1,155 @@
+# trabajos.py — Trabajos largos en segundo plano con estado compartido entre workers
+#
+#   cola = ColaTrabajos("voz", hilos=2, max_pendientes=16, vigencia_s=600)
+#   id_trabajo = cola.enviar(funcion, *args)   # regresa de inmediato
+#   cola.estado(id_trabajo)                    # {"id", "estado", "codigo", "resultado", ...} o None
+#
+# La función corre en un ThreadPoolExecutor del worker que recibió el trabajo y
+# devuelve (código HTTP, cuerpo). El estado se guarda en su propia tabla SQLite
+# (RUTA_POR_DEFECTO, junto a la caché compartida), así que cualquier worker puede
+# contestar la consulta aunque el trabajo corra en otro. No usa la caché: allí un
+# error de escritura solo se imprime y las entradas se desalojan por tamaño, y un
+# trabajo no puede perderse así. Si no se puede registrar, enviar() lanza
+# TrabajoNoRegistrado; si no se puede guardar el resultado, se reintenta; si no se
+# puede leer (archivo bloqueado o dañado), estado() lanza EstadoNoDisponible para que
+# quien consulta responda 503 y el cliente siga preguntando.
+#
+# Los trabajos terminados caducan vigencia_s después de terminar; si hay
+# max_pendientes en cola o en curso, enviar() rechaza el nuevo con ColaLlena en
+# vez de dejar que la espera crezca sin límite.
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from cache_compartido import RUTA_POR_DEFECTO as RUTA_CACHE
+
+RUTA_POR_DEFECTO = os.environ.get("SIEMBRA_TRABAJOS_RUTA",
+                                  os.path.join(os.path.dirname(RUTA_CACHE), "trabajos.sqlite3"))
+# Un trabajo en cola o en curso no debe caducar antes de terminar (Ollama tiene 120 s de timeout)
+VIGENCIA_EN_CURSO_S = 3600
+# Intentos para guardar el resultado final antes de darlo por perdido
+INTENTOS_GUARDADO = 3
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    cola TEXT NOT NULL,
+    id TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    expira REAL NOT NULL,
+    PRIMARY KEY (cola, id)
+);
+CREATE INDEX IF NOT EXISTS trabajos_expira ON trabajos (expira);
+"""
+
+class ColaLlena(RuntimeError):
+    pass
+
+class TrabajoNoRegistrado(RuntimeError):
+    pass
+
+class EstadoNoDisponible(RuntimeError):
+    pass
+
+class ColaTrabajos:
+    def __init__(self, nombre: str, hilos: int = 2, max_pendientes: int = 16, vigencia_s: float = 600,
+                 ruta: str = RUTA_POR_DEFECTO):
+        self.nombre = nombre
+        self.max_pendientes = max_pendientes
+        self.vigencia_s = vigencia_s
+        self.ruta = ruta
+        self._ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix=f"trabajo-{nombre}")
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+
+    # ------------------------------------------------------------ almacenamiento ---
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo y por proceso, como en cache_compartido
+        con = getattr(self._local, "con", None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta, timeout=10, isolation_level=None, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.executescript(_ESQUEMA)
+            self._local.con, self._local.pid = con, os.getpid()
+        return con
+
+    def _guardar(self, estado: dict):
+        """Lanza sqlite3.Error si no se pudo escribir (a diferencia de la caché)."""
+        terminado = estado["estado"] in ("listo", "fallido")
+        ahora = time.time()
+        con = self._conexion()
+        con.execute("INSERT OR REPLACE INTO trabajos (cola, id, estado, expira) VALUES (?, ?, ?, ?)",
+                    (self.nombre, estado["id"], json.dumps(estado, ensure_ascii=False, default=str),
+                     ahora + (self.vigencia_s if terminado else VIGENCIA_EN_CURSO_S)))
+        con.execute("DELETE FROM trabajos WHERE expira <= ?", (ahora,))
+
+    def _guardar_final(self, estado: dict):
+        for intento in range(1, INTENTOS_GUARDADO + 1):
+            try:
+                self._guardar(estado)
+                return
+            except sqlite3.Error as e:
+                print(f"[TRABAJOS] {self.nombre} {estado['id']}: no se pudo guardar el resultado "
+                      f"(intento {intento}/{INTENTOS_GUARDADO}): {e}")
+                time.sleep(0.1 * intento)
+
+    # ------------------------------------------------------------------ cola ---
+    def pendientes(self) -> int:
+        """Trabajos en cola o en curso en este proceso."""
+        return self._pendientes
+
+    def enviar(self, funcion: Callable[..., Tuple[int, dict]], *args) -> str:
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                raise ColaLlena(f"{self._pendientes} trabajos de {self.nombre} pendientes")
+            self._pendientes += 1
+        id_trabajo = uuid.uuid4().hex
+        estado = {"id": id_trabajo, "estado": "en_cola", "creado": time.time()}
+        try:
+            # Sin registro no hay id que consultar: mejor rechazar que devolver un 202 que luego da 404
+            self._guardar(estado)
+            self._ejecutor.submit(self._correr, estado, funcion, args)
+        except (sqlite3.Error, RuntimeError) as e:
+            with self._lock:
+                self._pendientes -= 1
+            if isinstance(e, sqlite3.Error):
+                raise TrabajoNoRegistrado(f"{self.nombre}: {e}") from e
+            raise
+        return id_trabajo
+
+    def _correr(self, estado: dict, funcion: Callable[..., Tuple[int, dict]], args: tuple):
+        inicio = time.time()
+        estado = dict(estado, estado="procesando", espera_s=round(inicio - estado["creado"], 3))
+        try:
+            self._guardar(estado)
+        except sqlite3.Error as e:
+            # El trabajo sigue; quien consulte verá "en_cola" hasta que se guarde el resultado
+            print(f"[TRABAJOS] {self.nombre} {estado['id']}: no se pudo marcar en proceso: {e}")
+        try:
+            codigo, cuerpo = funcion(*args)
+        except Exception as e:
+            print(f"[TRABAJOS] {self.nombre} {estado['id']} falló: {e}")
+            codigo, cuerpo = 500, {"error": str(e)}
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+        self._guardar_final(dict(estado, estado="listo" if codigo < 400 else "fallido", codigo=codigo,
+                                 resultado=cuerpo, duracion_s=round(time.time() - inicio, 3)))
+
+    def estado(self, id_trabajo: str) -> Optional[dict]:
+        try:
+            fila = self._conexion().execute(
+                "SELECT estado FROM trabajos WHERE cola = ? AND id = ? AND expira > ?",
+                (self.nombre, id_trabajo, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            # El trabajo puede seguir vivo: no es lo mismo que "inexistente" (None)
+            raise EstadoNoDisponible(f"{self.nombre} {id_trabajo}: {e}") from e
+        return json.loads(fila[0]) if fila else None